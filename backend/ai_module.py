@@ -4,25 +4,29 @@ Owns AI-assisted features (plain titles, summaries, eligibility quizzes).
 
 Boundaries:
 - AI generation: Anthropic API calls for title/summary/quiz generation
-- Caching: AI response caching in database
-- Rate limiting: AI API rate limiting and retry logic
+- Caching: per-artifact cache (ai_artifacts) keyed by prompt version and input hash
+- Rate limiting: per-client and global generation budgets (token buckets in platform_module)
 """
+import asyncio
+import contextvars
+import hashlib
 import json
 import os
 import logging
 import re
+from contextlib import asynccontextmanager
 from datetime import datetime
-from collections import deque
-from time import time
-from typing import List, Optional
+from time import monotonic, perf_counter
+from typing import AsyncIterator, List, Optional
 
 from psycopg.types.json import Jsonb
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 
-from platform_module import get_db
-from search_module import EligibilityQuizQuestion, get_study_by_id
+from platform_module import DATABASE_URL, RateLimitBudget, client_key, get_db, rate_limiter, telemetry
+from search_module import EligibilityQuizQuestion
 
 # Configure logger
 logger = logging.getLogger("uvicorn.error")
@@ -34,8 +38,60 @@ logger = logging.getLogger("uvicorn.error")
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
-# AI Cache version - increment when prompts or model changes
+# Legacy shared cache version stamped on studies.ai_cache_version (seed source only)
 AI_CACHE_VERSION = "v2-sonnet-4.5"
+AI_MODEL = "claude-sonnet-4-5"
+# USD per million tokens for AI_MODEL (telemetry cost_usd)
+AI_PRICE_PER_MTOK = {"input": 3.00, "output": 15.00}
+
+# Prompt version per artifact kind - increment one when its prompt or the model
+# changes; only that kind is regenerated
+AI_PROMPT_VERSIONS = {
+    "plain_title": "v2-sonnet-4.5",
+    "study_summary": "v2-sonnet-4.5",
+    "eligibility_quiz": "v2-sonnet-4.5",
+}
+
+# Request fields each kind's prompt is built from; hashed into ai_artifacts.input_hash
+# so a request with different text never reads (or overwrites) another input's artifact
+AI_INPUT_FIELDS = {
+    "plain_title": ("title", "brief_summary", "interventions", "conditions"),
+    "study_summary": ("title", "brief_summary", "detailed_description", "interventions", "conditions"),
+    "eligibility_quiz": ("eligibility_criteria",),
+}
+
+# Denormalized copies on studies (plain titles are shown in search results)
+AI_MIRROR_COLUMNS = {
+    "plain_title": "ai_plain_title",
+    "study_summary": "ai_plain_summary",
+    "eligibility_quiz": "ai_eligibility_quiz",
+}
+
+# Generations in flight per process. AI routes are async and share one pooled
+# client, so this cap (not the server threadpool) bounds slow Claude calls and
+# search keeps its worker threads.
+AI_MAX_CONCURRENT_GENERATIONS = int(os.getenv("AI_MAX_CONCURRENT_GENERATIONS", "8"))
+AI_QUEUE_TIMEOUT_SECONDS = 30.0  # Wait for a generation slot before answering 503
+AI_REQUEST_TIMEOUT_SECONDS = 60.0
+# Keep proxies from buffering server-sent events
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# Generations each client may start (token buckets shared by all workers, see
+# platform_module); the global bucket bounds spend across all clients. Only
+# cache misses are charged, after the single-flight cache re-check.
+AI_RATE_LIMITS = {
+    "plain_title": RateLimitBudget("ai:plain_title", capacity=20, per_minute=20,
+                                   global_capacity=100, global_per_minute=100),
+    "study_summary": RateLimitBudget("ai:study_summary", capacity=10, per_minute=10,
+                                     global_capacity=100, global_per_minute=100),
+    "eligibility_quiz": RateLimitBudget("ai:eligibility_quiz", capacity=10, per_minute=10,
+                                        global_capacity=100, global_per_minute=100),
+    "bundle": RateLimitBudget("ai:bundle", capacity=10, per_minute=10,
+                              global_capacity=100, global_per_minute=100),
+}
+# How long a worker waits for another worker's generation of the same artifact
+AI_SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS = AI_QUEUE_TIMEOUT_SECONDS + AI_REQUEST_TIMEOUT_SECONDS
+# While another worker holds the lock: re-check the cache / retry the lock this often
+AI_SINGLE_FLIGHT_POLL_SECONDS = 0.5
 
 
 # ======================================================================
@@ -85,130 +141,531 @@ class PlainTitleResponse(BaseModel):
     cached: bool = False
 
 
+class StudyBundleRequest(BaseModel):
+    """Request for plain title, summary and eligibility quiz in one generation"""
+    study_id: int
+    title: str
+    brief_summary: Optional[str] = None
+    detailed_description: Optional[str] = None
+    eligibility_criteria: Optional[str] = None
+    interventions: List[str] = Field(default_factory=list)
+    conditions: List[str] = Field(default_factory=list)
+
+
+class StudyBundleResponse(BaseModel):
+    """Response with all three artifacts"""
+    plain_title: str
+    summary: str
+    questions: List[EligibilityQuizQuestion]
+    cached: bool = False
+
+
 # ======================================================================
 # DEPENDENCIES
 # ======================================================================
 
-class RateLimiter:
-    """Simple in-memory rate limiter for AI endpoints"""
-    def __init__(self, max_requests: int, window_seconds: int):
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.requests = deque()
-
-    def check_rate_limit(self):
-        """Check if request is within rate limit"""
-        now = time()
-        # Remove old requests outside the window
-        while self.requests and self.requests[0] < now - self.window_seconds:
-            self.requests.popleft()
-
-        if len(self.requests) >= self.max_requests:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded. Max {self.max_requests} requests per {self.window_seconds} seconds."
-            )
-
-        self.requests.append(now)
-
+_anthropic_client: Optional[AsyncAnthropic] = None
+_generation_slots = asyncio.Semaphore(AI_MAX_CONCURRENT_GENERATIONS)
+# Set while the current task holds a slot, so a single-flight leader's Claude call reuses it
+_holding_generation_slot = contextvars.ContextVar("holding_generation_slot", default=False)
 
-# Global rate limiter: 100 requests per 60 seconds
-ai_rate_limiter = RateLimiter(max_requests=100, window_seconds=60)
 
+def get_anthropic_client() -> AsyncAnthropic:
+    """
+    Process-wide async Anthropic client
 
-def get_anthropic_client() -> Anthropic:
-    """Get Anthropic client instance"""
+    One client means one HTTP connection pool: requests reuse warm TLS
+    connections instead of opening a new pool per call.
+    """
+    global _anthropic_client
     if not ANTHROPIC_API_KEY:
         raise HTTPException(
             status_code=500,
             detail="ANTHROPIC_API_KEY not configured"
         )
-    return Anthropic(api_key=ANTHROPIC_API_KEY)
+    if _anthropic_client is None:
+        import httpx
+        from anthropic import DefaultAsyncHttpxClient
+
+        _anthropic_client = AsyncAnthropic(
+            api_key=ANTHROPIC_API_KEY,
+            timeout=AI_REQUEST_TIMEOUT_SECONDS,
+            http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+                max_connections=AI_MAX_CONCURRENT_GENERATIONS * 2,
+                max_keepalive_connections=AI_MAX_CONCURRENT_GENERATIONS
+            ))
+        )
+    return _anthropic_client
+
+
+def ai_input_hash(kind: str, request: BaseModel) -> str:
+    """sha256 of the request fields the kind's prompt is built from"""
+    inputs = {field: getattr(request, field) for field in AI_INPUT_FIELDS[kind]}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def bundle_input_hashes(request: "StudyBundleRequest") -> dict:
+    """Input hash per kind for a bundle request; equal to the single-artifact requests' hashes"""
+    fields = request.model_dump()
+    fields["eligibility_criteria"] = fields["eligibility_criteria"] or ""
+    return {
+        "plain_title": ai_input_hash("plain_title", PlainTitleRequest(**fields)),
+        "study_summary": ai_input_hash("study_summary", StudySummaryRequest(**fields)),
+        "eligibility_quiz": ai_input_hash("eligibility_quiz", EligibilityQuizRequest(**fields)),
+    }
+
+
+async def close_anthropic_client():
+    """Close the shared client's connection pool (app shutdown)"""
+    global _anthropic_client
+    if _anthropic_client is not None:
+        await _anthropic_client.close()
+        _anthropic_client = None
+
+
+class GenerationStream:
+    """
+    Text deltas of one in-flight generation
+
+    Any number of readers can follow it; each replays from the first delta,
+    so a request that joins mid-generation still gets the whole text.
+    """
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self._updated = asyncio.Event()
+
+    def push(self, text: str):
+        self.chunks.append(text)
+        self._notify()
+
+    def close(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def read(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            updated = self._updated
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                return
+            await updated.wait()
+
+
+# In-flight generations in this process, keyed (study_id, kind, prompt_version, input_hash)
+_inflight_generations: dict = {}
+
+
+def join_single_flight(key: tuple, check_cache, generate) -> tuple:
+    """
+    Start or join the generation for key; returns (task, GenerationStream)
+
+    The first request for a key starts a task running generate(stream);
+    concurrent requests join the same task and stream. Across API processes
+    the task takes a Postgres advisory lock on the key and re-checks the
+    cache after acquiring it, so a cold study costs one generation
+    cluster-wide.
+    """
+    entry = _inflight_generations.get(key)
+    if entry is None:
+        stream = GenerationStream()
+        task = asyncio.create_task(generate_under_lock(key, check_cache, lambda: generate(stream)))
+        entry = _inflight_generations[key] = (task, stream)
+
+        def finished(_):
+            stream.close()
+            _inflight_generations.pop(key, None)
+        task.add_done_callback(finished)
+    return entry
+
+
+async def single_flight(key: tuple, check_cache, generate):
+    """
+    Run generate(stream) once per key, however many requests ask at the same time
+
+    Waiters are shielded, so one client disconnecting does not cancel the
+    generation for the rest; all of them get its result or its error.
+    """
+    task, _ = join_single_flight(key, check_cache, generate)
+    return await asyncio.shield(task)
+
+
+async def generate_under_lock(key: tuple, check_cache, generate):
+    """
+    Leader side of single_flight: advisory lock, cache re-check, then generate
+
+    The lock connection is opened only while holding a generation slot (which
+    the Claude call then reuses), so lock connections are bounded by
+    AI_MAX_CONCURRENT_GENERATIONS. While another worker holds the lock, this
+    one releases its slot and connection and polls the cache instead.
+    """
+    import psycopg
+
+    lock_name = "ai:" + ":".join(str(part) for part in key)
+    deadline = monotonic() + AI_SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS
+    while True:
+        async with generation_slot():
+            try:
+                conn = await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True)
+            except Exception as e:
+                logger.warning(f"AI single-flight lock unavailable, generating without it: {e}")
+                return await generate()
+
+            # Session lock: released explicitly, or by closing the connection if we fail
+            async with conn:
+                cursor = await conn.execute("SELECT pg_try_advisory_lock(hashtextextended(%s, 0))", (lock_name,))
+                locked = (await cursor.fetchone())[0]
+                if locked or monotonic() >= deadline:
+                    if not locked:
+                        # The other worker is stuck; better a duplicate generation than a failed request
+                        logger.warning(f"Timed out waiting for {lock_name}; generating anyway")
+                    try:
+                        cached = await check_cache()
+                        if cached is not None:
+                            return cached
+                        return await generate()
+                    finally:
+                        if locked:
+                            try:
+                                await conn.execute("SELECT pg_advisory_unlock(hashtextextended(%s, 0))", (lock_name,))
+                            except Exception as e:
+                                # Closing the connection releases it; keep the generated result
+                                logger.warning(f"Failed to release {lock_name}: {e}")
+
+        # Another worker is generating: wait without holding a slot or a connection
+        await asyncio.sleep(AI_SINGLE_FLIGHT_POLL_SECONDS)
+        cached = await check_cache()
+        if cached is not None:
+            return cached
+
+
+def set_generation_concurrency(limit: int):
+    """Resize the generation cap (batch jobs run with their own budget); call before generating"""
+    global _generation_slots
+    _generation_slots = asyncio.Semaphore(max(1, limit))
+
+
+async def acquire_generation_slot():
+    """Wait for a slot under the per-process generation cap; 503 after AI_QUEUE_TIMEOUT_SECONDS"""
+    try:
+        await asyncio.wait_for(_generation_slots.acquire(), timeout=AI_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="AI generation is busy, please retry shortly")
+
+
+@asynccontextmanager
+async def generation_slot():
+    """Hold a generation slot for the block (reentrant within one task)"""
+    if _holding_generation_slot.get():
+        yield
+        return
+    slots = _generation_slots  # Release the semaphore acquired even if it is resized meanwhile
+    await acquire_generation_slot()
+    token = _holding_generation_slot.set(True)
+    try:
+        yield
+    finally:
+        _holding_generation_slot.reset(token)
+        slots.release()
+
+
+def record_ai_call(kind: str, started: float, message=None):
+    """Telemetry for one Claude call: latency, tokens and cost, or an error if message is None"""
+    labels = {"kind": kind, "model": AI_MODEL}
+    telemetry.observe("ai_latency_ms", (perf_counter() - started) * 1000, **labels)
+    if message is None:
+        telemetry.count("ai_errors", **labels)
+        return
+    usage = message.usage
+    telemetry.count("ai_input_tokens", usage.input_tokens, **labels)
+    telemetry.count("ai_output_tokens", usage.output_tokens, **labels)
+    telemetry.count("cost_usd", (usage.input_tokens * AI_PRICE_PER_MTOK["input"]
+                                 + usage.output_tokens * AI_PRICE_PER_MTOK["output"]) / 1_000_000,
+                    source="ai", kind=kind)
+
+
+def record_ai_cache(kind: str, hit: bool):
+    """Telemetry for one cache lookup at request entry"""
+    telemetry.count("ai_cache", kind=kind, result="hit" if hit else "miss")
+
+
+async def create_message(prompt: str, max_tokens: int, kind: str):
+    """Run one Claude call under the per-process generation cap; returns the Message (text and usage)"""
+    client = get_anthropic_client()
+    async with generation_slot():
+        started = perf_counter()
+        message = None
+        try:
+            message = await client.messages.create(
+                model=AI_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return message
+        finally:
+            record_ai_call(kind, started, message)
+
+
+async def complete_prompt(prompt: str, max_tokens: int, kind: str) -> str:
+    """Run one Claude completion under the per-process generation cap"""
+    message = await create_message(prompt, max_tokens, kind)
+    return message.content[0].text.strip()
+
+
+async def stream_prompt(prompt: str, max_tokens: int, stream: GenerationStream, kind: str) -> str:
+    """Like complete_prompt, but pushes text deltas into stream as Claude produces them"""
+    client = get_anthropic_client()
+    async with generation_slot():
+        started = perf_counter()
+        message = None
+        try:
+            async with client.messages.stream(
+                model=AI_MODEL,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}]
+            ) as response:
+                async for text in response.text_stream:
+                    stream.push(text)
+                message = await response.get_final_message()
+        finally:
+            record_ai_call(kind, started, message)
+    return message.content[0].text.strip()
 
 
 # ======================================================================
 # REPO
 # ======================================================================
 
-def save_ai_plain_title(study_id: int, plain_title: str):
-    """Save AI-generated plain title to database"""
-    now = datetime.utcnow()
-
+def get_ai_artifact(study_id: int, kind: str, input_hash: str):
+    """Cached artifact content for the current prompt version and exact inputs (primary key lookup)"""
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            UPDATE studies
-            SET ai_plain_title = %s,
-                ai_cache_version = %s,
-                ai_cached_at = %s
-            WHERE id = %s
-        """, (plain_title, AI_CACHE_VERSION, now, study_id))
+            SELECT content FROM ai_artifacts
+            WHERE study_id = %s AND kind = %s AND prompt_version = %s AND input_hash = %s
+        """, (study_id, kind, AI_PROMPT_VERSIONS[kind], input_hash))
+        row = cursor.fetchone()
+        return row["content"] if row else None
 
 
-def save_ai_plain_summary(study_id: int, plain_summary: str):
-    """Save AI-generated plain summary to database"""
-    now = datetime.utcnow()
-
+def fetch_studies_for_ai(study_ids: List[int]) -> List[dict]:
+    """Prompt inputs for a batch of studies (intervention names flattened, as the frontend sends them)"""
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            UPDATE studies
-            SET ai_plain_summary = %s,
-                ai_cache_version = %s,
-                ai_cached_at = %s
-            WHERE id = %s
-        """, (plain_summary, AI_CACHE_VERSION, now, study_id))
+            SELECT id, title, brief_summary, detailed_description, eligibility_criteria,
+                   conditions, interventions
+            FROM studies
+            WHERE id = ANY(%s)
+            ORDER BY id
+        """, (study_ids,))
+        rows = cursor.fetchall()
+
+    for row in rows:
+        row["interventions"] = [i.get("intervention_name") for i in row["interventions"] or []
+                                if i.get("intervention_name")]
+        row["conditions"] = row["conditions"] or []
+    return rows
+
+
+def canonical_ai_input_hashes(study: dict) -> dict:
+    """Input hash per kind for a study's stored text (see fetch_studies_for_ai)"""
+    return bundle_input_hashes(StudyBundleRequest(
+        study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+        detailed_description=study["detailed_description"],
+        eligibility_criteria=study["eligibility_criteria"] or "",
+        interventions=study["interventions"], conditions=study["conditions"]
+    ))
+
+
+def is_canonical_ai_input(study_id: int, kind: str, input_hash: str) -> bool:
+    """Whether a request's inputs match the study's stored text (only those update the studies mirror)"""
+    return is_canonical_ai_inputs(study_id, {kind: input_hash})
+
+
+def is_canonical_ai_inputs(study_id: int, input_hashes: dict) -> bool:
+    """is_canonical_ai_input for several kinds at once (one read)"""
+    rows = fetch_studies_for_ai([study_id])
+    if not rows:
+        return False
+    canonical = canonical_ai_input_hashes(rows[0])
+    return all(canonical[kind] == input_hash for kind, input_hash in input_hashes.items())
+
+
+def save_ai_artifacts(artifacts: List[tuple]):
+    """
+    Upsert (study_id, kind, input_hash, content, mirror) artifacts in one transaction
+
+    content is JSON-serializable (text or quiz question dicts). mirror also
+    copies it to the study's denormalized ai_* column; pass it only for
+    inputs that match the stored study (see is_canonical_ai_input).
+    Artifacts for unknown study ids are skipped.
+    """
+    if not artifacts:
+        return
 
-
-def save_ai_eligibility_quiz(study_id: int, quiz_questions: List[EligibilityQuizQuestion]):
-    """Save AI-generated eligibility quiz to database"""
     now = datetime.utcnow()
-    quiz_data = Jsonb([q.model_dump() for q in quiz_questions])
-
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            UPDATE studies
-            SET ai_eligibility_quiz = %s,
-                ai_cache_version = %s,
-                ai_cached_at = %s
-            WHERE id = %s
-        """, (quiz_data, AI_CACHE_VERSION, now, study_id))
+            INSERT INTO ai_artifacts (study_id, kind, prompt_version, input_hash, content, model)
+            SELECT v.study_id, v.kind, v.prompt_version, v.input_hash, v.content::jsonb, %s
+            FROM unnest(%s::bigint[], %s::text[], %s::text[], %s::text[], %s::text[])
+                AS v(study_id, kind, prompt_version, input_hash, content)
+            JOIN studies s ON s.id = v.study_id
+            ON CONFLICT (study_id, kind, prompt_version, input_hash) DO UPDATE
+            SET content = EXCLUDED.content, model = EXCLUDED.model, created_at = NOW()
+        """, (
+            AI_MODEL,
+            [a[0] for a in artifacts],
+            [a[1] for a in artifacts],
+            [AI_PROMPT_VERSIONS[a[1]] for a in artifacts],
+            [a[2] for a in artifacts],
+            [json.dumps(a[3]) for a in artifacts]
+        ))
+
+        # One UPDATE per study, however many of its kinds are mirrored
+        mirrored = {}
+        for study_id, kind, _, content, mirror in artifacts:
+            if mirror:
+                mirrored.setdefault(study_id, {})[AI_MIRROR_COLUMNS[kind]] = (
+                    Jsonb(content) if kind == "eligibility_quiz" else content
+                )
+        for study_id, columns in mirrored.items():
+            assignments = ", ".join(f"{column} = %s" for column in columns)
+            cursor.execute(
+                f"UPDATE studies SET {assignments}, ai_cached_at = %s WHERE id = %s",
+                (*columns.values(), now, study_id)
+            )
 
 
-# ======================================================================
-# SERVICE
-# ======================================================================
-# (No additional service logic needed; generation happens in routes)
+def save_ai_artifact(study_id: int, kind: str, input_hash: str, content):
+    """Save one generated artifact; mirrored onto the study only if it was generated from the stored text"""
+    mirror = is_canonical_ai_input(study_id, kind, input_hash)
+    save_ai_artifacts([(study_id, kind, input_hash, content, mirror)])
 
 
-# ======================================================================
-# ROUTES
-# ======================================================================
+def save_ai_plain_title(study_id: int, plain_title: str, input_hash: str):
+    """Save AI-generated plain title to database"""
+    save_ai_artifact(study_id, "plain_title", input_hash, plain_title)
 
-def register_ai_routes(app: FastAPI):
-    """Register AI generation endpoints"""
 
-    @app.post("/ai/eligibility-quiz", response_model=EligibilityQuizResponse)
-    def generate_eligibility_quiz(request: EligibilityQuizRequest):
-        """Generate an eligibility quiz from criteria text"""
-        # Check cache first
-        try:
-            study = get_study_by_id(request.study_id)
-            if (study.ai_eligibility_quiz and
-                study.ai_cache_version == AI_CACHE_VERSION):
-                return EligibilityQuizResponse(
-                    questions=study.ai_eligibility_quiz,
-                    cached=True
-                )
-        except HTTPException:
-            pass  # Study not found, continue to generate
+def save_ai_plain_summary(study_id: int, plain_summary: str, input_hash: str):
+    """Save AI-generated plain summary to database"""
+    save_ai_artifact(study_id, "study_summary", input_hash, plain_summary)
 
-        ai_rate_limiter.check_rate_limit()
 
-        client = get_anthropic_client()
+def save_ai_eligibility_quiz(study_id: int, quiz_questions: List[EligibilityQuizQuestion], input_hash: str):
+    """Save AI-generated eligibility quiz to database"""
+    save_ai_artifact(study_id, "eligibility_quiz", input_hash, [q.model_dump() for q in quiz_questions])
+
+
+def save_ai_bundle(study_id: int, input_hashes: dict, plain_title: str, summary: str,
+                   quiz_questions: List[EligibilityQuizQuestion]):
+    """Save all three artifacts of a bundle generation in one write (see save_ai_artifacts)"""
+    mirror = is_canonical_ai_inputs(study_id, input_hashes)
+    save_ai_artifacts([
+        (study_id, "plain_title", input_hashes["plain_title"], plain_title, mirror),
+        (study_id, "study_summary", input_hashes["study_summary"], summary, mirror),
+        (study_id, "eligibility_quiz", input_hashes["eligibility_quiz"],
+         [q.model_dump() for q in quiz_questions], mirror),
+    ])
+
+
+def fetch_studies_missing_ai_artifacts(limit: int) -> List[int]:
+    """
+    Published studies lacking any artifact kind at its current prompt version,
+    most-shown in search first (see study_search_exposure)
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.id
+            FROM studies s
+            LEFT JOIN study_search_exposure e ON e.study_id = s.id
+            WHERE s.is_published = TRUE
+              AND (
+                  SELECT COUNT(DISTINCT a.kind)
+                  FROM ai_artifacts a
+                  JOIN unnest(%s::text[], %s::text[]) AS v(kind, prompt_version)
+                    ON v.kind = a.kind AND v.prompt_version = a.prompt_version
+                  WHERE a.study_id = s.id
+              ) < %s
+            ORDER BY COALESCE(e.impressions, 0) DESC, s.id
+            LIMIT %s
+        """, (list(AI_PROMPT_VERSIONS), list(AI_PROMPT_VERSIONS.values()), len(AI_PROMPT_VERSIONS), limit))
+        return [row["id"] for row in cursor.fetchall()]
+
+
+def save_ai_artifacts_bulk(results: List[dict]) -> int:
+    """
+    Write all three artifacts for many studies (bulk precompute)
+
+    Each result is {"study": row from fetch_studies_for_ai, "plain_title",
+    "summary", "quiz": [EligibilityQuizQuestion]}. Inputs come from the stored
+    study, so the studies mirror columns are updated too.
+    """
+    artifacts = []
+    for result in results:
+        hashes = canonical_ai_input_hashes(result["study"])
+        study_id = result["study"]["id"]
+        artifacts.extend([
+            (study_id, "plain_title", hashes["plain_title"], result["plain_title"], True),
+            (study_id, "study_summary", hashes["study_summary"], result["summary"], True),
+            (study_id, "eligibility_quiz", hashes["eligibility_quiz"], [q.model_dump() for q in result["quiz"]], True),
+        ])
+    save_ai_artifacts(artifacts)
+    return len(results)
+
+
+def seed_ai_artifacts_from_studies(batch_size: int = 500) -> int:
+    """
+    Copy artifacts cached on studies (legacy ai_cache_version = AI_CACHE_VERSION)
+    into ai_artifacts under their canonical input hashes, so existing generations
+    are not paid for again. Returns studies seeded.
+    """
+    seeded = 0
+    last_id = 0
+    while True:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, ai_plain_title, ai_plain_summary, ai_eligibility_quiz
+                FROM studies
+                WHERE id > %s AND ai_cache_version = %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, AI_CACHE_VERSION, batch_size))
+            cached = cursor.fetchall()
+        if not cached:
+            return seeded
+        last_id = cached[-1]["id"]
+
+        studies = {row["id"]: row for row in fetch_studies_for_ai([row["id"] for row in cached])}
+        artifacts = []
+        for row in cached:
+            hashes = canonical_ai_input_hashes(studies[row["id"]])
+            for kind, column in AI_MIRROR_COLUMNS.items():
+                if row[column]:
+                    artifacts.append((row["id"], kind, hashes[kind], row[column], False))
+        save_ai_artifacts(artifacts)
+        seeded += len(cached)
 
-        prompt = f"""You are a medical AI assistant helping people understand clinical trial eligibility criteria.
+
+# ======================================================================
+# SERVICE
+# ======================================================================
+
+def build_eligibility_quiz_prompt(eligibility_criteria: str) -> str:
+    """Prompt for 5-10 yes/no eligibility questions"""
+    return f"""You are a medical AI assistant helping people understand clinical trial eligibility criteria.
 
 Given the following eligibility criteria, create 5-10 simple yes/no questions that help a person determine if they might be eligible for this study.
 
@@ -219,7 +676,7 @@ Keep questions:
 - Medically accurate
 
 Eligibility Criteria:
-{request.eligibility_criteria}
+{eligibility_criteria}
 
 Return ONLY a JSON array of objects with this structure:
 [
@@ -229,36 +686,232 @@ Return ONLY a JSON array of objects with this structure:
 
 Do not include any other text, just the JSON array."""
 
-        try:
-            message = client.messages.create(
-                model="claude-sonnet-4-5",
-                max_tokens=2000,
-                messages=[{"role": "user", "content": prompt}]
-            )
 
-            response_text = message.content[0].text.strip()
+def build_study_summary_prompt(request: StudySummaryRequest) -> str:
+    """Prompt for a grounded plain-language summary"""
+    interventions_text = ", ".join(request.interventions) if request.interventions else "Not specified"
+    conditions_text = ", ".join(request.conditions) if request.conditions else "Not specified"
+
+    return f"""You are a medical AI assistant that rewrites study information into plain, accessible language.
+
+Task: Write a concise summary of the study's research goals using ONLY the information provided below. Do not add facts, make assumptions, or infer details not stated. If a detail is missing, omit it or say "Not provided."
+
+Focus on what the study is trying to learn or test. Describe what participation involves only if it is explicitly stated.
+
+Style: neutral and factual (no marketing), 1-2 short paragraphs (3-6 sentences total), no bullet points or headings. Return only the summary text.
+
+Study Information:
+Title: {request.title}
+Conditions: {conditions_text}
+Interventions: {interventions_text}
+Brief Summary: {request.brief_summary or "Not provided"}
+Detailed Description: {request.detailed_description or "Not provided"}"""
+
+
+def build_plain_title_prompt(request: PlainTitleRequest) -> str:
+    """Prompt for a jargon-free title under 15 words"""
+    interventions_text = ", ".join(request.interventions) if request.interventions else "Not specified"
+    conditions_text = ", ".join(request.conditions) if request.conditions else "Not specified"
+
+    return f"""You are a medical AI assistant helping people understand clinical trials.
+
+Given the following clinical trial information, rewrite the title in plain language without medical jargon.
+
+Try to follow the format: [intervention] for [condition] on [population]
+For example: "New diabetes medication for adults with type 2 diabetes"
+
+If the format doesn't fit naturally, use another clear structure.
+
+Keep it:
+- Simple and clear (no medical jargon)
+- Under 15 words
+- Medically accurate
+- Informative
+
+Study Information:
+Original Title: {request.title}
+Conditions: {conditions_text}
+Interventions: {interventions_text}
+Brief Summary: {request.brief_summary or "Not provided"}
+
+Return ONLY the simplified title text, nothing else."""
+
+
+def build_study_bundle_prompt(request: StudyBundleRequest) -> str:
+    """Prompt for plain title, summary and quiz as one JSON object (same rules as the single prompts)"""
+    interventions_text = ", ".join(request.interventions) if request.interventions else "Not specified"
+    conditions_text = ", ".join(request.conditions) if request.conditions else "Not specified"
+    has_criteria = bool((request.eligibility_criteria or "").strip())
+
+    quiz_task = """3. "quiz": 5-10 simple yes/no questions that help a person determine if they might be eligible, based only on the eligibility criteria. Keep them clear (no medical jargon), focused on the most important criteria and medically accurate. Each is an object: {"question": "Are you between 18 and 65 years old?", "explanation": "This study is only for adults in this age range"}""" if has_criteria else """3. "quiz": an empty array (no eligibility criteria were provided)"""
+
+    return f"""You are a medical AI assistant that rewrites clinical trial information into plain, accessible language.
+
+Using ONLY the study information below, produce three things. Do not add facts, make assumptions, or infer details not stated.
+
+1. "plain_title": the title rewritten in plain language without medical jargon, under 15 words, medically accurate and informative. Try to follow the format: [intervention] for [condition] on [population] (for example: "New diabetes medication for adults with type 2 diabetes"); if it doesn't fit naturally, use another clear structure.
+2. "summary": a concise summary of the study's research goals, neutral and factual (no marketing), 1-2 short paragraphs (3-6 sentences total), no bullet points or headings. Focus on what the study is trying to learn or test; describe what participation involves only if it is explicitly stated. If a detail is missing, omit it or say "Not provided."
+{quiz_task}
+
+Study Information:
+Title: {request.title}
+Conditions: {conditions_text}
+Interventions: {interventions_text}
+Brief Summary: {request.brief_summary or "Not provided"}
+Detailed Description: {request.detailed_description or "Not provided"}
+Eligibility Criteria: {request.eligibility_criteria if has_criteria else "Not provided"}
+
+Return ONLY a JSON object with the keys "plain_title", "summary" and "quiz". Do not include any other text."""
+
+
+def extract_json(response_text: str, opener: str = "["):
+    """
+    Parse the JSON array ("[") or object ("{") in a model response
+
+    Tolerates markdown code fences and text around the JSON; raises
+    json.JSONDecodeError if none parses.
+    """
+    # Remove markdown code fences if present
+    if response_text.startswith('```'):
+        lines = response_text.split('\n')
+        # Remove first line (```json or ```) and last line (```)
+        if len(lines) > 2:
+            response_text = '\n'.join(lines[1:-1]).strip()
+
+    # Try to extract the outermost JSON array/object using regex
+    closer = "]" if opener == "[" else "}"
+    json_match = re.search(re.escape(opener) + r'.*' + re.escape(closer), response_text, re.DOTALL)
+    if json_match:
+        response_text = json_match.group(0)
+
+    return json.loads(response_text)
+
+
+def parse_eligibility_quiz(response_text: str) -> List[EligibilityQuizQuestion]:
+    """Parse quiz questions from a model response (tolerates code fences and surrounding text)"""
+    try:
+        questions_data = extract_json(response_text, "[")
+        return [EligibilityQuizQuestion(**q) for q in questions_data]
+    except Exception:
+        telemetry.count("ai_parse_failures", kind="eligibility_quiz")
+        raise
+
+
+def parse_study_bundle(response_text: str) -> tuple:
+    """(plain_title, summary, quiz questions) from a bundle response; ValueError if a field is missing"""
+    try:
+        data = extract_json(response_text, "{")
+        plain_title_text = str(data.get("plain_title") or "").strip()
+        summary = str(data.get("summary") or "").strip()
+        if not plain_title_text or not summary:
+            raise ValueError("AI response is missing plain_title or summary")
+        questions = [EligibilityQuizQuestion(**q) for q in data.get("quiz") or []]
+    except Exception:
+        telemetry.count("ai_parse_failures", kind="bundle")
+        raise
+    return plain_title_text, summary, questions
+
+
+async def generate_study_artifacts(study: dict, bundle: bool = False) -> dict:
+    """
+    Generate plain title, summary and quiz for a study row (see fetch_studies_for_ai)
+
+    Used by bulk precomputation; the three calls run concurrently under the
+    generation cap, or with bundle=True one combined call produces all three.
+    Studies without eligibility criteria get an empty quiz.
+    """
+    if bundle:
+        bundle_request = StudyBundleRequest(
+            study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+            detailed_description=study["detailed_description"],
+            eligibility_criteria=study["eligibility_criteria"],
+            interventions=study["interventions"], conditions=study["conditions"]
+        )
+        plain_title_text, summary, questions = parse_study_bundle(
+            await complete_prompt(build_study_bundle_prompt(bundle_request), 3500, "bundle")
+        )
+        return {"study": study, "plain_title": plain_title_text, "summary": summary, "quiz": questions}
+
+    title_request = PlainTitleRequest(
+        study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+        interventions=study["interventions"], conditions=study["conditions"]
+    )
+    summary_request = StudySummaryRequest(
+        study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+        detailed_description=study["detailed_description"],
+        interventions=study["interventions"], conditions=study["conditions"]
+    )
+
+    async def quiz() -> List[EligibilityQuizQuestion]:
+        if not (study["eligibility_criteria"] or "").strip():
+            return []
+        return parse_eligibility_quiz(
+            await complete_prompt(build_eligibility_quiz_prompt(study["eligibility_criteria"]), 2000, "eligibility_quiz")
+        )
+
+    plain_title_text, summary, questions = await asyncio.gather(
+        complete_prompt(build_plain_title_prompt(title_request), 500, "plain_title"),
+        complete_prompt(build_study_summary_prompt(summary_request), 1500, "study_summary"),
+        quiz()
+    )
+    return {"study": study, "plain_title": plain_title_text, "summary": summary, "quiz": questions}
+
+
+async def cached_artifact(study_id: int, kind: str, input_hash: str):
+    """Cached artifact content for these inputs, or None (DB read runs in a thread)"""
+    return await asyncio.to_thread(get_ai_artifact, study_id, kind, input_hash)
+
+
+async def cached_eligibility_quiz(request: EligibilityQuizRequest) -> Optional[EligibilityQuizResponse]:
+    content = await cached_artifact(request.study_id, "eligibility_quiz", ai_input_hash("eligibility_quiz", request))
+    if content is not None:
+        return EligibilityQuizResponse(questions=content, cached=True)
+    return None
+
+
+async def cached_study_summary(request: StudySummaryRequest) -> Optional[StudySummaryResponse]:
+    content = await cached_artifact(request.study_id, "study_summary", ai_input_hash("study_summary", request))
+    if content:
+        return StudySummaryResponse(summary=content, cached=True)
+    return None
+
+
+async def cached_plain_title(request: PlainTitleRequest) -> Optional[PlainTitleResponse]:
+    content = await cached_artifact(request.study_id, "plain_title", ai_input_hash("plain_title", request))
+    if content:
+        return PlainTitleResponse(plain_title=content, cached=True)
+    return None
 
-            # Remove markdown code fences if present
-            if response_text.startswith('```'):
-                lines = response_text.split('\n')
-                # Remove first line (```json or ```) and last line (```)
-                if len(lines) > 2:
-                    response_text = '\n'.join(lines[1:-1]).strip()
 
-            # Try to extract JSON array using regex
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
+def artifact_key(kind: str, request: BaseModel) -> tuple:
+    """Single-flight key: one generation per study, kind, prompt version and inputs"""
+    return (request.study_id, kind, AI_PROMPT_VERSIONS[kind], ai_input_hash(kind, request))
 
-            questions_data = json.loads(response_text)
 
-            questions = [EligibilityQuizQuestion(**q) for q in questions_data]
+async def eligibility_quiz(request: EligibilityQuizRequest, client: str) -> EligibilityQuizResponse:
+    """Cached quiz, or generate (once across concurrent requests), cache and return a new one"""
+    cached = await cached_eligibility_quiz(request)
+    record_ai_cache("eligibility_quiz", cached is not None)
+    if cached:
+        return cached
+    # Every caller pays for a miss, including those joining another's generation
+    await rate_limiter.check_async(client, AI_RATE_LIMITS["eligibility_quiz"])
+
+    async def generate(_stream: GenerationStream) -> EligibilityQuizResponse:
+        # JSON is only useful once complete, so the quiz is not streamed
+        try:
+            response_text = await complete_prompt(build_eligibility_quiz_prompt(request.eligibility_criteria), 2000,
+                                                  "eligibility_quiz")
+            questions = parse_eligibility_quiz(response_text)
 
             # Save to cache
-            save_ai_eligibility_quiz(request.study_id, questions)
+            await asyncio.to_thread(save_ai_eligibility_quiz, request.study_id, questions,
+                                    ai_input_hash("eligibility_quiz", request))
 
             return EligibilityQuizResponse(questions=questions, cached=False)
 
+        except HTTPException:
+            raise
         except json.JSONDecodeError as e:
             logger.exception("Failed to parse AI response for eligibility quiz", extra={"study_id": request.study_id})
             raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
@@ -266,120 +919,241 @@ Do not include any other text, just the JSON array."""
             logger.exception("AI generation failed for eligibility quiz", extra={"study_id": request.study_id})
             raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-    @app.post("/ai/study-summary", response_model=StudySummaryResponse)
-    def generate_study_summary(request: StudySummaryRequest):
-        """Generate a plain-language summary of a study"""
-        # Check cache first
-        try:
-            study = get_study_by_id(request.study_id)
-            if (study.ai_plain_summary and
-                study.ai_cache_version == AI_CACHE_VERSION):
-                return StudySummaryResponse(
-                    summary=study.ai_plain_summary,
-                    cached=True
-                )
-        except HTTPException:
-            pass  # Study not found, continue to generate
-
-        ai_rate_limiter.check_rate_limit()
+    return await single_flight(
+        artifact_key("eligibility_quiz", request),
+        lambda: cached_eligibility_quiz(request),
+        generate
+    )
+
+
+async def cached_study_bundle(request: StudyBundleRequest, input_hashes: dict) -> Optional[StudyBundleResponse]:
+    """All three artifacts from the cache, or None if any is missing"""
+    title_content, summary_content, quiz_content = await asyncio.gather(*[
+        cached_artifact(request.study_id, kind, input_hashes[kind])
+        for kind in ("plain_title", "study_summary", "eligibility_quiz")
+    ])
+    if title_content and summary_content and quiz_content is not None:
+        return StudyBundleResponse(
+            plain_title=title_content, summary=summary_content, questions=quiz_content, cached=True
+        )
+    return None
 
-        client = get_anthropic_client()
 
-        interventions_text = ", ".join(request.interventions) if request.interventions else "Not specified"
-        conditions_text = ", ".join(request.conditions) if request.conditions else "Not specified"
+async def study_bundle(request: StudyBundleRequest, client: str) -> StudyBundleResponse:
+    """
+    Plain title, summary and quiz from the cache, or from one combined Claude call
 
-        prompt = f"""You are a medical AI assistant that rewrites study information into plain, accessible language.
+    The study text is sent once instead of three times. Artifacts land in
+    the same cache entries as the single-artifact endpoints, so either path
+    serves the other's results.
+    """
+    input_hashes = bundle_input_hashes(request)
+    cached = await cached_study_bundle(request, input_hashes)
+    record_ai_cache("bundle", cached is not None)
+    if cached:
+        return cached
+    await rate_limiter.check_async(client, AI_RATE_LIMITS["bundle"])
 
-Task: Write a concise summary of the study's research goals using ONLY the information provided below. Do not add facts, make assumptions, or infer details not stated. If a detail is missing, omit it or say "Not provided."
+    async def generate(_stream: GenerationStream) -> StudyBundleResponse:
+        try:
+            response_text = await complete_prompt(build_study_bundle_prompt(request), 3500, "bundle")
+            plain_title_text, summary, questions = parse_study_bundle(response_text)
 
-Focus on what the study is trying to learn or test. Describe what participation involves only if it is explicitly stated.
+            # Save to cache
+            await asyncio.to_thread(save_ai_bundle, request.study_id, input_hashes,
+                                    plain_title_text, summary, questions)
 
-Style: neutral and factual (no marketing), 1-2 short paragraphs (3-6 sentences total), no bullet points or headings. Return only the summary text.
+            return StudyBundleResponse(plain_title=plain_title_text, summary=summary, questions=questions)
 
-Study Information:
-Title: {request.title}
-Conditions: {conditions_text}
-Interventions: {interventions_text}
-Brief Summary: {request.brief_summary or "Not provided"}
-Detailed Description: {request.detailed_description or "Not provided"}"""
+        except HTTPException:
+            raise
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.exception("Failed to parse AI response for study bundle", extra={"study_id": request.study_id})
+            raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+        except Exception as e:
+            logger.exception("AI generation failed for study bundle", extra={"study_id": request.study_id})
+            raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
+    return await single_flight(
+        (request.study_id, "bundle",
+         *(f"{AI_PROMPT_VERSIONS[kind]}:{input_hashes[kind]}" for kind in AI_PROMPT_VERSIONS)),
+        lambda: cached_study_bundle(request, input_hashes),
+        generate
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_artifact(key: tuple, check_cache, generate, client: str, text_of) -> AsyncIterator[str]:
+    """
+    SSE events for one artifact
+
+    A cache hit is a single "done" event carrying the response. Otherwise
+    the client is charged against the kind's rate limit, "delta" events
+    relay text as it is generated (joining an in-flight generation replays
+    it from the start), then "done" carries the final, cached response;
+    failures end with an "error" event.
+    """
+    cached = await check_cache()
+    record_ai_cache(key[1], cached is not None)
+    if cached is not None:
+        yield sse_event("done", cached.model_dump())
+        return
+    try:
+        await rate_limiter.check_async(client, AI_RATE_LIMITS[key[1]])
+    except HTTPException as e:
+        yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+        return
+
+    task, stream = join_single_flight(key, check_cache, generate)
+    streamed = False
+    async for text in stream.read():
+        streamed = True
+        yield sse_event("delta", {"text": text})
+
+    try:
+        result = await asyncio.shield(task)
+    except HTTPException as e:
+        yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+        return
+    except Exception as e:
+        yield sse_event("error", {"status": 500, "detail": f"AI generation failed: {str(e)}"})
+        return
+
+    if not streamed:
+        # Another worker generated it (or the leader was not streaming): send it whole
+        yield sse_event("delta", {"text": text_of(result)})
+    yield sse_event("done", result.model_dump())
+
+
+def study_summary_generation(request: StudySummaryRequest) -> tuple:
+    """(single-flight key, cache check, generate(stream)) for a plain summary"""
+    async def generate(stream: GenerationStream) -> StudySummaryResponse:
         try:
-            message = client.messages.create(
-                model="claude-sonnet-4-5",
-                max_tokens=1500,
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            summary = message.content[0].text.strip()
+            summary = await stream_prompt(build_study_summary_prompt(request), 1500, stream, "study_summary")
 
             # Save to cache
-            save_ai_plain_summary(request.study_id, summary)
+            await asyncio.to_thread(save_ai_plain_summary, request.study_id, summary,
+                                    ai_input_hash("study_summary", request))
 
             return StudySummaryResponse(summary=summary, cached=False)
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.exception("AI generation failed for study summary", extra={"study_id": request.study_id})
             raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-    @app.post("/ai/plain-title", response_model=PlainTitleResponse)
-    def generate_plain_title(request: PlainTitleRequest):
-        """Generate a plain-language title"""
-        # Check cache first
+    return (
+        artifact_key("study_summary", request),
+        lambda: cached_study_summary(request),
+        generate
+    )
+
+
+def plain_title_generation(request: PlainTitleRequest) -> tuple:
+    """(single-flight key, cache check, generate(stream)) for a plain title"""
+    async def generate(stream: GenerationStream) -> PlainTitleResponse:
         try:
-            study = get_study_by_id(request.study_id)
-            if (study.ai_plain_title and
-                study.ai_cache_version == AI_CACHE_VERSION):
-                return PlainTitleResponse(
-                    plain_title=study.ai_plain_title,
-                    cached=True
-                )
+            title = await stream_prompt(build_plain_title_prompt(request), 500, stream, "plain_title")
+
+            # Save to cache
+            await asyncio.to_thread(save_ai_plain_title, request.study_id, title,
+                                    ai_input_hash("plain_title", request))
+
+            return PlainTitleResponse(plain_title=title, cached=False)
+
         except HTTPException:
-            pass  # Study not found, continue to generate
+            raise
+        except Exception as e:
+            logger.exception("AI generation failed for plain title", extra={"study_id": request.study_id})
+            raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-        ai_rate_limiter.check_rate_limit()
+    return (
+        artifact_key("plain_title", request),
+        lambda: cached_plain_title(request),
+        generate
+    )
 
-        client = get_anthropic_client()
 
-        interventions_text = ", ".join(request.interventions) if request.interventions else "Not specified"
-        conditions_text = ", ".join(request.conditions) if request.conditions else "Not specified"
+async def study_summary(request: StudySummaryRequest, client: str) -> StudySummaryResponse:
+    """Cached plain summary, or generate (once across concurrent requests), cache and return a new one"""
+    cached = await cached_study_summary(request)
+    record_ai_cache("study_summary", cached is not None)
+    if cached:
+        return cached
+    await rate_limiter.check_async(client, AI_RATE_LIMITS["study_summary"])
+    return await single_flight(*study_summary_generation(request))
 
-        prompt = f"""You are a medical AI assistant helping people understand clinical trials.
 
-Given the following clinical trial information, rewrite the title in plain language without medical jargon.
+async def plain_title(request: PlainTitleRequest, client: str) -> PlainTitleResponse:
+    """Cached plain title, or generate (once across concurrent requests), cache and return a new one"""
+    cached = await cached_plain_title(request)
+    record_ai_cache("plain_title", cached is not None)
+    if cached:
+        return cached
+    await rate_limiter.check_async(client, AI_RATE_LIMITS["plain_title"])
+    return await single_flight(*plain_title_generation(request))
 
-Try to follow the format: [intervention] for [condition] on [population]
-For example: "New diabetes medication for adults with type 2 diabetes"
 
-If the format doesn't fit naturally, use another clear structure.
+def stream_study_summary(request: StudySummaryRequest, client: str) -> AsyncIterator[str]:
+    """SSE events for a plain summary (see stream_artifact)"""
+    return stream_artifact(*study_summary_generation(request), client=client, text_of=lambda r: r.summary)
 
-Keep it:
-- Simple and clear (no medical jargon)
-- Under 15 words
-- Medically accurate
-- Informative
 
-Study Information:
-Original Title: {request.title}
-Conditions: {conditions_text}
-Interventions: {interventions_text}
-Brief Summary: {request.brief_summary or "Not provided"}
+def stream_plain_title(request: PlainTitleRequest, client: str) -> AsyncIterator[str]:
+    """SSE events for a plain title (see stream_artifact)"""
+    return stream_artifact(*plain_title_generation(request), client=client, text_of=lambda r: r.plain_title)
 
-Return ONLY the simplified title text, nothing else."""
 
-        try:
-            message = client.messages.create(
-                model="claude-sonnet-4-5",
-                max_tokens=500,
-                messages=[{"role": "user", "content": prompt}]
-            )
+# ======================================================================
+# ROUTES
+# ======================================================================
 
-            plain_title = message.content[0].text.strip()
+def register_ai_routes(app: FastAPI):
+    """Register AI generation endpoints"""
 
-            # Save to cache
-            save_ai_plain_title(request.study_id, plain_title)
+    # Async handlers: a 5-20s generation awaits on the event loop instead of
+    # holding a threadpool thread that sync search routes need
 
-            return PlainTitleResponse(plain_title=plain_title, cached=False)
+    @app.post("/ai/eligibility-quiz", response_model=EligibilityQuizResponse)
+    async def generate_eligibility_quiz(request: EligibilityQuizRequest, http_request: Request):
+        """Generate an eligibility quiz from criteria text"""
+        return await eligibility_quiz(request, client_key(http_request))
 
-        except Exception as e:
-            logger.exception("AI generation failed for plain title", extra={"study_id": request.study_id})
-            raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
+    @app.post("/ai/study-summary", response_model=StudySummaryResponse)
+    async def generate_study_summary(request: StudySummaryRequest, http_request: Request):
+        """Generate a plain-language summary of a study"""
+        return await study_summary(request, client_key(http_request))
+
+    @app.post("/ai/plain-title", response_model=PlainTitleResponse)
+    async def generate_plain_title(request: PlainTitleRequest, http_request: Request):
+        """Generate a plain-language title"""
+        return await plain_title(request, client_key(http_request))
+
+    @app.post("/ai/study-bundle", response_model=StudyBundleResponse)
+    async def generate_study_bundle(request: StudyBundleRequest, http_request: Request):
+        """Generate plain title, summary and eligibility quiz in one call"""
+        return await study_bundle(request, client_key(http_request))
+
+    # Streaming variants: "delta" events while Claude generates, then "done"
+    # with the same body as the JSON endpoint; cache hits are a single "done"
+
+    @app.post("/ai/study-summary/stream")
+    async def generate_study_summary_stream(request: StudySummaryRequest, http_request: Request):
+        """Stream a plain-language summary as server-sent events"""
+        return StreamingResponse(stream_study_summary(request, client_key(http_request)), media_type="text/event-stream",
+                                 headers=SSE_HEADERS)
+
+    @app.post("/ai/plain-title/stream")
+    async def generate_plain_title_stream(request: PlainTitleRequest, http_request: Request):
+        """Stream a plain-language title as server-sent events"""
+        return StreamingResponse(stream_plain_title(request, client_key(http_request)), media_type="text/event-stream",
+                                 headers=SSE_HEADERS)
+
+    @app.on_event("shutdown")
+    async def close_ai_client():
+        await close_anthropic_client()
@@ -4,8 +4,8 @@ Wires together platform, search, and AI modules
 """
 from fastapi import FastAPI
 
-from platform_module import configure_cors, register_health_route, register_startup_handler
-from search_module import register_search_routes
+from platform_module import configure_cors, register_health_route, register_startup_handler, register_telemetry_routes
+from search_module import register_embedding_worker, register_search_routes
 from ai_module import register_ai_routes
 
 # ======================================================================
@@ -19,8 +19,12 @@ configure_cors(app)
 
 # Register routes
 register_health_route(app)
+register_telemetry_routes(app)
 register_search_routes(app)
 register_ai_routes(app)
 
 # Register startup handler
 register_startup_handler(app)
+
+# Background embedding worker (opt-in via EMBEDDING_WORKER_ENABLED)
+register_embedding_worker(app)
@@ -5,16 +5,26 @@ Owns deployment configuration, health checks, and environment setup.
 Boundaries:
 - Deployment: Render configuration, health endpoints
 - Environment: Env var validation, connection pooling
-- Monitoring: Health checks, basic observability
+- Monitoring: Health checks, telemetry counters/histograms (telemetry_rollups)
+- Rate limiting: token buckets shared across API workers
 """
+import asyncio
+import bisect
+import json
+import math
 import os
 import logging
+import queue
+import threading
 from contextlib import contextmanager
+from datetime import datetime
+from time import monotonic
+from typing import Optional
 
 import psycopg
 from psycopg.rows import dict_row
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 # Load environment variables
@@ -31,6 +41,22 @@ logger = logging.getLogger("uvicorn.error")
 DATABASE_URL = os.getenv("DATABASE_URL")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "dev-admin-token-12345")
 
+# Where token buckets live: "postgres" (shared by all workers) or "memory" (per process)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "postgres").lower()
+# Reverse proxies in front of the API (1 on Render); the client IP is that many
+# entries from the end of X-Forwarded-For. 0 uses the socket peer address.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+RATE_LIMIT_PRUNE_EVERY = 1000  # Checks between deletions of idle buckets
+RATE_LIMIT_IDLE_SECONDS = 3600  # Idle buckets are full again long before this
+RATE_LIMIT_POOL_SIZE = 4  # Bucket-store connections per API worker
+RATE_LIMIT_POOL_WAIT_SECONDS = 1.0  # Wait for a pooled connection before limiting per process
+RATE_LIMIT_CONNECT_TIMEOUT_SECONDS = 2  # Bound on opening a bucket-store connection
+RATE_LIMIT_DB_RETRY_SECONDS = 30  # Per-process limiting after a bucket-store failure
+
+TELEMETRY_FLUSH_SECONDS = 60.0
+# Histogram upper bounds (ms); the last bucket counts everything slower
+TELEMETRY_LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 60000)
+
 
 # ======================================================================
 # DEPENDENCIES
@@ -58,6 +84,345 @@ def count_studies() -> int:
         return cursor.fetchone()['count']
 
 
+# ======================================================================
+# RATE LIMITING
+# ======================================================================
+
+class RateLimitBudget:
+    """
+    Token bucket parameters for one kind of expensive call
+
+    Each client gets capacity tokens refilled at per_minute; the optional
+    global bucket caps all clients together.
+    """
+    def __init__(self, name: str, capacity: int, per_minute: float,
+                 global_capacity: int = None, global_per_minute: float = None):
+        self.name = name
+        self.capacity = capacity
+        self.per_second = per_minute / 60
+        self.global_capacity = global_capacity
+        self.global_per_second = global_per_minute / 60 if global_per_minute else None
+
+
+class MemoryTokenBuckets:
+    """Token buckets in this process: (tokens, updated) per key"""
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.checks = 0
+
+    def take_all(self, buckets: list, cost: float = 1) -> float:
+        """
+        Take cost tokens from every (key, capacity, per_second) bucket, or from none
+
+        Returns 0 if allowed, else seconds until the slowest bucket has refilled enough.
+        """
+        now = monotonic()
+        with self.lock:
+            self.checks += 1
+            if self.checks % RATE_LIMIT_PRUNE_EVERY == 0:
+                self.prune(now)
+            refilled = {}
+            wait = 0.0
+            for key, capacity, per_second in buckets:
+                tokens, updated = self.buckets.get(key, (capacity, now))
+                refilled[key] = min(capacity, tokens + (now - updated) * per_second)
+                if refilled[key] < cost:
+                    wait = max(wait, (cost - refilled[key]) / per_second)
+            for key, tokens in refilled.items():
+                self.buckets[key] = (tokens if wait else tokens - cost, now)
+            return wait
+
+    def close(self):
+        """Nothing to release (buckets live in this process)"""
+
+    def prune(self, now: float):
+        """Drop idle buckets (they would be full, same as a missing one)"""
+        self.buckets = {key: bucket for key, bucket in self.buckets.items()
+                        if now - bucket[1] < RATE_LIMIT_IDLE_SECONDS}
+
+
+class PostgresTokenBuckets:
+    """
+    Token buckets in rate_limit_buckets, shared by every API worker
+
+    One row per key. A check is one call to take_rate_limit_tokens(), which
+    locks the client and global rows and debits both or neither (the row
+    locks serialize concurrent workers). Checks borrow an autocommit
+    connection from a fixed pool of RATE_LIMIT_POOL_SIZE (opened on first
+    use), so a check costs one round trip rather than a connect and a worker
+    never holds more than the pool. Falls back to per-process buckets if the
+    database is unavailable, and stays on them for RATE_LIMIT_DB_RETRY_SECONDS
+    before trying the database again.
+    """
+    def __init__(self):
+        self.fallback = MemoryTokenBuckets()
+        # One slot per pooled connection; None until the slot's connection is opened
+        self.pool = queue.LifoQueue(maxsize=RATE_LIMIT_POOL_SIZE)
+        for _ in range(RATE_LIMIT_POOL_SIZE):
+            self.pool.put(None)
+        self.lock = threading.Lock()
+        self.checks = 0
+        self.retry_at = 0.0
+
+    def take_all(self, buckets: list, cost: float = 1) -> float:
+        """
+        Take cost tokens from every (key, capacity, per_second) bucket, or from none
+
+        Returns 0 if allowed, else seconds until the slowest bucket has refilled enough.
+        """
+        if monotonic() < self.retry_at:
+            return self.fallback.take_all(buckets, cost)
+        try:
+            conn = self.pool.get(timeout=RATE_LIMIT_POOL_WAIT_SECONDS)
+        except queue.Empty:
+            logger.warning("Shared rate limit pool busy, limiting per process")
+            return self.fallback.take_all(buckets, cost)
+        with self.lock:
+            self.checks += 1
+            prune = self.checks % RATE_LIMIT_PRUNE_EVERY == 0
+        try:
+            if conn is None or conn.closed:
+                conn = psycopg.connect(DATABASE_URL, autocommit=True, row_factory=dict_row,
+                                       connect_timeout=RATE_LIMIT_CONNECT_TIMEOUT_SECONDS)
+            cursor = conn.cursor()
+            if prune:
+                cursor.execute(
+                    "DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - make_interval(secs => %s)",
+                    (RATE_LIMIT_IDLE_SECONDS,)
+                )
+            cursor.execute(
+                "SELECT take_rate_limit_tokens(%s::text[], %s::float8[], %s::float8[], %s) AS wait",
+                ([key for key, _, _ in buckets], [capacity for _, capacity, _ in buckets],
+                 [per_second for _, _, per_second in buckets], cost)
+            )
+            wait = float(cursor.fetchone()["wait"])
+        except Exception as e:
+            # Drop the connection and stay off the database for a while
+            if conn is not None:
+                conn.close()
+            conn = None
+            self.retry_at = monotonic() + RATE_LIMIT_DB_RETRY_SECONDS
+            logger.warning(f"Shared rate limit unavailable, limiting per process for "
+                           f"{RATE_LIMIT_DB_RETRY_SECONDS}s: {e}")
+            return self.fallback.take_all(buckets, cost)
+        finally:
+            self.pool.put(conn)
+        return wait
+
+    def close(self):
+        """Close the pooled connections (app shutdown)"""
+        for _ in range(RATE_LIMIT_POOL_SIZE):
+            conn = self.pool.get()
+            if conn is not None:
+                conn.close()
+        for _ in range(RATE_LIMIT_POOL_SIZE):
+            self.pool.put(None)
+
+
+class TokenBucketLimiter:
+    """Per-client (and optional global) token buckets for RateLimitBudgets"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+
+    def retry_after(self, client: str, budget: RateLimitBudget, cost: float = 1) -> float:
+        """
+        Charge the client and global buckets together; 0 if allowed, else seconds to wait
+
+        A denial by either bucket charges neither, so a client told to retry
+        has not paid for the refused request.
+        """
+        buckets = [(f"{budget.name}:client:{client}", budget.capacity, budget.per_second)]
+        if budget.global_capacity:
+            buckets.append((f"{budget.name}:global", budget.global_capacity, budget.global_per_second))
+        return self.buckets.take_all(buckets, cost)
+
+    def check(self, client: str, budget: RateLimitBudget, cost: float = 1):
+        """Charge the budget or raise 429 with Retry-After"""
+        wait = self.retry_after(client, budget, cost)
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for {budget.name}. Try again in {math.ceil(wait)} seconds.",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    async def check_async(self, client: str, budget: RateLimitBudget, cost: float = 1):
+        """check() without blocking the event loop on the database round trip"""
+        await asyncio.to_thread(self.check, client, budget, cost)
+
+    def close(self):
+        """Release the bucket store's connections (app shutdown)"""
+        self.buckets.close()
+
+
+def create_rate_limiter(backend: str = None) -> TokenBucketLimiter:
+    """Limiter on the configured bucket store (RATE_LIMIT_BACKEND)"""
+    backend = backend or RATE_LIMIT_BACKEND
+    if backend == "memory":
+        return TokenBucketLimiter(MemoryTokenBuckets())
+    if backend == "postgres":
+        return TokenBucketLimiter(PostgresTokenBuckets())
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend!r} (expected postgres or memory)")
+
+
+rate_limiter = create_rate_limiter()
+
+
+def client_key(request: Request) -> str:
+    """Client IP for rate limiting (see TRUSTED_PROXY_HOPS)"""
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+# ======================================================================
+# TELEMETRY
+# ======================================================================
+
+def write_telemetry_rollups(window_start: datetime, rows: list):
+    """Insert one flush window's (metric, labels JSON, count, sum, buckets or None) rows"""
+    if not rows:
+        return
+    with get_db() as conn:
+        cursor = conn.cursor()
+        # executemany is pipelined in psycopg 3: one round trip for the window
+        cursor.executemany("""
+            INSERT INTO telemetry_rollups (window_start, metric, labels, count, sum, buckets)
+            VALUES (%s, %s, %s::jsonb, %s, %s, %s)
+        """, [(window_start, *row) for row in rows])
+
+
+def fetch_telemetry_rollups(hours: float) -> list:
+    """Rollup rows flushed in the last hours"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT metric, labels, count, sum, buckets
+            FROM telemetry_rollups
+            WHERE window_start >= NOW() - make_interval(secs => %s)
+        """, (hours * 3600,))
+        return cursor.fetchall()
+
+
+class Telemetry:
+    """
+    In-process counters and latency histograms, flushed to telemetry_rollups
+
+    Recording only touches a dict under a lock; a background thread writes
+    the aggregated window at most every TELEMETRY_FLUSH_SECONDS (one row per
+    metric and label set), so request paths never wait on the database.
+    A crashed process loses its current window.
+    """
+    def __init__(self, flush_seconds: float = TELEMETRY_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flushing = False
+        self.window_start = datetime.utcnow()
+
+    def count(self, metric: str, value: float = 1, **labels):
+        """Add value to a counter (e.g. tokens, cost_usd, cache hits)"""
+        self.record(metric, value, labels, histogram=False)
+
+    def observe(self, metric: str, value_ms: float, **labels):
+        """Record one latency sample (ms)"""
+        self.record(metric, value_ms, labels, histogram=True)
+
+    def record(self, metric: str, value: float, labels: dict, histogram: bool):
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                buckets = [0] * (len(TELEMETRY_LATENCY_BUCKETS_MS) + 1) if histogram else None
+                entry = self.pending[key] = [0, 0.0, buckets]
+            entry[0] += 1
+            entry[1] += value
+            if entry[2] is not None:
+                entry[2][bisect.bisect_left(TELEMETRY_LATENCY_BUCKETS_MS, value)] += 1
+            due = (datetime.utcnow() - self.window_start).total_seconds() >= self.flush_seconds
+            if not due or self.flushing:
+                return
+            self.flushing = True
+        threading.Thread(target=self.flush, daemon=True).start()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            window_start, self.window_start = self.window_start, datetime.utcnow()
+        rows = [(metric, json.dumps(dict(labels)), entry[0], entry[1], entry[2])
+                for (metric, labels), entry in pending.items()]
+        try:
+            write_telemetry_rollups(window_start, rows)
+        except Exception as e:
+            logger.warning(f"Failed to flush {len(rows)} telemetry rollups: {e}")
+        finally:
+            with self.lock:
+                self.flushing = False
+
+
+telemetry = Telemetry()
+
+
+def histogram_percentile(buckets: list, fraction: float) -> Optional[float]:
+    """Upper bound (ms) of the bucket holding the given fraction of samples (None past the last bound)"""
+    total = sum(buckets)
+    if not total:
+        return None
+    running = 0
+    for bound, n in zip(TELEMETRY_LATENCY_BUCKETS_MS, buckets):
+        running += n
+        if running >= fraction * total:
+            return bound
+    return None
+
+
+def summarize_telemetry(hours: float = 24) -> dict:
+    """
+    Totals per metric and label set over the last hours, plus cost per 1k page views
+
+    Costs are the cost_usd counters recorded at call time; page views are
+    all page_views counters: POST /search (page="search") and study detail
+    reads (page="study"), the two requests that drive embedding and AI spend.
+    Per-page counts are in metrics.
+    """
+    totals = {}
+    for row in fetch_telemetry_rollups(hours):
+        labels = row["labels"] or {}
+        key = (row["metric"], json.dumps(labels, sort_keys=True))
+        entry = totals.setdefault(key, {"metric": row["metric"], "labels": labels, "count": 0, "sum": 0.0,
+                                        "buckets": None})
+        entry["count"] += row["count"]
+        entry["sum"] += row["sum"]
+        if row["buckets"]:
+            entry["buckets"] = [a + b for a, b in zip(entry["buckets"] or [0] * len(row["buckets"]), row["buckets"])]
+
+    metrics = []
+    for entry in sorted(totals.values(), key=lambda e: (e["metric"], json.dumps(e["labels"], sort_keys=True))):
+        summary = {"metric": entry["metric"], "labels": entry["labels"], "count": entry["count"],
+                   "sum": round(entry["sum"], 6)}
+        if entry["buckets"]:
+            summary["mean_ms"] = round(entry["sum"] / entry["count"], 1) if entry["count"] else None
+            summary["p50_ms"] = histogram_percentile(entry["buckets"], 0.5)
+            summary["p95_ms"] = histogram_percentile(entry["buckets"], 0.95)
+        metrics.append(summary)
+
+    def total(metric: str) -> float:
+        return sum(e["sum"] for e in totals.values() if e["metric"] == metric)
+
+    cost = total("cost_usd")
+    page_views = total("page_views")
+    return {
+        "hours": hours,
+        "cost_usd": round(cost, 4),
+        "page_views": int(page_views),
+        "cost_per_1k_page_views_usd": round(1000 * cost / page_views, 4) if page_views else None,
+        "metrics": metrics,
+    }
+
+
 # ======================================================================
 # CORS CONFIGURATION
 # ======================================================================
@@ -99,12 +464,28 @@ def register_health_route(app: FastAPI):
         return {"status": "healthy", "total_studies": count_studies(), "database": "supabase-postgres"}
 
 
+def register_telemetry_routes(app: FastAPI):
+    """Register the admin telemetry summary and flush on shutdown"""
+
+    @app.get("/admin/telemetry")
+    def get_telemetry(hours: float = 24, x_admin_token: Optional[str] = Header(None)):
+        """AI/embedding usage, cost, latency and cache efficiency (admin only)"""
+        if x_admin_token != ADMIN_TOKEN:
+            raise HTTPException(status_code=401, detail="Invalid or missing admin token")
+
+        return summarize_telemetry(hours=min(max(hours, 0.1), 24 * 90))
+
+    @app.on_event("shutdown")
+    def flush_telemetry():
+        telemetry.flush()
+
+
 # ======================================================================
 # STARTUP
 # ======================================================================
 
 def register_startup_handler(app: FastAPI):
-    """Register startup event handler"""
+    """Register startup and shutdown event handlers"""
 
     @app.on_event("startup")
     def startup_event():
@@ -124,3 +505,8 @@ def register_startup_handler(app: FastAPI):
             print("Make sure Supabase is running: supabase start")
 
         print("Application ready.")
+
+    @app.on_event("shutdown")
+    def shutdown_event():
+        """Close the shared rate limit's connections"""
+        rate_limiter.close()
@@ -0,0 +1,478 @@
+"""
+RECOMMENDATION MODULE
+Owns precomputed per-user study recommendations.
+
+Boundaries:
+- Profiles: profile conditions, age/sex and match answers -> scoring inputs
+- Scoring: profile-text similarity + condition overlap, filtered by structured eligibility
+- Storage: user_recommendations (read directly by the frontend under RLS),
+  refreshed from recommendation_queue and the studies
+  recommendation_inputs_changed_at watermark
+"""
+import hashlib
+import logging
+from typing import List, Optional
+
+from platform_module import get_db
+from search_module import (
+    OPEN_RECRUITING_STATUSES,
+    EmbeddingProvider,
+    SearchRequest,
+    batch_by_token_budget,
+    eligibility_filter_sql,
+    vector_literal,
+)
+
+# Configure logger
+logger = logging.getLogger("uvicorn.error")
+
+
+# ======================================================================
+# CONFIG
+# ======================================================================
+
+RECOMMENDATIONS_PER_USER = 50
+RECOMMENDATION_CANDIDATES = 300  # Studies considered per source (nearest vectors, condition keyword hits)
+# score = similarity weight * cosine similarity + conditions weight * share of profile conditions matched
+RECOMMENDATION_WEIGHTS = {"similarity": 0.6, "conditions": 0.4}
+
+RECOMMENDATION_BATCH_SIZE = 100  # Users refreshed per transaction
+RECOMMENDATION_QUEUE_MAX_ATTEMPTS = 5
+RECOMMENDATION_LEASE_SECONDS = 300
+# More updated studies than this (a bulk ingest or re-embedding) re-queues every
+# user instead of scoring each new study against each profile
+RECOMMENDATION_MERGE_MAX_STUDIES = 500
+# Only studies updated at least this long ago are merged, so rows of an ingest
+# transaction still committing (recommendation_inputs_changed_at is its start time)
+# are not skipped
+RECOMMENDATION_SYNC_SETTLE_SECONDS = 300
+
+# Free-text profile fields embedded with the conditions (label, column)
+PROFILE_TEXT_FIELDS = (
+    ("medications", "medications"),
+    ("previous trials", "previous_trials"),
+    ("trial experience", "trial_experience"),
+    ("notes", "additional_notes"),
+)
+
+
+# ======================================================================
+# SERVICE
+# ======================================================================
+
+def profile_conditions(profile: dict) -> List[str]:
+    """Listed conditions with 'Other' replaced by the free-text other_condition entries"""
+    names = [c for c in (profile.get("conditions") or []) if c and c.lower() != "other"]
+    names += (profile.get("other_condition") or "").split(",")
+    seen = set()
+    conditions = []
+    for name in (n.strip() for n in names):
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            conditions.append(name)
+    return conditions
+
+
+def flatten_answers(answers, prefix: str = "") -> List[str]:
+    """Match questionnaire answers as 'question: answer' lines (nested objects are dotted)"""
+    if isinstance(answers, dict):
+        return [line for key, value in answers.items() for line in flatten_answers(value, f"{prefix}{key}.")]
+    if isinstance(answers, list):
+        answers = ", ".join(str(a) for a in answers if a not in (None, ""))
+    if answers in (None, "", False):
+        return []
+    return [f"{prefix.rstrip('.').replace('_', ' ')}: {answers}"]
+
+
+def build_profile_text(profile: dict) -> str:
+    """Text embedded for a user (lowercased like search queries); empty when the profile says nothing"""
+    parts = []
+    conditions = profile_conditions(profile)
+    if conditions:
+        parts.append("conditions: " + ", ".join(conditions))
+    for label, column in PROFILE_TEXT_FIELDS:
+        value = (profile.get(column) or "").strip()
+        if value:
+            parts.append(f"{label}: {value}")
+    parts += flatten_answers(profile.get("answers") or {})
+    return " | ".join(parts).lower()
+
+
+def profile_eligibility(profile: dict) -> SearchRequest:
+    """Profile age/gender as the search eligibility filters (unusable values are dropped)"""
+    age = profile.get("age")
+    gender = (profile.get("gender") or "").lower()
+    return SearchRequest(
+        age=age if isinstance(age, int) and 0 <= age <= 120 else None,
+        sex=gender if gender in ("female", "male") else None
+    )
+
+
+def like_pattern(term: str) -> str:
+    """ILIKE pattern matching term anywhere (wildcards in the term are literal)"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def refresh_user_recommendations(user_ids: List[str], provider: EmbeddingProvider) -> int:
+    """
+    Recompute the recommendations of users from their current profiles
+
+    Profile texts are embedded only when they changed since the last refresh
+    (profile_hash) or the embedding provider changed. Returns users refreshed.
+    """
+    profiles = fetch_recommendation_profiles(user_ids)
+    states = []
+    to_embed = []
+    for profile in profiles:
+        text = build_profile_text(profile)
+        profile_hash = hashlib.md5(text.encode("utf-8")).hexdigest() if text else None
+        eligibility = profile_eligibility(profile)
+        state = {
+            "user_id": profile["id"],
+            "age": eligibility.age,
+            "sex": eligibility.sex,
+            "conditions": profile_conditions(profile),
+            "profile_hash": profile_hash,
+            "embedding": None,
+            "embedding_model": None,
+        }
+        if profile_hash and (profile_hash != profile["profile_hash"]
+                             or profile["embedding_model"] != provider.model_name):
+            to_embed.append((state, text))
+        states.append(state)
+
+    texts = [text for _, text in to_embed]
+    for indices in batch_by_token_budget(texts):
+        vectors = provider.embed([texts[i] for i in indices])
+        for i, vector in zip(indices, vectors):
+            to_embed[i][0]["embedding"] = vector_literal(vector)
+            to_embed[i][0]["embedding_model"] = provider.model_name
+
+    replace_user_recommendations(states, provider)
+    return len(states)
+
+
+def refresh_queued_recommendations(provider: EmbeddingProvider,
+                                   batch_size: int = RECOMMENDATION_BATCH_SIZE) -> dict:
+    """Drain recommendation_queue; a failing batch is counted against its users and skipped"""
+    stats = {"refreshed": 0, "failed": 0}
+    while True:
+        user_ids = claim_recommendation_queue(batch_size, RECOMMENDATION_QUEUE_MAX_ATTEMPTS,
+                                              RECOMMENDATION_LEASE_SECONDS)
+        if not user_ids:
+            return stats
+        try:
+            stats["refreshed"] += refresh_user_recommendations(user_ids, provider)
+            complete_recommendation_queue(user_ids)
+        except Exception as e:
+            logger.warning(f"Recommendation refresh of {len(user_ids)} users failed: {e}")
+            record_recommendation_failures(user_ids, str(e))
+            stats["failed"] += len(user_ids)
+
+
+def sync_updated_studies(provider: EmbeddingProvider) -> dict:
+    """
+    Fold studies whose scoring inputs changed since the watermark into existing recommendations
+
+    A handful of studies is scored against every stored profile in SQL; a
+    bulk change (more than RECOMMENDATION_MERGE_MAX_STUDIES) re-queues all
+    users instead, whose refresh uses the vector index.
+    """
+    since, until, count = fetch_updated_study_window(RECOMMENDATION_SYNC_SETTLE_SECONDS)
+    if not count:
+        set_recommendation_watermark(until)
+        return {"studies": 0, "users": 0, "requeued": 0}
+    if count > RECOMMENDATION_MERGE_MAX_STUDIES:
+        requeued = enqueue_all_recommendations()
+        set_recommendation_watermark(until)
+        return {"studies": count, "users": 0, "requeued": requeued}
+    users = merge_updated_studies(since, until, provider)
+    set_recommendation_watermark(until)
+    return {"studies": count, "users": users, "requeued": 0}
+
+
+# ======================================================================
+# REPO
+# ======================================================================
+
+def claim_recommendation_queue(limit: int, max_attempts: int, lease_seconds: int) -> List[str]:
+    """Lease the oldest unclaimed queued users (SKIP LOCKED, like the embedding queue)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH claimable AS (
+                SELECT user_id
+                FROM recommendation_queue
+                WHERE attempts < %s AND (claimed_until IS NULL OR claimed_until < NOW())
+                ORDER BY enqueued_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE recommendation_queue q
+            SET claimed_until = NOW() + make_interval(secs => %s)
+            FROM claimable c
+            WHERE q.user_id = c.user_id
+            RETURNING q.user_id
+        """, (max_attempts, limit, lease_seconds))
+        return [str(row["user_id"]) for row in cursor.fetchall()]
+
+
+def complete_recommendation_queue(user_ids: List[str]):
+    """Dequeue refreshed users, except those re-queued (lease cleared) while in flight"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM recommendation_queue
+            WHERE user_id = ANY(%s::uuid[]) AND claimed_until IS NOT NULL
+        """, (user_ids,))
+
+
+def record_recommendation_failures(user_ids: List[str], error: str):
+    """Count a failed attempt for queued users and release their lease"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE recommendation_queue
+            SET attempts = attempts + 1, last_error = %s, claimed_until = NULL
+            WHERE user_id = ANY(%s::uuid[])
+        """, (error[:500], user_ids))
+
+
+def enqueue_all_recommendations() -> int:
+    """Queue every user with a profile (after bulk study changes or a scoring change)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO recommendation_queue (user_id)
+            SELECT id FROM user_profiles
+            ON CONFLICT (user_id) DO UPDATE
+            SET enqueued_at = NOW(), attempts = 0, last_error = NULL, claimed_until = NULL
+        """)
+        return cursor.rowcount
+
+
+def count_recommendation_queue(max_attempts: int = RECOMMENDATION_QUEUE_MAX_ATTEMPTS) -> int:
+    """Queued users still eligible for another refresh attempt"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) AS count FROM recommendation_queue WHERE attempts < %s", (max_attempts,))
+        return cursor.fetchone()["count"]
+
+
+def fetch_recommendation_profiles(user_ids: List[str]) -> list:
+    """Profiles, match answers and last refresh state of users"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT p.id::text AS id, p.age, p.gender, p.conditions, p.other_condition, p.medications,
+                   p.previous_trials, p.trial_experience, p.additional_notes, a.answers,
+                   st.profile_hash, st.embedding_model
+            FROM user_profiles p
+            LEFT JOIN user_match_answers a ON a.user_id = p.id
+            LEFT JOIN user_recommendation_state st ON st.user_id = p.id
+            WHERE p.id = ANY(%s::uuid[])
+        """, (user_ids,))
+        return cursor.fetchall()
+
+
+def recommendation_query(has_embedding: bool, has_conditions: bool, filter_sql: str, dim: int) -> Optional[str]:
+    """
+    INSERT ... SELECT of one user's top studies, or None without any signal
+
+    Candidates are the nearest studies to the profile vector plus studies whose
+    text mentions a profile condition (trigram index on search_text); both
+    honour the age/sex filters and only take studies open to enrolment.
+    """
+    profile_vector = f"(SELECT embedding::vector({dim}) FROM user_recommendation_state WHERE user_id = %(user_id)s::uuid)"
+    distance = f"s.embedding::vector({dim}) <=> {profile_vector}"
+    filters = f"AND s.is_published = TRUE{filter_sql} AND upper(s.recruiting_status) = ANY(%(open)s)"
+
+    sources = []
+    if has_embedding:
+        sources.append(f"""(SELECT s.id FROM studies s
+            WHERE s.embedding IS NOT NULL AND s.embedding_model = %(model)s {filters}
+            ORDER BY {distance}
+            LIMIT %(candidates)s)""")
+    if has_conditions:
+        order = f"ORDER BY CASE WHEN s.embedding_model = %(model)s THEN {distance} END" if has_embedding else ""
+        sources.append(f"""(SELECT s.id FROM studies s
+            WHERE s.search_text ILIKE ANY(%(patterns)s) {filters}
+            {order}
+            LIMIT %(candidates)s)""")
+    if not sources:
+        return None
+
+    similarity = f"CASE WHEN s.embedding_model = %(model)s THEN 1 - ({distance}) ELSE 0 END" if has_embedding else "0"
+    return f"""
+        INSERT INTO user_recommendations (user_id, study_id, score, similarity, matched_conditions)
+        SELECT %(user_id)s::uuid, id,
+               %(w_similarity)s * similarity
+               + %(w_conditions)s * cardinality(matched)::real / GREATEST(cardinality(%(conditions)s::text[]), 1),
+               similarity, matched
+        FROM (
+            SELECT s.id, {similarity} AS similarity,
+                   ARRAY(SELECT p FROM unnest(%(conditions)s::text[]) p
+                         WHERE EXISTS (SELECT 1 FROM unnest(s.conditions) c WHERE strpos(lower(c), lower(p)) > 0)) AS matched
+            FROM ({" UNION ".join(sources)}) candidates
+            JOIN studies s ON s.id = candidates.id
+        ) scored
+        ORDER BY 3 DESC
+        LIMIT %(top)s
+    """
+
+
+def replace_user_recommendations(states: List[dict], provider: EmbeddingProvider):
+    """
+    Store refreshed profile state and swap in each user's new top studies
+
+    One transaction per batch: readers see either the old or the new list.
+    A state without a new embedding keeps its stored one (unchanged profile
+    text); an empty profile clears it.
+    """
+    if not states:
+        return
+    dim = int(provider.dimension)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO user_recommendation_state
+                (user_id, age, sex, conditions, profile_hash, embedding, embedding_model, computed_at)
+            VALUES (%(user_id)s::uuid, %(age)s, %(sex)s::eligible_sex, %(conditions)s, %(profile_hash)s,
+                    %(embedding)s::vector, %(embedding_model)s, NOW())
+            ON CONFLICT (user_id) DO UPDATE
+            SET age = EXCLUDED.age,
+                sex = EXCLUDED.sex,
+                conditions = EXCLUDED.conditions,
+                profile_hash = EXCLUDED.profile_hash,
+                embedding = CASE WHEN EXCLUDED.profile_hash IS NULL THEN NULL
+                                 ELSE COALESCE(EXCLUDED.embedding, user_recommendation_state.embedding) END,
+                embedding_model = CASE WHEN EXCLUDED.profile_hash IS NULL THEN NULL
+                                       ELSE COALESCE(EXCLUDED.embedding_model, user_recommendation_state.embedding_model) END,
+                computed_at = NOW()
+        """, states)
+        cursor.execute("DELETE FROM user_recommendations WHERE user_id = ANY(%s::uuid[])",
+                       ([s["user_id"] for s in states],))
+        for state in states:
+            eligibility = SearchRequest(age=state["age"], sex=state["sex"])
+            filter_sql, filter_params = eligibility_filter_sql(eligibility, table="s")
+            query = recommendation_query(bool(state["profile_hash"]), bool(state["conditions"]), filter_sql, dim)
+            if query is None:
+                continue
+            cursor.execute(query, {
+                "user_id": state["user_id"],
+                "model": provider.model_name,
+                "conditions": state["conditions"],
+                "patterns": [like_pattern(c) for c in state["conditions"]],
+                "open": OPEN_RECRUITING_STATUSES,
+                "candidates": RECOMMENDATION_CANDIDATES,
+                "top": RECOMMENDATIONS_PER_USER,
+                "w_similarity": RECOMMENDATION_WEIGHTS["similarity"],
+                "w_conditions": RECOMMENDATION_WEIGHTS["conditions"],
+                **filter_params,
+            })
+
+
+def fetch_updated_study_window(settle_seconds: int) -> tuple:
+    """(since, until, studies whose inputs changed in between): from the watermark to settle_seconds ago"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT st.studies_synced_until AS since, w.until, COUNT(s.id) AS count
+            FROM recommendation_sync_state st
+            CROSS JOIN (SELECT NOW() - make_interval(secs => %s) AS until) w
+            LEFT JOIN studies s ON s.recommendation_inputs_changed_at > st.studies_synced_until
+                               AND s.recommendation_inputs_changed_at <= w.until
+            GROUP BY st.studies_synced_until, w.until
+        """, (settle_seconds,))
+        row = cursor.fetchone()
+        return row["since"], row["until"], row["count"]
+
+
+def set_recommendation_watermark(until):
+    """Input changes up to `until` are reflected in recommendations"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE recommendation_sync_state
+            SET studies_synced_until = GREATEST(studies_synced_until, %s), last_synced_at = NOW()
+        """, (until,))
+
+
+def merge_updated_studies(since, until, provider: EmbeddingProvider) -> int:
+    """
+    Rescore studies whose inputs changed in (since, until] for every stored profile
+
+    Their old rows are dropped first (the study may have closed or changed its
+    eligibility); a study is only inserted where it beats the user's current
+    last place, and lists are trimmed back to RECOMMENDATIONS_PER_USER. Age/sex
+    use the same rule as eligibility_filter_sql. Returns users whose lists changed.
+    """
+    dim = int(provider.dimension)
+    params = {
+        "since": since,
+        "until": until,
+        "model": provider.model_name,
+        "open": OPEN_RECRUITING_STATUSES,
+        "top": RECOMMENDATIONS_PER_USER,
+        "w_similarity": RECOMMENDATION_WEIGHTS["similarity"],
+        "w_conditions": RECOMMENDATION_WEIGHTS["conditions"],
+    }
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM user_recommendations
+            WHERE study_id IN (SELECT id FROM studies
+                               WHERE recommendation_inputs_changed_at > %(since)s
+                                 AND recommendation_inputs_changed_at <= %(until)s)
+        """, params)
+        cursor.execute(f"""
+            WITH scored AS (
+                SELECT st.user_id, s.id AS study_id, st.conditions,
+                       CASE WHEN st.embedding_model = %(model)s AND s.embedding_model = %(model)s
+                            THEN 1 - (s.embedding::vector({dim}) <=> st.embedding::vector({dim})) ELSE 0 END AS similarity,
+                       ARRAY(SELECT p FROM unnest(st.conditions) p
+                             WHERE EXISTS (SELECT 1 FROM unnest(s.conditions) c WHERE strpos(lower(c), lower(p)) > 0)) AS matched
+                FROM studies s
+                CROSS JOIN user_recommendation_state st
+                WHERE s.recommendation_inputs_changed_at > %(since)s AND s.recommendation_inputs_changed_at <= %(until)s
+                  AND s.is_published = TRUE
+                  AND upper(s.recruiting_status) = ANY(%(open)s)
+                  AND (st.embedding IS NOT NULL OR cardinality(st.conditions) > 0)
+                  AND (st.age IS NULL OR s.min_age_months IS NULL OR s.min_age_months <= st.age * 12 + 11)
+                  AND (st.age IS NULL OR s.max_age_months IS NULL OR s.max_age_months >= st.age * 12)
+                  AND (st.sex IS NULL OR s.eligible_sex IS NULL OR s.eligible_sex IN ('all', st.sex))
+            ), ranked AS (
+                SELECT scored.*,
+                       %(w_similarity)s * similarity
+                       + %(w_conditions)s * cardinality(matched)::real / GREATEST(cardinality(conditions), 1) AS score
+                FROM scored
+                WHERE similarity > 0 OR cardinality(matched) > 0
+            ), inserted AS (
+                INSERT INTO user_recommendations (user_id, study_id, score, similarity, matched_conditions)
+                SELECT r.user_id, r.study_id, r.score, r.similarity, r.matched
+                FROM ranked r
+                LEFT JOIN LATERAL (
+                    SELECT score FROM user_recommendations u
+                    WHERE u.user_id = r.user_id
+                    ORDER BY score DESC
+                    OFFSET %(top)s - 1 LIMIT 1
+                ) last_place ON TRUE
+                WHERE last_place.score IS NULL OR r.score > last_place.score
+                RETURNING user_id
+            )
+            SELECT DISTINCT user_id FROM inserted
+        """, params)
+        user_ids = [row["user_id"] for row in cursor.fetchall()]
+        if user_ids:
+            cursor.execute("""
+                DELETE FROM user_recommendations u
+                USING (
+                    SELECT user_id, study_id,
+                           row_number() OVER (PARTITION BY user_id ORDER BY score DESC) AS rank
+                    FROM user_recommendations
+                    WHERE user_id = ANY(%(users)s)
+                ) ranked
+                WHERE u.user_id = ranked.user_id AND u.study_id = ranked.study_id AND ranked.rank > %(top)s
+            """, {"users": user_ids, "top": RECOMMENDATIONS_PER_USER})
+        return len(user_ids)
@@ -7,17 +7,24 @@ Boundaries:
 - Ingestion: CT.gov data fetch and normalization (helpers only; scripts live in scripts/)
 - Study data: CRUD operations for studies table
 """
+import asyncio
+import bisect
+import gzip
+import hashlib
 import json
 import os
 import logging
+import threading
+from collections import Counter
 from datetime import datetime
+from time import perf_counter
 from typing import Optional, List
 
 from psycopg.types.json import Jsonb
-from fastapi import FastAPI, HTTPException, Header
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Header, Request
+from pydantic import BaseModel, Field, ValidationError
 
-from platform_module import get_db, ADMIN_TOKEN
+from platform_module import get_db, ADMIN_TOKEN, RateLimitBudget, client_key, rate_limiter, telemetry
 
 # Configure logger
 logger = logging.getLogger("uvicorn.error")
@@ -29,14 +36,110 @@ logger = logging.getLogger("uvicorn.error")
 
 # Feature flag for semantic search
 USE_SEMANTIC_SEARCH = os.getenv("USE_SEMANTIC_SEARCH", "false").lower() == "true"
-
-# CT.gov API configuration
-CTGOV_API_BASE = "https://clinicaltrials.gov/api/v2"
+# Remote query embeddings per client (token buckets shared by all workers); over
+# budget, search falls back to keyword-only instead of failing
+QUERY_EMBEDDING_RATE_LIMIT = RateLimitBudget("embedding:query", capacity=60, per_minute=60,
+                                             global_capacity=1000, global_per_minute=1000)
+
+# In-process embedding worker (drains embedding_queue; see register_embedding_worker)
+EMBEDDING_WORKER_ENABLED = os.getenv("EMBEDDING_WORKER_ENABLED", "false").lower() == "true"
+EMBEDDING_WORKER_BATCH_SIZE = int(os.getenv("EMBEDDING_WORKER_BATCH_SIZE", "100"))
+EMBEDDING_WORKER_CONCURRENCY = int(os.getenv("EMBEDDING_WORKER_CONCURRENCY", "2"))
+EMBEDDING_WORKER_POLL_SECONDS = 30.0  # Fallback poll if a NOTIFY is missed
+EMBEDDING_WORKER_DEBOUNCE_SECONDS = 0.5  # Gather rows from the same burst into one batch
+EMBEDDING_WORKER_LEASE_SECONDS = 120
+EMBEDDING_QUEUE_MAX_ATTEMPTS = 5
+
+# Search exposure counters (how often each study is shown; prioritizes AI precompute)
+SEARCH_EXPOSURE_TOP_N = 20  # Results counted per search (what a user actually sees)
+SEARCH_EXPOSURE_FLUSH_SECONDS = 30.0
+
+# Saved search alerts (ingest hook matching changed studies against saved searches)
+SAVED_SEARCH_RELOAD_SECONDS = 60.0  # How often an ingest run checks saved_searches for changes
+
+# Only studies in these states (compared upper-case) are alerted on, recommended or
+# listed as similar; closed, UNKNOWN, missing and any new CT.gov statuses are left out
+OPEN_RECRUITING_STATUSES = ["RECRUITING", "NOT_YET_RECRUITING", "ENROLLING_BY_INVITATION"]
+
+# Precomputed similar studies (study_neighbors; refreshed by scripts/refresh_study_neighbors.py)
+STUDY_NEIGHBORS_K = 50  # Stored per study; unpublished and not-recruiting neighbors are dropped at read time
+SIMILAR_STUDIES_MAX_LIMIT = 20
+# Similarity block size in matrix elements (about 16 bytes of scratch each: scores + top-k indices)
+STUDY_NEIGHBORS_BLOCK_ELEMENTS = int(os.getenv("STUDY_NEIGHBORS_BLOCK_ELEMENTS", "16000000"))
+# More changed embeddings than this share of all studies rebuilds every list instead of merging
+STUDY_NEIGHBORS_FULL_REBUILD_FRACTION = 0.2
+
+# CT.gov API configuration (override to point ingestion at a local fixture server)
+CTGOV_API_BASE = os.getenv("CTGOV_API_BASE", "https://clinicaltrials.gov/api/v2")
+
+# Embedding provider: "openai" (default), "local" (hashing embedder, CPU, no network)
+# or "onnx" (sentence-embedding model on disk; needs onnxruntime + tokenizers)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+LOCAL_EMBEDDING_DIMENSION = int(os.getenv("LOCAL_EMBEDDING_DIMENSION", "384"))
+EMBEDDING_ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_MODEL_DIR")
 
 # OpenAI embeddings configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. http://localhost:8765/v1 for the fixture server
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIMENSION = 1536
+EMBEDDING_PRICE_PER_MTOK = 0.02  # USD, telemetry cost_usd
+
+# Multi-vector mode: long fields are split into passages embedded into study_chunks,
+# and semantic search ranks each study by its best-matching passage (max-sim)
+USE_CHUNKED_EMBEDDINGS = os.getenv("USE_CHUNKED_EMBEDDINGS", "false").lower() == "true"
+CHUNK_MAX_TOKENS = 200  # Passage size: small enough to stay topical, large enough for criteria lists
+CHUNK_OVERLAP_TOKENS = 30  # Trailing context carried into the next passage
+MAX_CHUNKS_PER_FIELD = 12  # Caps embedding cost for outlier documents
+CHUNK_FIELDS = (("detailed_description", "description"), ("eligibility_criteria", "eligibility"))
+# md5 of the chunked source text; study_chunks rows with another hash are stale
+CHUNK_SOURCE_HASH_SQL = (
+    "md5(COALESCE(s.title, '') || chr(31) || COALESCE(s.detailed_description, '') "
+    "|| chr(31) || COALESCE(s.eligibility_criteria, ''))"
+)
+
+# Embedding request limits. Batches are cut by estimated tokens, not by count:
+# OpenAI caps a single input at 8191 tokens and a request at 300k tokens / 2048 inputs
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+EMBEDDING_REQUEST_TOKEN_BUDGET = int(os.getenv("EMBEDDING_REQUEST_TOKEN_BUDGET", "100000"))
+EMBEDDING_MAX_INPUTS_PER_REQUEST = 2048
+
+# Column order for bulk COPY writes of studies (see study_to_row / normalize_ctgov_study_row)
+STUDY_COPY_COLUMNS = (
+    "source", "source_id", "title", "brief_summary", "detailed_description",
+    "eligibility_criteria", "recruiting_status", "study_type", "interventions",
+    "conditions", "locations", "contacts", "site_zips", "min_age_months", "max_age_months",
+    "eligible_sex", "healthy_volunteers", "raw_document", "content_hash"
+)
+STUDY_JSONB_COLUMNS = ("interventions", "locations", "contacts")
+# raw_document (gzip bytes) goes to study_raw_documents, everything else to studies
+STUDY_TABLE_COLUMNS = tuple(c for c in STUDY_COPY_COLUMNS if c != "raw_document")
+
+# Explicit studies columns for API reads (keeps embeddings and search_text off the wire)
+STUDY_SELECT_COLUMNS = """
+    id, source, source_id, join_flow_key, auto_approve_participation, title,
+    brief_summary, detailed_description, eligibility_criteria, recruiting_status,
+    study_type, interventions, conditions, locations, contacts, site_zips, media,
+    last_synced_at, created_at, updated_at, description, ai_plain_title,
+    ai_plain_summary, ai_eligibility_quiz, ai_cache_version, ai_cached_at, tasks,
+    min_age_months, max_age_months, eligible_sex, healthy_volunteers
+"""
+
+RAW_DOCUMENT_GZIP_LEVEL = 6
+
+# Normalized fields covered by studies.content_hash (raw_json is deliberately excluded:
+# CT.gov bumps bookkeeping fields we never read)
+CONTENT_HASH_FIELDS = (
+    "title", "description", "brief_summary", "detailed_description", "eligibility_criteria",
+    "recruiting_status", "study_type", "interventions", "conditions", "locations",
+    "contacts", "site_zips", "min_age_months", "max_age_months", "eligible_sex", "healthy_volunteers"
+)
+
+# CT.gov age units in months (ages are stored as whole months; "N/A" means no limit)
+CTGOV_AGE_UNIT_MONTHS = {
+    "year": 12.0, "month": 1.0, "week": 12 / 52.1775, "day": 12 / 365.25, "hour": 0.0, "minute": 0.0,
+}
+ELIGIBLE_SEX_VALUES = ("all", "female", "male")
 
 
 # ======================================================================
@@ -88,10 +191,15 @@ class StudyCreate(BaseModel):
     locations: List[Location] = Field(default_factory=list)
     contacts: List[Contact] = Field(default_factory=list)
     site_zips: List[str] = Field(default_factory=list)
+    min_age_months: Optional[int] = Field(default=None, ge=0)
+    max_age_months: Optional[int] = Field(default=None, ge=0)
+    eligible_sex: Optional[str] = Field(default=None, pattern="^(all|female|male)$")
+    healthy_volunteers: Optional[bool] = None
     media: List[dict] = Field(default_factory=list)
     source: str = "internal"
     source_id: Optional[str] = None
     raw_json: Optional[str] = None
+    content_hash: Optional[str] = None
 
 
 class Study(BaseModel):
@@ -112,6 +220,10 @@ class Study(BaseModel):
     locations: List[Location]
     contacts: List[Contact]
     site_zips: List[str]
+    min_age_months: Optional[int] = None
+    max_age_months: Optional[int] = None
+    eligible_sex: Optional[str] = None
+    healthy_volunteers: Optional[bool] = None
     media: List[dict] = Field(default_factory=list)
     raw_json: Optional[str] = None
     last_synced_at: Optional[str] = None
@@ -132,6 +244,10 @@ class SearchRequest(BaseModel):
     conditions_include: List[str] = Field(default_factory=list)
     conditions_exclude: List[str] = Field(default_factory=list)
     query_text: Optional[str] = None
+    # Searcher's age (years) and sex: only studies they could enter are returned
+    # (studies without structured eligibility are kept)
+    age: Optional[int] = Field(default=None, ge=0, le=120)
+    sex: Optional[str] = Field(default=None, pattern="^(female|male)$")
     page: int = Field(default=1, ge=1)
     limit: int = Field(default=10, ge=1, le=100)
 
@@ -156,22 +272,61 @@ class SearchResponse(BaseModel):
     total: int
 
 
+class SimilarStudy(BaseModel):
+    """Precomputed nearest study by embedding similarity"""
+    study_id: int
+    title: str
+    plain_title: Optional[str] = None
+    similarity: float
+    recruiting_status: Optional[str] = None
+    conditions: List[str] = Field(default_factory=list)
+
+
+class IngestJob(BaseModel):
+    """CT.gov ingestion job with progress"""
+    id: int
+    condition: str
+    mode: str
+    status: str
+    pages_fetched: int
+    max_pages: int
+    total_expected: Optional[int] = None
+    processed: int
+    inserted: int
+    updated: int
+    unchanged: int
+    skipped: int
+    failed: int
+    studies_per_second: float
+    percent_complete: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    last_error: Optional[str] = None
+    started_at: str
+    updated_at: str
+    finished_at: Optional[str] = None
+
+
 # ======================================================================
 # DEPENDENCIES
 # ======================================================================
 
 # --- CT.gov API Client ---
 
-def fetch_studies_from_ctgov(
+def build_ctgov_params(
     query_cond: Optional[str] = None,
     page_size: int = 100,
     page_token: Optional[str] = None,
-    recruiting_status: Optional[str] = None
+    recruiting_status: Optional[str] = None,
+    updated_since: Optional[str] = None,
+    count_total: bool = False
 ) -> dict:
-    """Fetch studies from ClinicalTrials.gov API v2"""
-    import requests
+    """
+    Build query params for the CT.gov /studies endpoint
 
-    url = f"{CTGOV_API_BASE}/studies"
+    updated_since (YYYY-MM-DD) restricts results to studies whose
+    lastUpdatePostDate is on or after that date, oldest first.
+    count_total asks CT.gov to include totalCount (first page only).
+    """
     params = {
         "format": "json",
         "pageSize": min(page_size, 1000)
@@ -183,6 +338,28 @@ def fetch_studies_from_ctgov(
         params["filter.overallStatus"] = recruiting_status
     if page_token:
         params["pageToken"] = page_token
+    if updated_since:
+        params["filter.advanced"] = f"AREA[LastUpdatePostDate]RANGE[{updated_since},MAX]"
+        params["sort"] = "LastUpdatePostDate"
+    if count_total:
+        params["countTotal"] = "true"
+
+    return params
+
+
+def fetch_studies_from_ctgov(
+    query_cond: Optional[str] = None,
+    page_size: int = 100,
+    page_token: Optional[str] = None,
+    recruiting_status: Optional[str] = None,
+    updated_since: Optional[str] = None,
+    count_total: bool = False
+) -> dict:
+    """Fetch studies from ClinicalTrials.gov API v2"""
+    import requests
+
+    url = f"{CTGOV_API_BASE}/studies"
+    params = build_ctgov_params(query_cond, page_size, page_token, recruiting_status, updated_since, count_total)
 
     response = requests.get(url, params=params, timeout=30)
     response.raise_for_status()
@@ -190,7 +367,32 @@ def fetch_studies_from_ctgov(
     data = response.json()
     return {
         "studies": data.get("studies", []),
-        "nextPageToken": data.get("nextPageToken")
+        "nextPageToken": data.get("nextPageToken"),
+        "totalCount": data.get("totalCount")
+    }
+
+
+async def fetch_studies_from_ctgov_async(
+    client,
+    query_cond: Optional[str] = None,
+    page_size: int = 100,
+    page_token: Optional[str] = None,
+    recruiting_status: Optional[str] = None,
+    updated_since: Optional[str] = None,
+    count_total: bool = False
+) -> dict:
+    """Fetch one page of studies from CT.gov using a shared httpx.AsyncClient"""
+    url = f"{CTGOV_API_BASE}/studies"
+    params = build_ctgov_params(query_cond, page_size, page_token, recruiting_status, updated_since, count_total)
+
+    response = await client.get(url, params=params, timeout=30)
+    response.raise_for_status()
+
+    data = response.json()
+    return {
+        "studies": data.get("studies", []),
+        "nextPageToken": data.get("nextPageToken"),
+        "totalCount": data.get("totalCount")
     }
 
 
@@ -198,7 +400,8 @@ def fetch_all_pages_from_ctgov(
     query_cond: Optional[str] = None,
     max_pages: int = 5,
     page_size: int = 100,
-    recruiting_status: Optional[str] = None
+    recruiting_status: Optional[str] = None,
+    updated_since: Optional[str] = None
 ) -> List[dict]:
     """Fetch multiple pages of studies from CT.gov"""
     all_studies = []
@@ -210,7 +413,8 @@ def fetch_all_pages_from_ctgov(
             query_cond=query_cond,
             page_size=page_size,
             page_token=page_token,
-            recruiting_status=recruiting_status
+            recruiting_status=recruiting_status,
+            updated_since=updated_since
         )
 
         studies = result.get("studies", [])
@@ -237,8 +441,35 @@ def safe_get(data: dict, *keys, default=None):
     return data if data != {} else default
 
 
-def normalize_ctgov_study(raw_study: dict) -> StudyCreate:
-    """Normalize a single CT.gov study to our StudyCreate model"""
+def get_ctgov_last_update_date(raw_study: dict) -> Optional[str]:
+    """Return a CT.gov study's lastUpdatePostDate (YYYY-MM-DD) if present"""
+    return safe_get(raw_study, "protocolSection", "statusModule", "lastUpdatePostDateStruct", "date")
+
+
+def parse_ctgov_age_months(value: Optional[str]) -> Optional[int]:
+    """CT.gov age ("18 Years", "6 Months", "N/A") in whole months; None if absent or unparseable"""
+    if not value:
+        return None
+    parts = value.strip().lower().split()
+    if len(parts) != 2:
+        return None
+    try:
+        amount = float(parts[0])
+    except ValueError:
+        return None
+    per_unit = CTGOV_AGE_UNIT_MONTHS.get(parts[1].rstrip("s"))
+    if per_unit is None:
+        return None
+    return int(amount * per_unit)
+
+
+def extract_ctgov_fields(raw_study: dict) -> dict:
+    """
+    Extract our normalized study fields from a raw CT.gov study as plain dicts/lists
+
+    Shared by the validated (normalize_ctgov_study) and trusted
+    (normalize_ctgov_study_row) paths so both produce the same content_hash.
+    """
     protocol = raw_study.get("protocolSection", {})
     identification = protocol.get("identificationModule", {})
     description_mod = protocol.get("descriptionModule", {})
@@ -249,94 +480,135 @@ def normalize_ctgov_study(raw_study: dict) -> StudyCreate:
     arms_interventions_mod = protocol.get("armsInterventionsModule", {})
     contacts_locations_mod = protocol.get("contactsLocationsModule", {})
 
-    # NCT ID
-    nct_id = identification.get("nctId", "")
-
-    # Title
-    title = identification.get("officialTitle") or identification.get("briefTitle", "Untitled Study")
-
-    # Descriptions
-    brief_summary = safe_get(description_mod, "briefSummary", default="")
-    detailed_description = safe_get(description_mod, "detailedDescription", default="")
-
-    # Eligibility
-    eligibility_criteria = safe_get(eligibility_mod, "eligibilityCriteria", default="")
-
-    # Status
-    recruiting_status = safe_get(status_mod, "overallStatus", default="Unknown")
-
-    # Study type
-    study_type = safe_get(design_mod, "studyType", default="")
-
     # Conditions
     conditions = conditions_mod.get("conditions", [])
     conditions_normalized = [c.lower().replace(" ", "-") for c in conditions]
 
     # Interventions
-    interventions_raw = arms_interventions_mod.get("interventions", [])
-    interventions = []
-    for intv in interventions_raw:
-        interventions.append(Intervention(
-            intervention_type=intv.get("type"),
-            intervention_name=intv.get("name", "Unknown"),
-            description=intv.get("description")
-        ))
+    interventions = [
+        {
+            "intervention_type": intv.get("type"),
+            "intervention_name": intv.get("name", "Unknown"),
+            "description": intv.get("description")
+        }
+        for intv in arms_interventions_mod.get("interventions", [])
+    ]
 
     # Locations
-    locations_raw = contacts_locations_mod.get("locations", [])
     locations = []
-    for loc in locations_raw:
-        facility = loc.get("facility", "")
-        city = loc.get("city", "")
-        state = loc.get("state", "")
-        country = loc.get("country", "")
+    for loc in contacts_locations_mod.get("locations", []):
         geo = loc.get("geoPoint", {})
-
-        locations.append(Location(
-            facility_name=facility,
-            city=city,
-            state=state,
-            country=country,
-            lat=geo.get("lat") if geo else None,
-            lon=geo.get("lon") if geo else None
-        ))
+        locations.append({
+            "facility_name": loc.get("facility", ""),
+            "city": loc.get("city", ""),
+            "state": loc.get("state", ""),
+            "country": loc.get("country", ""),
+            "lat": geo.get("lat") if geo else None,
+            "lon": geo.get("lon") if geo else None
+        })
+
+    # Structured eligibility (CT.gov sex is ALL / FEMALE / MALE)
+    eligible_sex = str(eligibility_mod.get("sex") or "").lower()
 
     # Contacts
-    central_contacts_raw = contacts_locations_mod.get("centralContacts", [])
-    contacts = []
-    for contact in central_contacts_raw:
-        contacts.append(Contact(
-            name=contact.get("name", "Unknown"),
-            role=contact.get("role"),
-            phone=contact.get("phone"),
-            email=contact.get("email")
-        ))
+    contacts = [
+        {
+            "name": contact.get("name", "Unknown"),
+            "role": contact.get("role"),
+            "phone": contact.get("phone"),
+            "email": contact.get("email")
+        }
+        for contact in contacts_locations_mod.get("centralContacts", [])
+    ]
+
+    fields = {
+        "source": "ctgov",
+        "source_id": identification.get("nctId", ""),
+        "title": identification.get("officialTitle") or identification.get("briefTitle", "Untitled Study"),
+        "description": None,
+        "brief_summary": safe_get(description_mod, "briefSummary", default=""),
+        "detailed_description": safe_get(description_mod, "detailedDescription", default=""),
+        "eligibility_criteria": safe_get(eligibility_mod, "eligibilityCriteria", default=""),
+        "recruiting_status": safe_get(status_mod, "overallStatus", default="Unknown"),
+        "study_type": safe_get(design_mod, "studyType", default=""),
+        "interventions": interventions,
+        "conditions": conditions_normalized,
+        "locations": locations,
+        "contacts": contacts,
+        # Site zips (we don't have this in CT.gov, so empty for now)
+        "site_zips": [],
+        "min_age_months": parse_ctgov_age_months(eligibility_mod.get("minimumAge")),
+        "max_age_months": parse_ctgov_age_months(eligibility_mod.get("maximumAge")),
+        "eligible_sex": eligible_sex if eligible_sex in ELIGIBLE_SEX_VALUES else None,
+        "healthy_volunteers": eligibility_mod.get("healthyVolunteers")
+    }
+    fields["content_hash"] = compute_content_hash(fields)
+    return fields
 
-    # Site zips (we don't have this in CT.gov, so empty for now)
-    site_zips = []
 
-    # Raw JSON
-    raw_json = json.dumps(raw_study)
+def normalize_ctgov_study(raw_study: dict) -> StudyCreate:
+    """Normalize a single CT.gov study to our StudyCreate model (validated)"""
+    fields = extract_ctgov_fields(raw_study)
 
     return StudyCreate(
-        source="ctgov",
-        source_id=nct_id,
-        title=title,
-        brief_summary=brief_summary,
-        detailed_description=detailed_description,
-        eligibility_criteria=eligibility_criteria,
-        recruiting_status=recruiting_status,
-        study_type=study_type,
-        interventions=interventions,
-        conditions=conditions_normalized,
-        locations=locations,
-        contacts=contacts,
-        site_zips=site_zips,
-        raw_json=raw_json
+        source=fields["source"],
+        source_id=fields["source_id"],
+        title=fields["title"],
+        brief_summary=fields["brief_summary"],
+        detailed_description=fields["detailed_description"],
+        eligibility_criteria=fields["eligibility_criteria"],
+        recruiting_status=fields["recruiting_status"],
+        study_type=fields["study_type"],
+        interventions=[Intervention(**i) for i in fields["interventions"]],
+        conditions=fields["conditions"],
+        locations=[Location(**loc) for loc in fields["locations"]],
+        contacts=[Contact(**c) for c in fields["contacts"]],
+        site_zips=fields["site_zips"],
+        min_age_months=fields["min_age_months"],
+        max_age_months=fields["max_age_months"],
+        eligible_sex=fields["eligible_sex"],
+        healthy_volunteers=fields["healthy_volunteers"],
+        raw_json=json.dumps(raw_study),
+        content_hash=fields["content_hash"]
     )
 
 
-# --- OpenAI Embeddings ---
+def normalize_ctgov_study_row(raw_study: dict) -> tuple:
+    """
+    Trusted fast path: raw CT.gov study straight to a STUDY_COPY_COLUMNS tuple
+
+    Skips pydantic validation and the raw_json dumps/loads round trip; the raw
+    dict is serialized and compressed once, here (so archive workers do it in
+    parallel). Use only for CT.gov API/archive data.
+    """
+    fields = extract_ctgov_fields(raw_study)
+    fields["raw_document"] = encode_raw_document(raw_study)
+    return tuple(fields[column] for column in STUDY_COPY_COLUMNS)
+
+
+def encode_raw_document(raw) -> bytes:
+    """gzip-compress a raw source document (dict or JSON string) for study_raw_documents"""
+    if not isinstance(raw, str):
+        raw = json.dumps(raw, separators=(",", ":"))
+    return gzip.compress(raw.encode("utf-8"), compresslevel=RAW_DOCUMENT_GZIP_LEVEL)
+
+
+def decode_raw_document(encoding: str, payload: bytes) -> str:
+    """Return a stored raw document as a JSON string"""
+    data = bytes(payload)
+    if encoding == "gzip":
+        data = gzip.decompress(data)
+    return data.decode("utf-8")
+
+
+def compute_content_hash(fields: dict) -> str:
+    """Fingerprint the normalized study fields in CONTENT_HASH_FIELDS (plain dicts/lists only)"""
+    payload = {name: fields.get(name) for name in CONTENT_HASH_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# --- Embedding Providers ---
 
 def get_openai_client():
     """Get OpenAI client instance"""
@@ -344,7 +616,218 @@ def get_openai_client():
 
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY not configured in environment")
-    return OpenAI(api_key=OPENAI_API_KEY)
+    return OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+
+def get_async_openai_client(max_retries: int = 2):
+    """
+    Get AsyncOpenAI client instance
+    Pass max_retries=0 when the caller runs its own rate limiter and needs to see 429s
+    """
+    from openai import AsyncOpenAI
+
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY not configured in environment")
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=max_retries)
+
+
+class EmbeddingProvider:
+    """
+    Turns texts into fixed-dimension vectors
+
+    model_name is stored in studies.embedding_model and tags the per-provider
+    vector index, so vectors from different providers never get compared.
+    remote providers are rate limited and billed per token; local ones are not.
+    """
+    model_name: str = ""
+    dimension: int = 0
+    remote: bool = False
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed non-empty texts (one vector per text, same order)"""
+        raise NotImplementedError
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        """Embed without blocking the event loop (local providers run in a thread)"""
+        return await asyncio.to_thread(self.embed, texts)
+
+    async def aclose(self):
+        """Release network clients"""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI text-embedding-3-small over the network"""
+    model_name = EMBEDDING_MODEL
+    dimension = EMBEDDING_DIMENSION
+    remote = True
+
+    def __init__(self, max_retries: int = 2):
+        self.max_retries = max_retries
+        self.client = None
+        self.async_client = None
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if self.client is None:
+            self.client = get_openai_client()
+        started = perf_counter()
+        response = None
+        try:
+            response = self.client.embeddings.create(
+                model=self.model_name,
+                input=[truncate_for_embedding(t) for t in texts],
+                encoding_format="float"
+            )
+        finally:
+            self.record_call(started, response)
+        return [item.embedding for item in response.data]
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        if self.async_client is None:
+            self.async_client = get_async_openai_client(self.max_retries)
+        started = perf_counter()
+        response = None
+        try:
+            # encoding_format is left to the SDK, which transfers packed base64 floats (~4x smaller than JSON)
+            response = await self.async_client.embeddings.create(
+                model=self.model_name,
+                input=[truncate_for_embedding(t) for t in texts]
+            )
+        finally:
+            self.record_call(started, response)
+        return [item.embedding for item in response.data]
+
+    def record_call(self, started: float, response):
+        """Telemetry for one embeddings request: latency, tokens and cost, or an error if response is None"""
+        telemetry.observe("embedding_latency_ms", (perf_counter() - started) * 1000, model=self.model_name)
+        if response is None:
+            telemetry.count("embedding_errors", model=self.model_name)
+            return
+        tokens = response.usage.prompt_tokens
+        telemetry.count("embedding_input_tokens", tokens, model=self.model_name)
+        telemetry.count("cost_usd", tokens * EMBEDDING_PRICE_PER_MTOK / 1_000_000, source="embedding")
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local CPU embedder: signed feature hashing of words, word bigrams and
+    character trigrams with sublinear term weights, L2-normalized
+
+    Hashing features into `dimension` signed buckets is a sparse random
+    projection of the bag-of-features vector, so cosine similarity tracks
+    lexical overlap. A query embeds in well under a millisecond without
+    network access; quality is below a neural model, which makes it the
+    offline/test/benchmark backend rather than the production default.
+    """
+    remote = False
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIMENSION):
+        self.dimension = dimension
+        self.model_name = f"local-hash-{dimension}"
+
+    @staticmethod
+    def features(text: str) -> dict:
+        """Weighted features for one text"""
+        import re
+        from collections import Counter
+
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        counts = Counter(words)
+        counts.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            counts.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return counts
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        import math
+        import zlib
+
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self.features(text).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                # Character trigrams are plentiful; weight them below whole words
+                weight = (1.0 + math.log(count)) * (0.5 if feature.startswith("#") else 1.0)
+                vectors[row, h % self.dimension] += weight if h & 0x80000000 else -weight
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+
+class OnnxEmbeddingProvider(EmbeddingProvider):
+    """
+    Local sentence-embedding model exported to ONNX (e.g. all-MiniLM-L6-v2)
+
+    EMBEDDING_ONNX_MODEL_DIR must contain model.onnx and tokenizer.json.
+    Requires the optional onnxruntime and tokenizers packages.
+    """
+    remote = False
+
+    def __init__(self, model_dir: Optional[str] = EMBEDDING_ONNX_MODEL_DIR, max_length: int = 256):
+        from pathlib import Path
+
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("EMBEDDING_PROVIDER=onnx needs the onnxruntime and tokenizers packages") from e
+        if not model_dir or not (Path(model_dir) / "model.onnx").exists():
+            raise RuntimeError("EMBEDDING_ONNX_MODEL_DIR must point at a directory with model.onnx and tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(str(Path(model_dir) / "model.onnx"),
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_name = f"onnx-{Path(model_dir).name}"
+        self.dimension = len(self.embed(["dimension probe"])[0])
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self.session.run(None, feeds)[0]
+        # Mean pooling over real tokens, then L2 normalize
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-9, None)
+        return pooled.tolist()
+
+
+def create_embedding_provider(name: str = EMBEDDING_PROVIDER, max_retries: int = 2) -> EmbeddingProvider:
+    """Build a new provider instance (batch jobs own and close theirs)"""
+    if name == "openai":
+        return OpenAIEmbeddingProvider(max_retries=max_retries)
+    if name == "local":
+        return HashingEmbeddingProvider()
+    if name == "onnx":
+        return OnnxEmbeddingProvider()
+    raise RuntimeError(f"Unknown EMBEDDING_PROVIDER: {name}")
+
+
+_embedding_provider: Optional[EmbeddingProvider] = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Process-wide provider for request-time (query) embeddings"""
+    global _embedding_provider
+    if _embedding_provider is None:
+        _embedding_provider = create_embedding_provider()
+    return _embedding_provider
 
 
 def normalize_for_embedding(title: str, brief_summary: str) -> str:
@@ -356,55 +839,178 @@ def normalize_for_embedding(title: str, brief_summary: str) -> str:
     return text.lower().strip()
 
 
+def split_passage_units(text: str, max_chars: int) -> List[str]:
+    """Lines, then sentences, then word windows, each at most max_chars"""
+    import re
+
+    units = []
+    for line in text.splitlines():
+        for sentence in re.split(r"(?<=[.!?;])\s+", line.strip()):
+            if not sentence:
+                continue
+            if len(sentence) <= max_chars:
+                units.append(sentence)
+                continue
+            window = []
+            for word in sentence.split():
+                if window and sum(len(w) + 1 for w in window) + len(word) > max_chars:
+                    units.append(" ".join(window))
+                    window = []
+                window.append(word[:max_chars])
+            if window:
+                units.append(" ".join(window))
+    return units
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[str]:
+    """
+    Split long text into passages of about max_tokens
+
+    Breaks on line and sentence boundaries (eligibility criteria are bullet
+    lists, descriptions are prose) and repeats the trailing units of each
+    passage, up to overlap_tokens, at the start of the next.
+    """
+    if not text or not text.strip():
+        return []
+
+    max_chars = max_tokens * 4
+    overlap_chars = overlap_tokens * 4
+    chunks = []
+    current = []
+    for unit in split_passage_units(text, max_chars):
+        if current and sum(len(u) + 1 for u in current) + len(unit) > max_chars:
+            chunks.append(" ".join(current))
+            # Carry trailing units as overlap, never a whole passage
+            carry = []
+            for previous in reversed(current):
+                if sum(len(u) + 1 for u in carry) + len(previous) > overlap_chars:
+                    break
+                carry.insert(0, previous)
+            current = carry if len(carry) < len(current) else []
+        current.append(unit)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def build_study_chunks(study: dict) -> List[dict]:
+    """
+    Passages to embed for one study row (needs title and the CHUNK_FIELDS columns)
+
+    Each passage is prefixed with the study title and field label so it stays
+    attributable on its own, and normalized like normalize_for_embedding.
+    """
+    import re
+
+    chunks = []
+    for column, label in CHUNK_FIELDS:
+        passages = chunk_text(study.get(column) or "")[:MAX_CHUNKS_PER_FIELD]
+        for index, passage in enumerate(passages):
+            content = re.sub(r"\s+", " ", f"{study.get('title') or ''} | {label}: {passage}")
+            chunks.append({"field": label, "chunk_index": index, "content": content.lower().strip()})
+    return chunks
+
+
 def generate_embedding(text: str) -> List[float]:
-    """Generate embedding for text using OpenAI"""
+    """Generate embedding for text with the configured provider"""
+    provider = get_embedding_provider()
     if not text or not text.strip():
         # Return zero vector for empty text
-        return [0.0] * EMBEDDING_DIMENSION
+        return [0.0] * provider.dimension
+    return provider.embed([text])[0]
 
-    client = get_openai_client()
-    response = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-        encoding_format="float"
-    )
-    return response.data[0].embedding
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4 if text else 0
 
 
-def generate_embeddings_batch(texts: List[str], batch_size: int = 100) -> List[List[float]]:
-    """Generate embeddings for multiple texts in batches"""
+def truncate_for_embedding(text: str) -> str:
+    """Cut text that would exceed the per-input token limit (conservative 3 characters per token)"""
+    max_chars = EMBEDDING_MAX_INPUT_TOKENS * 3
+    return text if len(text) <= max_chars else text[:max_chars]
+
+
+def batch_by_token_budget(
+    texts: List[str],
+    max_tokens: int = EMBEDDING_REQUEST_TOKEN_BUDGET,
+    max_items: int = EMBEDDING_MAX_INPUTS_PER_REQUEST
+) -> List[List[int]]:
+    """
+    Group text indices into request batches that stay under a token budget
+
+    A single text larger than the budget still gets its own batch.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(idx)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def generate_embeddings_batch(
+    texts: List[str],
+    batch_size: int = EMBEDDING_MAX_INPUTS_PER_REQUEST,
+    max_tokens: int = EMBEDDING_REQUEST_TOKEN_BUDGET
+) -> List[List[float]]:
+    """Generate embeddings for multiple texts in token-budgeted batches"""
     if not texts:
         return []
 
+    provider = get_embedding_provider()
+
     # Filter out empty texts and track indices
     non_empty_indices = [i for i, t in enumerate(texts) if t and t.strip()]
     non_empty_texts = [texts[i] for i in non_empty_indices]
 
+    # Empty texts keep zero vectors
+    embeddings = [[0.0] * provider.dimension] * len(texts)
     if not non_empty_texts:
-        # All texts are empty, return zero vectors
-        return [[0.0] * EMBEDDING_DIMENSION] * len(texts)
+        return embeddings
 
-    client = get_openai_client()
     all_embeddings = []
+    for batch_indices in batch_by_token_budget(non_empty_texts, max_tokens, batch_size):
+        all_embeddings.extend(provider.embed([non_empty_texts[i] for i in batch_indices]))
 
-    # Process in batches
-    for i in range(0, len(non_empty_texts), batch_size):
-        batch = non_empty_texts[i:i + batch_size]
-        response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=batch,
-            encoding_format="float"
-        )
-        all_embeddings.extend([item.embedding for item in response.data])
-
-    # Reconstruct full list with zero vectors for empty texts
-    embeddings = [[0.0] * EMBEDDING_DIMENSION] * len(texts)
     for idx, orig_idx in enumerate(non_empty_indices):
         embeddings[orig_idx] = all_embeddings[idx]
 
     return embeddings
 
 
+async def generate_embeddings_async(provider: EmbeddingProvider, texts: List[str]) -> List[List[float]]:
+    """Embed one request batch with a provider (empty texts get zero vectors)"""
+    non_empty_indices = [i for i, t in enumerate(texts) if t and t.strip()]
+    embeddings = [[0.0] * provider.dimension] * len(texts)
+    if not non_empty_indices:
+        return embeddings
+
+    vectors = await provider.embed_async([texts[i] for i in non_empty_indices])
+    for vector, orig_idx in zip(vectors, non_empty_indices):
+        embeddings[orig_idx] = vector
+    return embeddings
+
+
+def vector_literal(embedding: List[float]) -> str:
+    """Format an embedding as pgvector text input ('[x,y,...]')"""
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
 # ======================================================================
 # REPO
 # ======================================================================
@@ -422,13 +1028,9 @@ def insert_study(study_data: StudyCreate) -> Study:
     locations_json = Jsonb([loc.model_dump() for loc in study_data.locations])
     contacts_json = Jsonb([c.model_dump() for c in study_data.contacts])
     media_json = Jsonb(study_data.media if study_data.media else [])
-
-    # Prepare raw_json - convert to Json adapter if it's a string
-    raw_json_data = study_data.raw_json
-    if isinstance(raw_json_data, str):
-        raw_json_data = Jsonb(json.loads(raw_json_data))
-    elif raw_json_data is not None:
-        raw_json_data = Jsonb(raw_json_data)
+    content_hash = study_data.content_hash or compute_content_hash(
+        study_data.model_dump(include=set(CONTENT_HASH_FIELDS))
+    )
 
     with get_db() as conn:
         cursor = conn.cursor()
@@ -436,9 +1038,11 @@ def insert_study(study_data: StudyCreate) -> Study:
             INSERT INTO studies
             (source, source_id, title, brief_summary, detailed_description,
              eligibility_criteria, recruiting_status, study_type, interventions,
-             conditions, locations, contacts, site_zips, media, raw_json,
-             last_synced_at, created_at, updated_at, description)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+             conditions, locations, contacts, site_zips, media,
+             last_synced_at, created_at, updated_at, description, content_hash,
+             min_age_months, max_age_months, eligible_sex, healthy_volunteers)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                    %s, %s, %s::eligible_sex, %s)
             RETURNING id
         """, (
             study_data.source,
@@ -455,36 +1059,407 @@ def insert_study(study_data: StudyCreate) -> Study:
             contacts_json,
             normalized_zips,
             media_json,
-            raw_json_data,
             now if study_data.source == "ctgov" else None,
             now,
             now,
-            study_data.description
+            study_data.description,
+            content_hash,
+            study_data.min_age_months,
+            study_data.max_age_months,
+            study_data.eligible_sex,
+            study_data.healthy_volunteers
         ))
         study_id = cursor.fetchone()['id']
 
+        if study_data.raw_json is not None:
+            save_raw_document(cursor, study_id, study_data.raw_json, content_hash)
+
     return get_study_by_id(study_id)
 
 
-def get_study_by_id(study_id: int) -> Study:
-    """Retrieve a study by ID (published only)"""
+def save_raw_document(cursor, study_id: int, raw, content_hash: Optional[str]):
+    """Store (or replace) a study's compressed raw source document using the caller's transaction"""
+    cursor.execute("""
+        INSERT INTO study_raw_documents (study_id, encoding, payload, content_hash, stored_at)
+        VALUES (%s, 'gzip', %s, %s, NOW())
+        ON CONFLICT (study_id) DO UPDATE
+        SET encoding = EXCLUDED.encoding,
+            payload = EXCLUDED.payload,
+            content_hash = EXCLUDED.content_hash,
+            stored_at = EXCLUDED.stored_at
+    """, (study_id, encode_raw_document(raw), content_hash))
+
+
+def get_study_raw_json(study_id: int) -> Optional[str]:
+    """Load a study's raw source document as a JSON string (None if not stored)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT encoding, payload FROM study_raw_documents WHERE study_id = %s",
+            (study_id,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return decode_raw_document(row["encoding"], row["payload"])
+
+
+def study_to_row(study_data: StudyCreate) -> tuple:
+    """Convert a normalized study to a plain tuple in STUDY_COPY_COLUMNS order (picklable)"""
+    raw_document = encode_raw_document(study_data.raw_json) if study_data.raw_json is not None else None
+
+    return (
+        study_data.source,
+        study_data.source_id,
+        study_data.title,
+        study_data.brief_summary,
+        study_data.detailed_description,
+        study_data.eligibility_criteria,
+        study_data.recruiting_status,
+        study_data.study_type,
+        [i.model_dump() for i in study_data.interventions],
+        [c.strip().lower() for c in study_data.conditions],
+        [loc.model_dump() for loc in study_data.locations],
+        [c.model_dump() for c in study_data.contacts],
+        [z.strip() for z in study_data.site_zips],
+        study_data.min_age_months,
+        study_data.max_age_months,
+        study_data.eligible_sex,
+        study_data.healthy_volunteers,
+        raw_document,
+        study_data.content_hash
+    )
+
+
+def bulk_upsert_study_rows(rows: List[tuple]) -> dict:
+    """
+    Upsert many study rows (STUDY_COPY_COLUMNS order) in one transaction
+
+    Rows are COPYed into a temp staging table, then existing studies whose
+    content_hash changed are updated and unseen (source, source_id) pairs are
+    inserted. Raw documents are written to study_raw_documents only when their
+    hash changed. Staleness rules match scripts/ingest_ctgov.py:upsert_ctgov_study.
+
+    Returns:
+        Counts of inserted, updated and unchanged studies, and duplicates
+        (rows repeating an earlier row's study in the same batch; the last one wins)
+    """
+    if not rows:
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+
+    jsonb_positions = [STUDY_COPY_COLUMNS.index(c) for c in STUDY_JSONB_COLUMNS]
+    table_columns = ", ".join(STUDY_TABLE_COLUMNS)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE staging_studies (
+                source TEXT, source_id TEXT, title TEXT, brief_summary TEXT,
+                detailed_description TEXT, eligibility_criteria TEXT, recruiting_status TEXT,
+                study_type TEXT, interventions JSONB, conditions TEXT[], locations JSONB,
+                contacts JSONB, site_zips TEXT[], min_age_months INTEGER, max_age_months INTEGER,
+                eligible_sex eligible_sex, healthy_volunteers BOOLEAN, raw_document BYTEA, content_hash TEXT
+            ) ON COMMIT DROP
+        """)
+
+        with cursor.copy(f"COPY staging_studies ({', '.join(STUDY_COPY_COLUMNS)}) FROM STDIN") as copy:
+            for row in rows:
+                row = list(row)
+                for pos in jsonb_positions:
+                    if row[pos] is not None:
+                        row[pos] = Jsonb(row[pos])
+                copy.write_row(row)
+
+        # Archives and overlapping pages can repeat an NCT ID; keep one row per study
+        cursor.execute("""
+            DELETE FROM staging_studies a
+            USING staging_studies b
+            WHERE a.source = b.source AND a.source_id = b.source_id AND a.ctid < b.ctid
+        """)
+        duplicates = cursor.rowcount
+
+        cursor.execute("""
+            UPDATE studies s
+            SET ai_plain_title = CASE
+                    WHEN s.title IS DISTINCT FROM t.title OR s.brief_summary IS DISTINCT FROM t.brief_summary
+                    THEN NULL ELSE s.ai_plain_title END,
+                ai_plain_summary = CASE
+                    WHEN s.title IS DISTINCT FROM t.title OR s.brief_summary IS DISTINCT FROM t.brief_summary
+                    THEN NULL ELSE s.ai_plain_summary END,
+                ai_eligibility_quiz = CASE
+                    WHEN s.eligibility_criteria IS DISTINCT FROM t.eligibility_criteria
+                    THEN NULL ELSE s.ai_eligibility_quiz END,
+                title = t.title,
+                brief_summary = t.brief_summary,
+                detailed_description = t.detailed_description,
+                eligibility_criteria = t.eligibility_criteria,
+                recruiting_status = t.recruiting_status,
+                study_type = t.study_type,
+                interventions = t.interventions,
+                conditions = t.conditions,
+                locations = t.locations,
+                contacts = t.contacts,
+                site_zips = t.site_zips,
+                min_age_months = t.min_age_months,
+                max_age_months = t.max_age_months,
+                eligible_sex = t.eligible_sex,
+                healthy_volunteers = t.healthy_volunteers,
+                content_hash = t.content_hash,
+                last_synced_at = NOW()
+            FROM staging_studies t
+            WHERE s.source = t.source AND s.source_id = t.source_id
+              AND s.content_hash IS DISTINCT FROM t.content_hash
+        """)
+        updated = cursor.rowcount
+
+        cursor.execute(f"""
+            INSERT INTO studies ({table_columns}, last_synced_at)
+            SELECT {", ".join("t." + c for c in STUDY_TABLE_COLUMNS)}, NOW()
+            FROM staging_studies t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM studies s
+                WHERE s.source = t.source AND s.source_id = t.source_id
+            )
+        """)
+        inserted = cursor.rowcount
+
+        cursor.execute("""
+            INSERT INTO study_raw_documents (study_id, encoding, payload, content_hash, stored_at)
+            SELECT s.id, 'gzip', t.raw_document, t.content_hash, NOW()
+            FROM staging_studies t
+            JOIN studies s ON s.source = t.source AND s.source_id = t.source_id
+            WHERE t.raw_document IS NOT NULL
+            ON CONFLICT (study_id) DO UPDATE
+            SET encoding = EXCLUDED.encoding,
+                payload = EXCLUDED.payload,
+                content_hash = EXCLUDED.content_hash,
+                stored_at = EXCLUDED.stored_at
+            WHERE study_raw_documents.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        """)
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(rows) - duplicates - inserted - updated,
+        "duplicates": duplicates
+    }
+
+
+# --- Embedding Queue ---
+
+def write_embeddings_bulk(updates: List[tuple], model: Optional[str] = None) -> int:
+    """
+    Write many (study_id, embedding, text_hash) rows with one UPDATE ... FROM statement
+
+    text_hash is md5 of the search_text that was embedded. Writing it lets the
+    embedding_queue trigger dequeue the study, or re-queue it if search_text
+    changed while the embedding was in flight. Vectors travel as pgvector text
+    literals in a single unnest() row set, so a batch is one round trip.
+    model defaults to the configured provider's model_name.
+
+    Returns:
+        Number of studies updated
+    """
+    if not updates:
+        return 0
+
+    model = model or get_embedding_provider().model_name
+    ids = [study_id for study_id, _, _ in updates]
+    vectors = [vector_literal(embedding) for _, embedding, _ in updates]
+    text_hashes = [text_hash for _, _, text_hash in updates]
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE studies s
+            SET embedding = v.embedding::vector,
+                embedding_text_hash = v.text_hash,
+                embedding_model = %s
+            FROM unnest(%s::bigint[], %s::text[], %s::text[]) AS v(id, embedding, text_hash)
+            WHERE s.id = v.id
+        """, (model, ids, vectors, text_hashes))
+        return cursor.rowcount
+
+
+def count_embedding_queue(max_attempts: int) -> int:
+    """Queued studies still eligible for another embedding attempt"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) AS count FROM embedding_queue WHERE attempts < %s", (max_attempts,))
+        return cursor.fetchone()["count"]
+
+
+def fetch_embedding_queue_batch(after_id: int, limit: int, max_attempts: int) -> list:
+    """
+    Next queued studies by id with their current search_text and its md5
+
+    Keyset on study_id, so batches still in flight are never read twice.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.id, s.search_text, md5(s.search_text) AS text_hash
+            FROM embedding_queue q
+            JOIN studies s ON s.id = q.study_id
+            WHERE q.study_id > %s AND q.attempts < %s AND s.search_text IS NOT NULL
+            ORDER BY q.study_id
+            LIMIT %s
+        """, (after_id, max_attempts, limit))
+        return cursor.fetchall()
+
+
+def claim_embedding_queue_batch(limit: int, max_attempts: int, lease_seconds: int) -> list:
+    """
+    Lease the oldest unclaimed queue rows for this worker
+
+    SKIP LOCKED plus a claimed_until lease lets several workers (one per API
+    process) drain the queue without embedding the same study twice; rows
+    from a crashed worker become claimable again once the lease expires.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH claimable AS (
+                SELECT study_id
+                FROM embedding_queue
+                WHERE attempts < %s AND (claimed_until IS NULL OR claimed_until < NOW())
+                ORDER BY enqueued_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE embedding_queue q
+            SET claimed_until = NOW() + make_interval(secs => %s)
+            FROM claimable c, studies s
+            WHERE q.study_id = c.study_id AND s.id = q.study_id AND s.search_text IS NOT NULL
+            RETURNING s.id, s.search_text, md5(s.search_text) AS text_hash
+        """, (max_attempts, limit, lease_seconds))
+        return cursor.fetchall()
+
+
+def record_embedding_failures(study_ids: List[int], error: str):
+    """Count a failed attempt for queued studies and release their lease"""
+    if not study_ids:
+        return
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE embedding_queue
+            SET attempts = attempts + 1, last_error = %s, claimed_until = NULL
+            WHERE study_id = ANY(%s)
+        """, (error[:500], study_ids))
+
+
+def group_by_text(rows: list) -> list:
+    """Collapse queued studies with identical search_text into one entry per text"""
+    groups = {}
+    for row in rows:
+        entry = groups.setdefault(row["text_hash"], {
+            "search_text": row["search_text"], "text_hash": row["text_hash"], "ids": []
+        })
+        entry["ids"].append(row["id"])
+    return list(groups.values())
+
+
+def enqueue_embedding_model_mismatches(model: Optional[str] = None) -> int:
+    """Queue studies whose embedding came from a different model (default: the configured provider's); returns rows queued"""
+    model = model or get_embedding_provider().model_name
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO embedding_queue (study_id, text_hash)
+            SELECT id, md5(search_text)
+            FROM studies
+            WHERE search_text IS NOT NULL
+              AND embedding IS NOT NULL
+              AND embedding_model IS DISTINCT FROM %s
+            ON CONFLICT (study_id) DO NOTHING
+        """, (model,))
+        return cursor.rowcount
+
+
+def reuse_duplicate_embeddings(model: Optional[str] = None) -> int:
+    """
+    Copy vectors onto queued studies whose exact text is already embedded by the same model
+
+    Identical search_text (re-registered trials, copied internal studies) is
+    embedded once; the queue trigger dequeues the studies this fills in.
+
+    Returns:
+        Number of studies filled from an existing embedding
+    """
+    model = model or get_embedding_provider().model_name
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE studies s
+            SET embedding = donor.embedding,
+                embedding_text_hash = donor.embedding_text_hash,
+                embedding_model = donor.embedding_model
+            FROM (
+                SELECT DISTINCT ON (q.study_id)
+                    q.study_id, d.embedding, d.embedding_text_hash, d.embedding_model
+                FROM embedding_queue q
+                JOIN studies t ON t.id = q.study_id
+                JOIN studies d ON d.embedding_text_hash = md5(t.search_text)
+                WHERE t.search_text IS NOT NULL
+                  AND d.id <> t.id
+                  AND d.embedding IS NOT NULL
+                  AND d.embedding_model = %s
+                ORDER BY q.study_id
+            ) donor
+            WHERE s.id = donor.study_id
+        """, (model,))
+        return cursor.rowcount
+
+
+def get_study_by_id(study_id: int, include_raw: bool = False) -> Study:
+    """Retrieve a study by ID (published only); raw_json is loaded only when include_raw is set"""
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT * FROM studies WHERE id = %s AND is_published = TRUE",
+            f"SELECT {STUDY_SELECT_COLUMNS} FROM studies WHERE id = %s AND is_published = TRUE",
             (study_id,)
         )
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Study not found")
-        return _row_to_study(dict(row))
+        study = _row_to_study(dict(row))
+
+    if include_raw:
+        study.raw_json = get_study_raw_json(study_id)
+    return study
 
 
-def list_all_studies() -> List[Study]:
-    """Retrieve all studies (published only)"""
+def eligibility_filter_sql(request: SearchRequest, table: str = "studies") -> tuple:
+    """
+    ("AND ..." conditions, named params) keeping studies the searcher could enter
+
+    An age in years covers months [age * 12, age * 12 + 11]; a study's
+    maximum age is inclusive ("65 Years" admits 65-year-olds). Missing
+    structured values never exclude a study.
+    """
+    conditions = []
+    params = {}
+    if request.age is not None:
+        conditions.append(f"({table}.min_age_months IS NULL OR {table}.min_age_months <= %(elig_age_to)s)")
+        conditions.append(f"({table}.max_age_months IS NULL OR {table}.max_age_months >= %(elig_age_from)s)")
+        params["elig_age_from"] = request.age * 12
+        params["elig_age_to"] = request.age * 12 + 11
+    if request.sex:
+        conditions.append(f"({table}.eligible_sex IS NULL OR {table}.eligible_sex IN ('all', %(elig_sex)s::eligible_sex))")
+        params["elig_sex"] = request.sex
+    return "".join(f" AND {c}" for c in conditions), params
+
+
+def list_all_studies(request: Optional[SearchRequest] = None) -> List[Study]:
+    """Retrieve all studies (published only; with a request, only those its age/sex could enter)"""
+    filter_sql, params = eligibility_filter_sql(request) if request else ("", {})
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM studies WHERE is_published = TRUE ORDER BY id")
+        cursor.execute(
+            f"SELECT {STUDY_SELECT_COLUMNS} FROM studies WHERE is_published = TRUE{filter_sql} ORDER BY id",
+            params
+        )
         rows = cursor.fetchall()
         return [_row_to_study(dict(row)) for row in rows]
 
@@ -497,11 +1472,6 @@ def _row_to_study(row: dict) -> Study:
     contacts_data = row["contacts"] if row["contacts"] else []
     media_data = row.get("media") if row.get("media") else []
 
-    # Convert raw_json to JSON string if it's a dict (for API response)
-    raw_json_value = row["raw_json"]
-    if isinstance(raw_json_value, dict):
-        raw_json_value = json.dumps(raw_json_value)
-
     # Parse AI eligibility quiz from JSONB
     ai_quiz_data = row.get("ai_eligibility_quiz")
     ai_quiz = None
@@ -525,8 +1495,11 @@ def _row_to_study(row: dict) -> Study:
         locations=[Location(**loc) for loc in locations_data],
         contacts=[Contact(**c) for c in contacts_data],
         site_zips=row["site_zips"],
+        min_age_months=row.get("min_age_months"),
+        max_age_months=row.get("max_age_months"),
+        eligible_sex=row.get("eligible_sex"),
+        healthy_volunteers=row.get("healthy_volunteers"),
         media=media_data,
-        raw_json=raw_json_value,
         last_synced_at=row["last_synced_at"].isoformat() if row["last_synced_at"] else None,
         created_at=row["created_at"].isoformat() if row["created_at"] else None,
         updated_at=row["updated_at"].isoformat() if row["updated_at"] else None,
@@ -540,6 +1513,560 @@ def _row_to_study(row: dict) -> Study:
     )
 
 
+# --- Study Chunks ---
+
+def fetch_studies_needing_chunks(after_id: int, limit: int, model: str) -> list:
+    """
+    Next studies by id whose passages are missing, stale or from another model
+
+    Returns the chunked source columns plus source_hash, which is stored on the
+    chunk rows so later edits are detected.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT s.id, s.title, s.detailed_description, s.eligibility_criteria,
+                   {CHUNK_SOURCE_HASH_SQL} AS source_hash
+            FROM studies s
+            WHERE s.id > %s
+              AND (s.detailed_description IS NOT NULL OR s.eligibility_criteria IS NOT NULL)
+              AND NOT EXISTS (
+                  SELECT 1 FROM study_chunks c
+                  WHERE c.study_id = s.id
+                    AND c.source_hash = {CHUNK_SOURCE_HASH_SQL}
+                    AND c.embedding_model = %s
+              )
+            ORDER BY s.id
+            LIMIT %s
+        """, (after_id, model, limit))
+        return cursor.fetchall()
+
+
+def delete_stale_study_chunks() -> int:
+    """Drop passages whose study text changed; the study falls back to its summary vector until re-chunked"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            DELETE FROM study_chunks c
+            USING studies s
+            WHERE c.study_id = s.id AND c.source_hash <> {CHUNK_SOURCE_HASH_SQL}
+        """)
+        return cursor.rowcount
+
+
+def replace_study_chunks(studies: List[dict], model: Optional[str] = None) -> int:
+    """
+    Swap in freshly embedded passages for whole studies in one transaction
+
+    Each item is {"study_id", "source_hash", "chunks": [{"field", "chunk_index",
+    "content", "embedding"}]}. Old passages of those studies are deleted, so
+    a study never mixes passages from two versions of its text.
+
+    Returns:
+        Number of passages written
+    """
+    if not studies:
+        return 0
+
+    model = model or get_embedding_provider().model_name
+    rows = [
+        (study["study_id"], chunk["field"], chunk["chunk_index"], chunk["content"],
+         study["source_hash"], vector_literal(chunk["embedding"]))
+        for study in studies
+        for chunk in study["chunks"]
+    ]
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM study_chunks WHERE study_id = ANY(%s)",
+                       ([study["study_id"] for study in studies],))
+        if rows:
+            study_ids, fields, indexes, contents, source_hashes, vectors = (list(c) for c in zip(*rows))
+            cursor.execute("""
+                INSERT INTO study_chunks
+                    (study_id, field, chunk_index, content, source_hash, embedding, embedding_model)
+                SELECT v.study_id, v.field, v.chunk_index, v.content, v.source_hash, v.embedding::vector, %s
+                FROM unnest(%s::bigint[], %s::text[], %s::int[], %s::text[], %s::text[], %s::text[])
+                    AS v(study_id, field, chunk_index, content, source_hash, embedding)
+            """, (model, study_ids, fields, indexes, contents, source_hashes, vectors))
+        return len(rows)
+
+
+def fetch_vector_candidates(cursor, query_embedding: List[float], provider: EmbeddingProvider,
+                            chunked: bool = USE_CHUNKED_EMBEDDINGS, limit: int = 150,
+                            request: Optional[SearchRequest] = None) -> list:
+    """
+    Nearest published studies to a query vector, closest first (similarity_distance)
+
+    Single-vector mode compares against studies.embedding (title | summary).
+    Chunked mode also searches study_chunks and scores each study by its
+    closest vector of either kind (max-sim), so a match deep in the
+    eligibility criteria still surfaces the study. Both sides use the
+    per-model partial indexes (same cast expression and model predicate).
+    A request's age/sex filters (eligibility_filter_sql) apply to the studies.
+    """
+    dim = int(provider.dimension)
+    filter_sql, filter_params = eligibility_filter_sql(request) if request else ("", {})
+    columns = """id, source, source_id, title, brief_summary, detailed_description,
+                 description, eligibility_criteria, recruiting_status, study_type,
+                 interventions, conditions, locations, contacts, site_zips,
+                 created_at, updated_at, ai_plain_title"""
+
+    if not chunked:
+        cursor.execute(f"""
+            SELECT {columns},
+                   (embedding::vector({dim}) <=> %(q)s::vector({dim})) as similarity_distance
+            FROM studies
+            WHERE embedding IS NOT NULL AND embedding_model = %(model)s AND is_published = TRUE{filter_sql}
+            ORDER BY similarity_distance
+            LIMIT %(limit)s
+        """, {"q": query_embedding, "model": provider.model_name, "limit": limit, **filter_params})
+        return cursor.fetchall()
+
+    # Several passages of one study can rank together, so over-fetch passages
+    cursor.execute(f"""
+        WITH chunk_hits AS (
+            SELECT study_id, (embedding::vector({dim}) <=> %(q)s::vector({dim})) AS distance
+            FROM study_chunks
+            WHERE embedding_model = %(model)s
+            ORDER BY distance
+            LIMIT %(chunk_limit)s
+        ), study_hits AS (
+            SELECT id AS study_id, (embedding::vector({dim}) <=> %(q)s::vector({dim})) AS distance
+            FROM studies
+            WHERE embedding IS NOT NULL AND embedding_model = %(model)s AND is_published = TRUE{filter_sql}
+            ORDER BY distance
+            LIMIT %(limit)s
+        ), best AS (
+            SELECT study_id, MIN(distance) AS distance
+            FROM (SELECT * FROM chunk_hits UNION ALL SELECT * FROM study_hits) hits
+            GROUP BY study_id
+        )
+        SELECT {columns}, best.distance AS similarity_distance
+        FROM best
+        JOIN studies ON studies.id = best.study_id
+        WHERE studies.is_published = TRUE{filter_sql}
+        ORDER BY similarity_distance
+        LIMIT %(limit)s
+    """, {"q": query_embedding, "model": provider.model_name, "limit": limit, "chunk_limit": limit * 4,
+          **filter_params})
+    return cursor.fetchall()
+
+
+# --- Structured Eligibility ---
+
+def fetch_ctgov_raw_documents(after_id: int, limit: int) -> list:
+    """Next CT.gov studies by id with their stored raw document and content_hash"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.id, s.content_hash, r.encoding, r.payload, r.content_hash AS raw_content_hash
+            FROM studies s
+            JOIN study_raw_documents r ON r.study_id = s.id
+            WHERE s.source = 'ctgov' AND s.id > %s
+            ORDER BY s.id
+            LIMIT %s
+        """, (after_id, limit))
+        return cursor.fetchall()
+
+
+def write_study_eligibility(updates: List[dict]) -> int:
+    """
+    Set structured eligibility columns for many studies in one statement
+
+    Each update is {"id", "min_age_months", "max_age_months", "eligible_sex",
+    "healthy_volunteers", "content_hash", "previous_hash"}. content_hash is
+    replaced only where the row still has previous_hash, i.e. the raw document
+    was the study's current version.
+    """
+    if not updates:
+        return 0
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE studies s
+            SET min_age_months = v.min_age_months,
+                max_age_months = v.max_age_months,
+                eligible_sex = v.eligible_sex::eligible_sex,
+                healthy_volunteers = v.healthy_volunteers,
+                content_hash = CASE WHEN s.content_hash IS NOT DISTINCT FROM v.previous_hash
+                                    THEN v.content_hash ELSE s.content_hash END
+            FROM unnest(%s::bigint[], %s::int[], %s::int[], %s::text[], %s::bool[], %s::text[], %s::text[])
+                AS v(id, min_age_months, max_age_months, eligible_sex, healthy_volunteers, content_hash, previous_hash)
+            WHERE s.id = v.id
+        """, tuple([u[key] for u in updates] for key in (
+            "id", "min_age_months", "max_age_months", "eligible_sex", "healthy_volunteers",
+            "content_hash", "previous_hash"
+        )))
+        return cursor.rowcount
+
+
+# --- Search Exposure ---
+
+def add_search_exposure(counts: dict):
+    """Add impression counts ({study_id: n}) to study_search_exposure in one statement"""
+    if not counts:
+        return
+    # Sorted ids: concurrent flushes from several processes lock rows in the same order
+    study_ids = sorted(counts)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO study_search_exposure (study_id, impressions, last_seen_at)
+            SELECT v.study_id, v.impressions, NOW()
+            FROM unnest(%s::bigint[], %s::bigint[]) AS v(study_id, impressions)
+            JOIN studies s ON s.id = v.study_id
+            ON CONFLICT (study_id) DO UPDATE
+            SET impressions = study_search_exposure.impressions + EXCLUDED.impressions,
+                last_seen_at = EXCLUDED.last_seen_at
+        """, (study_ids, [counts[study_id] for study_id in study_ids]))
+
+
+# --- Saved Searches ---
+
+def fetch_saved_searches() -> list:
+    """All saved searches (id, user_id, request JSON) for building the alert index"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, user_id, request FROM saved_searches ORDER BY id")
+        return cursor.fetchall()
+
+
+def get_saved_searches_version() -> tuple:
+    """(count, last change) of saved_searches; changes when searches are added, edited or deleted"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) AS count, MAX(updated_at) AS updated_at FROM saved_searches")
+        row = cursor.fetchone()
+        return row["count"], row["updated_at"]
+
+
+def write_search_notifications(matches: List[tuple]) -> int:
+    """
+    Record (saved_search_id, source, source_id) matches in search_notifications
+
+    Studies are resolved by source id, so matches can be collected before the
+    study row exists. Searches deleted meanwhile are dropped, and a study is
+    notified once per saved search however often it is updated.
+    """
+    if not matches:
+        return 0
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO search_notifications (user_id, saved_search_id, study_id)
+            SELECT ss.user_id, ss.id, s.id
+            FROM unnest(%s::bigint[], %s::text[], %s::text[]) AS v(saved_search_id, source, source_id)
+            JOIN saved_searches ss ON ss.id = v.saved_search_id
+            JOIN studies s ON s.source = v.source AND s.source_id = v.source_id
+            ON CONFLICT (saved_search_id, study_id) DO NOTHING
+        """, tuple(list(column) for column in zip(*matches)))
+        return cursor.rowcount
+
+
+# --- Study Neighbors ---
+
+def count_stale_study_neighbors(model: str) -> int:
+    """Studies embedded with model whose neighbor list is missing or was computed from another embedding"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) AS count
+            FROM studies s
+            LEFT JOIN study_neighbors n ON n.study_id = s.id AND n.embedding_model = s.embedding_model
+            WHERE s.embedding IS NOT NULL AND s.embedding_model = %s
+              AND (n.study_id IS NULL OR n.embedding_text_hash IS DISTINCT FROM s.embedding_text_hash)
+        """, (model,))
+        return cursor.fetchone()["count"]
+
+
+def fetch_study_embedding_matrix(model: str, batch_size: int = 5000) -> tuple:
+    """
+    (ids, text_hashes, matrix) of every study embedded with model, in id order
+
+    Rows of the float32 matrix are unit length, so a matrix product gives
+    cosine similarities. Vectors are read in keyset pages in pgvector's
+    binary form (vector_send: int16 dim, int16 unused, big-endian float4s),
+    which skips parsing about 1ms of text per 1536-dim vector.
+    """
+    import numpy as np
+
+    ids, text_hashes, vectors = [], [], []
+    with get_db() as conn:
+        cursor = conn.cursor()
+        after_id = 0
+        while True:
+            cursor.execute("""
+                SELECT id, embedding_text_hash, vector_send(embedding) AS embedding
+                FROM studies
+                WHERE embedding IS NOT NULL AND embedding_model = %s AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (model, after_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                ids.append(row["id"])
+                text_hashes.append(row["embedding_text_hash"])
+                vectors.append(np.frombuffer(row["embedding"], dtype=">f4", offset=4))
+            after_id = rows[-1]["id"]
+
+    if not vectors:
+        return np.zeros(0, dtype=np.int64), [], np.zeros((0, 0), dtype=np.float32)
+    matrix = np.vstack(vectors).astype(np.float32)  # Native byte order for BLAS
+    matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9, None)
+    return np.array(ids, dtype=np.int64), text_hashes, matrix
+
+
+def fetch_study_neighbor_lists(model: str) -> dict:
+    """study_id -> (neighbor_ids, scores, embedding_text_hash) of stored lists for model"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT study_id, neighbor_ids, scores, embedding_text_hash
+            FROM study_neighbors
+            WHERE embedding_model = %s
+        """, (model,))
+        return {
+            row["study_id"]: (row["neighbor_ids"], row["scores"], row["embedding_text_hash"])
+            for row in cursor.fetchall()
+        }
+
+
+def write_study_neighbors(rows: List[tuple], model: str) -> int:
+    """Upsert (study_id, neighbor_ids, scores, embedding_text_hash) rows"""
+    if not rows:
+        return 0
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO study_neighbors (study_id, neighbor_ids, scores, embedding_model, embedding_text_hash, computed_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (study_id) DO UPDATE
+            SET neighbor_ids = EXCLUDED.neighbor_ids,
+                scores = EXCLUDED.scores,
+                embedding_model = EXCLUDED.embedding_model,
+                embedding_text_hash = EXCLUDED.embedding_text_hash,
+                computed_at = EXCLUDED.computed_at
+        """, [(study_id, neighbor_ids, scores, model, text_hash)
+              for study_id, neighbor_ids, scores, text_hash in rows])
+        return len(rows)
+
+
+def delete_orphan_study_neighbors(model: str) -> int:
+    """Drop lists of studies that no longer have an embedding from model"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM study_neighbors n
+            USING studies s
+            WHERE s.id = n.study_id
+              AND (s.embedding IS NULL OR s.embedding_model IS DISTINCT FROM %s)
+        """, (model,))
+        return cursor.rowcount
+
+
+def get_similar_studies(study_id: int, limit: int, model: Optional[str] = None) -> List[SimilarStudy]:
+    """
+    Stored neighbors of a published study, best first, keeping only those
+    still published and enrolling (lists are not recomputed on status changes)
+
+    Only lists computed with model (default: the configured provider's) are
+    served; after a provider switch a study has none until the neighbor
+    refresh has run for the new model.
+    """
+    model = model or get_embedding_provider().model_name
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM studies WHERE id = %s AND is_published = TRUE", (study_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Study not found")
+        cursor.execute("""
+            SELECT s.id, s.title, s.ai_plain_title, s.recruiting_status, s.conditions, nb.score
+            FROM study_neighbors n
+            CROSS JOIN LATERAL unnest(n.neighbor_ids, n.scores) WITH ORDINALITY AS nb(study_id, score, rank)
+            JOIN studies s ON s.id = nb.study_id
+            WHERE n.study_id = %s
+              AND n.embedding_model = %s
+              AND s.is_published = TRUE
+              AND upper(s.recruiting_status) = ANY(%s)
+            ORDER BY nb.rank
+            LIMIT %s
+        """, (study_id, model, OPEN_RECRUITING_STATUSES, limit))
+        return [
+            SimilarStudy(
+                study_id=row["id"],
+                title=row["title"],
+                plain_title=row["ai_plain_title"],
+                similarity=round(row["score"], 4),
+                recruiting_status=row["recruiting_status"],
+                conditions=row["conditions"] or []
+            )
+            for row in cursor.fetchall()
+        ]
+
+
+# --- Ingest Jobs ---
+
+INGEST_JOB_COUNTERS = ("processed", "inserted", "updated", "unchanged", "skipped", "failed")
+
+
+def start_ingest_job(
+    condition: str,
+    mode: str,
+    max_pages: int,
+    recruiting_only: bool,
+    updated_since: Optional[str] = None,
+    stale_after_minutes: int = 10
+) -> Optional[dict]:
+    """
+    Resume the latest unfinished job for a condition or create a new one
+
+    A 'running' job whose checkpoint is older than stale_after_minutes is
+    treated as abandoned (its process died) and resumed. A fresher one is
+    assumed to be live in another process, and None is returned.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, status, updated_at < NOW() - make_interval(mins => %s) AS abandoned
+            FROM ingest_jobs
+            WHERE condition = %s AND mode = %s AND status IN ('running', 'failed')
+            ORDER BY id DESC
+            LIMIT 1
+            FOR UPDATE
+        """, (stale_after_minutes, condition.lower(), mode))
+        job = cursor.fetchone()
+
+        if job:
+            if job["status"] == "running" and not job["abandoned"]:
+                return None
+            cursor.execute("""
+                UPDATE ingest_jobs
+                SET status = 'running', last_error = NULL, finished_at = NULL, updated_at = NOW()
+                WHERE id = %s
+                RETURNING *
+            """, (job["id"],))
+            return dict(cursor.fetchone())
+
+        cursor.execute("""
+            INSERT INTO ingest_jobs (condition, mode, recruiting_only, updated_since, max_pages)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING *
+        """, (condition.lower(), mode, recruiting_only, updated_since, max_pages))
+        return dict(cursor.fetchone())
+
+
+def checkpoint_ingest_job(
+    job_id: int,
+    next_page_token: Optional[str],
+    page_counts: dict,
+    active_seconds: float,
+    watermark: Optional[str] = None,
+    total_expected: Optional[int] = None
+) -> dict:
+    """
+    Record a fully processed page: advance the page token and add the page's counters
+
+    Returns:
+        The updated job row
+    """
+    assignments = ", ".join(f"{name} = {name} + %({name})s" for name in INGEST_JOB_COUNTERS)
+    params = {name: page_counts.get(name, 0) for name in INGEST_JOB_COUNTERS}
+    params.update({
+        "id": job_id,
+        "next_page_token": next_page_token,
+        "active_seconds": active_seconds,
+        "watermark": watermark,
+        "total_expected": total_expected
+    })
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE ingest_jobs
+            SET next_page_token = %(next_page_token)s,
+                pages_fetched = pages_fetched + 1,
+                {assignments},
+                active_seconds = active_seconds + %(active_seconds)s,
+                watermark = GREATEST(watermark, %(watermark)s::date),
+                total_expected = COALESCE(%(total_expected)s, total_expected),
+                updated_at = NOW()
+            WHERE id = %(id)s
+            RETURNING *
+        """, params)
+        return dict(cursor.fetchone())
+
+
+def finish_ingest_job(job_id: int, status: str, last_error: Optional[str] = None):
+    """Mark a job completed or failed (failed jobs are resumed by the next run)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE ingest_jobs
+            SET status = %s,
+                last_error = %s,
+                finished_at = CASE WHEN %s = 'completed' THEN NOW() ELSE NULL END,
+                updated_at = NOW()
+            WHERE id = %s
+        """, (status, last_error, status, job_id))
+
+
+def list_ingest_jobs(limit: int = 20, condition: Optional[str] = None) -> List[IngestJob]:
+    """Recent ingestion jobs with throughput and ETA"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        if condition:
+            cursor.execute(
+                "SELECT * FROM ingest_jobs WHERE condition = %s ORDER BY id DESC LIMIT %s",
+                (condition.lower(), limit)
+            )
+        else:
+            cursor.execute("SELECT * FROM ingest_jobs ORDER BY id DESC LIMIT %s", (limit,))
+        rows = cursor.fetchall()
+        return [_row_to_ingest_job(dict(row)) for row in rows]
+
+
+def _row_to_ingest_job(row: dict) -> IngestJob:
+    """Convert database row to IngestJob, deriving throughput from active time"""
+    active_seconds = row["active_seconds"] or 0.0
+    rate = row["processed"] / active_seconds if active_seconds > 0 else 0.0
+
+    percent_complete = None
+    eta_seconds = None
+    if row["status"] == "completed":
+        percent_complete = 100.0
+        eta_seconds = 0.0
+    elif row["total_expected"]:
+        percent_complete = min(100.0, 100.0 * row["processed"] / row["total_expected"])
+        if rate > 0:
+            eta_seconds = max(0, row["total_expected"] - row["processed"]) / rate
+
+    return IngestJob(
+        id=row["id"],
+        condition=row["condition"],
+        mode=row["mode"],
+        status=row["status"],
+        pages_fetched=row["pages_fetched"],
+        max_pages=row["max_pages"],
+        total_expected=row["total_expected"],
+        processed=row["processed"],
+        inserted=row["inserted"],
+        updated=row["updated"],
+        unchanged=row["unchanged"],
+        skipped=row["skipped"],
+        failed=row["failed"],
+        studies_per_second=round(rate, 2),
+        percent_complete=round(percent_complete, 1) if percent_complete is not None else None,
+        eta_seconds=round(eta_seconds) if eta_seconds is not None else None,
+        last_error=row["last_error"],
+        started_at=row["started_at"].isoformat(),
+        updated_at=row["updated_at"].isoformat(),
+        finished_at=row["finished_at"].isoformat() if row["finished_at"] else None
+    )
+
+
 # ======================================================================
 # SERVICE
 # ======================================================================
@@ -611,10 +2138,13 @@ def generate_locations_summary(study: Study) -> Optional[str]:
     return locations_summary
 
 
-def search_studies_semantic(request: SearchRequest) -> SearchResponse:
+def search_studies_semantic(request: SearchRequest, client: Optional[str] = None) -> SearchResponse:
     """
     Execute semantic search with vector similarity + keyword fallback
     Hybrid approach: Union vector candidates with keyword candidates
+
+    With a client, remote query embeddings are charged to its
+    QUERY_EMBEDDING_RATE_LIMIT budget.
     """
     # Normalize request parameters
     include_tags = [normalize_text(c) for c in request.conditions_include]
@@ -627,6 +2157,10 @@ def search_studies_semantic(request: SearchRequest) -> SearchResponse:
 
     # Generate query embedding
     try:
+        provider = get_embedding_provider()
+        if client and provider.remote and rate_limiter.retry_after(client, QUERY_EMBEDDING_RATE_LIMIT):
+            logger.info("Query embedding budget exhausted; keyword-only search")
+            return search_studies(request)
         query_embedding = generate_embedding(request.query_text.lower().strip())
     except Exception as e:
         logger.error(f"Failed to generate query embedding: {e}")
@@ -639,34 +2173,24 @@ def search_studies_semantic(request: SearchRequest) -> SearchResponse:
     with get_db() as conn:
         cursor = conn.cursor()
 
-        # Fetch vector similarity candidates (top 150, published only)
-        cursor.execute("""
-            SELECT id, source, source_id, title, brief_summary, detailed_description,
-                   description, eligibility_criteria, recruiting_status, study_type,
-                   interventions, conditions, locations, contacts, site_zips,
-                   created_at, updated_at, ai_plain_title,
-                   (embedding <=> %s::vector) as similarity_distance
-            FROM studies
-            WHERE embedding IS NOT NULL AND is_published = TRUE
-            ORDER BY similarity_distance
-            LIMIT 150
-        """, (query_embedding,))
-        vector_candidates = cursor.fetchall()
+        # Fetch vector similarity candidates (top 150, published only; active provider's vectors)
+        vector_candidates = fetch_vector_candidates(cursor, query_embedding, provider, request=request)
 
         for row in vector_candidates:
             candidate_map[row["id"]] = (row, row.get("similarity_distance", 1.0))
 
-        # Fetch keyword/trigram candidates (top 50, published only)
-        cursor.execute("""
+        # Fetch keyword/trigram candidates (top 50, published only, same age/sex filters)
+        filter_sql, filter_params = eligibility_filter_sql(request)
+        cursor.execute(f"""
             SELECT id, source, source_id, title, brief_summary, detailed_description,
                    description, eligibility_criteria, recruiting_status, study_type,
                    interventions, conditions, locations, contacts, site_zips,
                    created_at, updated_at, ai_plain_title
             FROM studies
-            WHERE search_text %% %s AND is_published = TRUE
-            ORDER BY similarity(search_text, %s) DESC
+            WHERE search_text %% %(query)s AND is_published = TRUE{filter_sql}
+            ORDER BY similarity(search_text, %(query)s) DESC
             LIMIT 50
-        """, (request.query_text.lower(), request.query_text.lower()))
+        """, {"query": request.query_text.lower(), **filter_params})
         keyword_candidates = cursor.fetchall()
 
         for row in keyword_candidates:
@@ -800,7 +2324,7 @@ def search_studies_semantic(request: SearchRequest) -> SearchResponse:
 
 def search_studies(request: SearchRequest) -> SearchResponse:
     """Execute search with filtering and scoring"""
-    all_studies = list_all_studies()
+    all_studies = list_all_studies(request)
     results = []
 
     # Normalize request parameters
@@ -899,6 +2423,485 @@ def search_studies(request: SearchRequest) -> SearchResponse:
     return SearchResponse(items=paginated_results, total=total)
 
 
+# --- Saved Search Alerts ---
+
+def has_word_prefix(sorted_words: List[str], prefix: str) -> bool:
+    """Whether any word starts with prefix (the first word not below it is the only candidate)"""
+    position = bisect.bisect_left(sorted_words, prefix)
+    return position < len(sorted_words) and sorted_words[position].startswith(prefix)
+
+
+def saved_search_document(study) -> dict:
+    """Fields of a study (StudyCreate or Study) that saved searches are matched on"""
+    text = " ".join([
+        study.title,
+        study.brief_summary or "",
+        study.detailed_description or "",
+        study.eligibility_criteria or "",
+        study.description or ""
+    ]).lower()
+    return {
+        # Leading brackets/quotes stripped so "(diabetes" still starts with "diabetes"
+        "words": sorted({word.lstrip("([{\"'") for word in text.split()}),
+        "conditions": {normalize_text(c) for c in study.conditions},
+        "site_zips": set(study.site_zips),
+        "min_age_months": study.min_age_months,
+        "max_age_months": study.max_age_months,
+        "eligible_sex": study.eligible_sex,
+    }
+
+
+class SavedSearchQuery:
+    """A saved SearchRequest prepared for matching"""
+    def __init__(self, search_id: int, user_id: str, request: SearchRequest):
+        self.search_id = search_id
+        self.user_id = user_id
+        self.include = {normalize_text(c) for c in request.conditions_include} - {""}
+        self.exclude = {normalize_text(c) for c in request.conditions_exclude} - {""}
+        self.keywords = tuple(normalize_text(request.query_text).split())
+        self.zip = request.zip.strip() if request.zip and request.zip.strip() else None
+        self.age = request.age
+        self.sex = request.sex
+
+    def matches(self, document: dict) -> bool:
+        """
+        The search's filters with every one required: exclude/include tags as in
+        search_studies, all keywords at the start of a word ("diabet" matches
+        "diabetes", "pain" does not match "spain"), the ZIP among the study's
+        sites, and age/sex as in eligibility_filter_sql
+        """
+        conditions = document["conditions"]
+        if self.exclude & conditions:
+            return False
+        if self.include and not self.include & conditions:
+            return False
+        if not all(has_word_prefix(document["words"], keyword) for keyword in self.keywords):
+            return False
+        if self.zip and self.zip not in document["site_zips"]:
+            return False
+        if self.age is not None:
+            if document["min_age_months"] is not None and document["min_age_months"] > self.age * 12 + 11:
+                return False
+            if document["max_age_months"] is not None and document["max_age_months"] < self.age * 12:
+                return False
+        if self.sex and document["eligible_sex"] not in (None, "all", self.sex):
+            return False
+        return True
+
+
+class SavedSearchIndex:
+    """
+    Reverse index of saved searches, queried with one study at a time
+
+    Each search is filed under an anchor every matching study must have: its
+    include tags (it needs one of them), else its longest keyword (all are
+    required and longer words are rarer), else its ZIP. A study only checks
+    the searches filed under its condition tags, the prefixes of its words and
+    its site ZIPs rather than every saved search; since keywords match at the
+    start of a word, a study finds its keyword anchors by looking up the
+    prefixes of its words.
+    """
+    def __init__(self):
+        self.by_condition = {}
+        self.by_keyword = {}
+        self.by_zip = {}
+        self.unanchored = []
+        self.keyword_lengths = []
+        self.size = 0
+
+    @classmethod
+    def from_rows(cls, rows) -> "SavedSearchIndex":
+        """Build from saved_searches rows; searches with an invalid request are skipped"""
+        index = cls()
+        for row in rows:
+            try:
+                request = SearchRequest.model_validate(row["request"])
+            except ValidationError as e:
+                logger.warning(f"Skipping saved search {row['id']} with an invalid request: {e}")
+                continue
+            index.add(SavedSearchQuery(row["id"], str(row["user_id"]), request))
+        return index
+
+    def add(self, query: SavedSearchQuery):
+        if query.include:
+            for tag in query.include:
+                self.by_condition.setdefault(tag, []).append(query)
+        elif query.keywords:
+            anchor = max(query.keywords, key=len)
+            self.by_keyword.setdefault(anchor, []).append(query)
+            if len(anchor) not in self.keyword_lengths:
+                self.keyword_lengths = sorted(self.keyword_lengths + [len(anchor)])
+        elif query.zip:
+            self.by_zip.setdefault(query.zip, []).append(query)
+        else:
+            self.unanchored.append(query)
+        self.size += 1
+
+    def candidates(self, document: dict) -> List[SavedSearchQuery]:
+        """Searches whose anchor the study has (each once)"""
+        found = {}
+        for tag in document["conditions"]:
+            for query in self.by_condition.get(tag, ()):
+                found[query.search_id] = query
+        if self.by_keyword:
+            for word in document["words"]:
+                for length in self.keyword_lengths:
+                    if length > len(word):
+                        break
+                    for query in self.by_keyword.get(word[:length], ()):
+                        found[query.search_id] = query
+        for zip_code in document["site_zips"]:
+            for query in self.by_zip.get(zip_code, ()):
+                found[query.search_id] = query
+        for query in self.unanchored:
+            found[query.search_id] = query
+        return list(found.values())
+
+    def match(self, document: dict) -> List[SavedSearchQuery]:
+        """Saved searches the study satisfies"""
+        return [query for query in self.candidates(document) if query.matches(document)]
+
+
+class SavedSearchAlerts:
+    """
+    Ingest hook: matches inserted and updated studies against saved searches
+    and records hits in search_notifications
+
+    observe() may be called from several ingest threads; matches are buffered
+    until flush() (once per ingested page), which also rebuilds the index when
+    saved_searches changed (checked at most every SAVED_SEARCH_RELOAD_SECONDS).
+    Studies that are no longer enrolling never alert.
+    """
+    def __init__(self, reload_seconds: float = SAVED_SEARCH_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self.index = SavedSearchIndex()
+        self.version = None
+        self.checked_at = None
+        self.pending = []
+        self.lock = threading.Lock()
+        self.notified = 0
+        self.refresh()
+
+    def refresh(self):
+        if self.checked_at is not None and perf_counter() - self.checked_at < self.reload_seconds:
+            return
+        self.checked_at = perf_counter()
+        version = get_saved_searches_version()
+        if version != self.version:
+            self.index = SavedSearchIndex.from_rows(fetch_saved_searches())
+            self.version = version
+
+    def observe(self, study: StudyCreate):
+        if not self.index.size or (study.recruiting_status or "").upper() not in OPEN_RECRUITING_STATUSES:
+            return
+        queries = self.index.match(saved_search_document(study))
+        if queries:
+            with self.lock:
+                self.pending.extend((query.search_id, study.source, study.source_id) for query in queries)
+
+    def flush(self) -> int:
+        """Write buffered matches; returns notifications created"""
+        with self.lock:
+            matches, self.pending = self.pending, []
+        written = write_search_notifications(matches)
+        if written:
+            telemetry.count("search_notifications", written)
+        self.notified += written
+        self.refresh()
+        return written
+
+
+# --- Study Neighbors ---
+
+def compute_neighbor_lists(
+    ids,
+    matrix,
+    rows,
+    existing: Optional[dict] = None,
+    k: int = STUDY_NEIGHBORS_K,
+    block_elements: int = STUDY_NEIGHBORS_BLOCK_ELEMENTS
+) -> dict:
+    """
+    Top-k neighbor lists for the given matrix rows, plus merged lists of the other studies
+
+    Similarities are computed a block of rows at a time (block x all studies,
+    one matrix product), so memory stays bounded by block_elements whatever
+    the corpus size. existing maps study_id -> (neighbor_ids, scores) for the
+    studies not in rows; a recomputed study enters such a list when it beats
+    its last score, and its stored score is replaced where it was listed.
+    A listed study that moved away keeps its (exact, lower) score, so a
+    merged list can miss a study that would now outrank it near the tail.
+
+    Returns:
+        study_id -> (neighbor_ids, scores) for every list that changed
+    """
+    import numpy as np
+
+    count = len(ids)
+    rows = np.asarray(rows, dtype=np.int64)
+    k = min(k, count - 1)
+    if k <= 0 or not len(rows):
+        return {int(ids[row]): ([], []) for row in rows}
+
+    id_list = ids.tolist()
+    row_of = {study_id: row for row, study_id in enumerate(id_list)}
+    recomputed = set(id_list[row] for row in rows.tolist())
+
+    # Clean studies: the score a recomputed study must beat, and where one is already listed
+    threshold = np.full(count, np.inf, dtype=np.float32)
+    listed_in = {}
+    for study_id, (neighbor_ids, scores) in (existing or {}).items():
+        row = row_of.get(study_id)
+        if row is None or study_id in recomputed:
+            continue
+        threshold[row] = scores[-1] if len(scores) >= k else -np.inf
+        for neighbor_id in neighbor_ids:
+            if neighbor_id in recomputed:
+                listed_in.setdefault(neighbor_id, []).append(row)
+
+    lists = {}
+    additions = {}
+    rows_per_block = max(1, block_elements // count)
+    for start in range(0, len(rows), rows_per_block):
+        block = rows[start:start + rows_per_block]
+        similarities = matrix[block] @ matrix.T
+        similarities[np.arange(len(block)), block] = -np.inf
+
+        top = np.argpartition(similarities, count - k, axis=1)[:, count - k:]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for i, row in enumerate(block.tolist()):
+            lists[id_list[row]] = (ids[top[i]].tolist(), top_scores[i].tolist())
+
+        if existing:
+            for i, j in zip(*np.nonzero(similarities > threshold)):
+                additions.setdefault(int(j), {})[id_list[block[i]]] = float(similarities[i, j])
+            for i, row in enumerate(block.tolist()):
+                for j in listed_in.get(id_list[row], ()):
+                    additions.setdefault(j, {})[id_list[row]] = float(similarities[i, j])
+
+    for row, found in additions.items():
+        neighbor_ids, scores = existing[id_list[row]]
+        merged = {
+            neighbor_id: score for neighbor_id, score in zip(neighbor_ids, scores)
+            if neighbor_id not in recomputed and neighbor_id in row_of
+        }
+        merged.update(found)
+        best = sorted(merged.items(), key=lambda item: -item[1])[:k]
+        lists[id_list[row]] = ([neighbor_id for neighbor_id, _ in best], [score for _, score in best])
+    return lists
+
+
+def refresh_study_neighbors(model: Optional[str] = None, full: bool = False, k: int = STUDY_NEIGHBORS_K) -> dict:
+    """
+    Recompute neighbor lists of studies whose embedding changed since their
+    list was computed, and merge them into the other studies' lists
+
+    Rebuilds every list when full is set, when none exist yet for model, or
+    when more than STUDY_NEIGHBORS_FULL_REBUILD_FRACTION of studies changed.
+
+    Returns:
+        {"studies", "recomputed", "merged", "full"} counts of the pass
+    """
+    import numpy as np
+
+    model = model or get_embedding_provider().model_name
+    stats = {"studies": 0, "recomputed": 0, "merged": 0, "full": full}
+    if not full and not count_stale_study_neighbors(model):
+        return stats
+
+    ids, text_hashes, matrix = fetch_study_embedding_matrix(model)
+    stats["studies"] = len(ids)
+    existing = {} if full else fetch_study_neighbor_lists(model)
+    stale = [
+        row for row, study_id in enumerate(ids.tolist())
+        if study_id not in existing or existing[study_id][2] != text_hashes[row]
+    ]
+    if not existing or len(stale) > STUDY_NEIGHBORS_FULL_REBUILD_FRACTION * len(ids):
+        stats["full"] = True
+        existing = {}
+        stale = list(range(len(ids)))
+
+    lists = compute_neighbor_lists(
+        ids, matrix, np.array(stale, dtype=np.int64),
+        {study_id: (neighbor_ids, scores) for study_id, (neighbor_ids, scores, _) in existing.items()},
+        k=k
+    )
+    hash_of = dict(zip(ids.tolist(), text_hashes))
+    rows = [(study_id, neighbor_ids, scores, hash_of[study_id]) for study_id, (neighbor_ids, scores) in lists.items()]
+    for start in range(0, len(rows), 1000):
+        write_study_neighbors(rows[start:start + 1000], model)
+    delete_orphan_study_neighbors(model)
+
+    stats["recomputed"] = len(stale)
+    stats["merged"] = len(lists) - len(stale)
+    return stats
+
+
+# ======================================================================
+# BACKGROUND WORKER
+# ======================================================================
+
+class EmbeddingWorker:
+    """
+    Drains embedding_queue in the background so new and edited studies get
+    vectors within seconds
+
+    Wakes on NOTIFY embedding_queue (sent by a trigger on the queue table) and
+    polls every EMBEDDING_WORKER_POLL_SECONDS in case a notification is missed.
+    At most `concurrency` embedding requests run at once, and all database work
+    happens in threads, so serving requests is never starved.
+    """
+    def __init__(
+        self,
+        batch_size: int = EMBEDDING_WORKER_BATCH_SIZE,
+        concurrency: int = EMBEDDING_WORKER_CONCURRENCY,
+        poll_seconds: float = EMBEDDING_WORKER_POLL_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.provider = None
+        self.task = None
+        self.embedded = 0
+
+    async def run(self):
+        """Main loop: drain, then sleep until notified (or the poll interval passes)"""
+        import psycopg
+        from platform_module import DATABASE_URL
+
+        self.provider = create_embedding_provider()
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True) as listener:
+                    await listener.execute("LISTEN embedding_queue")
+                    while True:
+                        await self.drain()
+                        async for _ in listener.notifies(timeout=self.poll_seconds, stop_after=1):
+                            pass
+                        await asyncio.sleep(EMBEDDING_WORKER_DEBOUNCE_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Embedding worker error, restarting in {self.poll_seconds:.0f}s: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def drain(self):
+        """Claim and embed batches until the queue has nothing claimable"""
+        while True:
+            rows = await asyncio.to_thread(
+                claim_embedding_queue_batch, self.batch_size, EMBEDDING_QUEUE_MAX_ATTEMPTS,
+                EMBEDDING_WORKER_LEASE_SECONDS
+            )
+            if not rows:
+                return
+            entries = group_by_text(rows)
+            texts = [entry["search_text"] for entry in entries]
+            results = await asyncio.gather(*[
+                self.embed_entries([entries[i] for i in indices])
+                for indices in batch_by_token_budget(texts)
+            ])
+            if not all(results):
+                # Provider trouble: wait for the next poll instead of spinning on retries
+                return
+
+    async def embed_entries(self, entries: list) -> bool:
+        """Embed one request batch and write the vectors; returns False if the request failed"""
+        async with self.semaphore:
+            try:
+                embeddings = await generate_embeddings_async(self.provider, [e["search_text"] for e in entries])
+            except Exception as e:
+                logger.warning(f"Embedding worker: batch of {len(entries)} texts failed: {e}")
+                study_ids = [study_id for entry in entries for study_id in entry["ids"]]
+                await asyncio.to_thread(record_embedding_failures, study_ids, str(e))
+                return False
+
+        updates = [
+            (study_id, embedding, entry["text_hash"])
+            for entry, embedding in zip(entries, embeddings)
+            for study_id in entry["ids"]
+        ]
+        self.embedded += await asyncio.to_thread(write_embeddings_bulk, updates)
+        return True
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.provider:
+            await self.provider.aclose()
+
+
+class SearchExposureCounter:
+    """
+    Counts how often each study appears in search results
+
+    Searches only bump an in-memory Counter; a background thread folds it into
+    study_search_exposure at most every SEARCH_EXPOSURE_FLUSH_SECONDS, so the
+    search path never waits on the write. Counts from a crashed process are
+    lost, which is fine for a prioritization signal.
+    """
+    def __init__(self, flush_seconds: float = SEARCH_EXPOSURE_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.pending = Counter()
+        self.lock = threading.Lock()
+        self.flushing = False
+        self.flushed_at = datetime.utcnow()
+
+    def add(self, study_ids):
+        with self.lock:
+            self.pending.update(study_ids)
+            due = (datetime.utcnow() - self.flushed_at).total_seconds() >= self.flush_seconds
+            if not due or self.flushing:
+                return
+            self.flushing = True
+        threading.Thread(target=self.flush, daemon=True).start()
+
+    def flush(self):
+        with self.lock:
+            counts, self.pending = self.pending, Counter()
+            self.flushed_at = datetime.utcnow()
+        try:
+            add_search_exposure(dict(counts))
+        except Exception as e:
+            logger.warning(f"Failed to record search exposure for {len(counts)} studies: {e}")
+        finally:
+            with self.lock:
+                self.flushing = False
+
+
+search_exposure = SearchExposureCounter()
+
+
+def register_embedding_worker(app: FastAPI):
+    """Run the embedding worker alongside the API when EMBEDDING_WORKER_ENABLED=true"""
+    if not EMBEDDING_WORKER_ENABLED:
+        return
+    if EMBEDDING_PROVIDER == "openai" and not OPENAI_API_KEY:
+        logger.warning("EMBEDDING_WORKER_ENABLED is set but OPENAI_API_KEY is not; embedding worker disabled")
+        return
+
+    worker = EmbeddingWorker()
+
+    @app.on_event("startup")
+    async def start_embedding_worker():
+        worker.start()
+        print(f"Embedding worker started (provider {EMBEDDING_PROVIDER}, concurrency {EMBEDDING_WORKER_CONCURRENCY}, "
+              f"batch size {EMBEDDING_WORKER_BATCH_SIZE})")
+
+    @app.on_event("shutdown")
+    async def stop_embedding_worker():
+        await worker.stop()
+
+
 # ======================================================================
 # ROUTES
 # ======================================================================
@@ -918,15 +2921,41 @@ def register_search_routes(app: FastAPI):
 
         return insert_study(study)
 
+    @app.get("/admin/ingest-jobs", response_model=List[IngestJob])
+    def get_ingest_jobs(
+        limit: int = 20,
+        condition: Optional[str] = None,
+        x_admin_token: Optional[str] = Header(None)
+    ):
+        """Admin endpoint listing recent ingestion jobs with throughput and ETA"""
+        if x_admin_token != ADMIN_TOKEN:
+            raise HTTPException(status_code=401, detail="Invalid or missing admin token")
+
+        return list_ingest_jobs(limit=min(max(limit, 1), 200), condition=condition)
+
     @app.post("/search", response_model=SearchResponse)
-    def search(request: SearchRequest):
+    def search(request: SearchRequest, http_request: Request):
         """Search studies with filtering and ranking"""
         if USE_SEMANTIC_SEARCH:
-            return search_studies_semantic(request)
+            response = search_studies_semantic(request, client_key(http_request))
         else:
-            return search_studies(request)
+            response = search_studies(request)
+        search_exposure.add(item.study_id for item in response.items[:SEARCH_EXPOSURE_TOP_N])
+        telemetry.count("page_views", page="search")
+        return response
+
+    @app.on_event("shutdown")
+    def flush_search_exposure():
+        search_exposure.flush()
 
     @app.get("/studies/{study_id}", response_model=Study)
-    def get_study(study_id: int):
-        """Get a specific study by ID"""
-        return get_study_by_id(study_id)
+    def get_study(study_id: int, include_raw: bool = False):
+        """Get a specific study by ID (pass include_raw=true for the raw source document)"""
+        study = get_study_by_id(study_id, include_raw=include_raw)
+        telemetry.count("page_views", page="study")
+        return study
+
+    @app.get("/studies/{study_id}/similar", response_model=List[SimilarStudy])
+    def get_similar(study_id: int, limit: int = 6):
+        """Published, enrolling studies nearest to this one (precomputed; empty until the neighbor refresh runs)"""
+        return get_similar_studies(study_id, min(max(limit, 1), SIMILAR_STUDIES_MAX_LIMIT))
@@ -1,6 +1,7 @@
 const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:8000";
 
-export async function searchStudies(query, page = 1, limit = 10, zip = null) {
+// eligibility: { age, sex } of the searcher; only studies they could enter are returned
+export async function searchStudies(query, page = 1, limit = 10, zip = null, eligibility = {}) {
   const response = await fetch(`${API_BASE}/search`, {
     method: "POST",
     headers: {
@@ -11,6 +12,8 @@ export async function searchStudies(query, page = 1, limit = 10, zip = null) {
       conditions_include: [],
       conditions_exclude: [],
       zip: zip,
+      age: eligibility.age ?? null,
+      sex: eligibility.sex ?? null,
       page: page,
       limit: limit
     }),
@@ -33,6 +36,17 @@ export async function getStudyById(studyId) {
   return response.json();
 }
 
+// Precomputed nearest studies (published and enrolling only); empty until the neighbor refresh has run
+export async function getSimilarStudies(studyId, limit = 6) {
+  const response = await fetch(`${API_BASE}/studies/${studyId}/similar?limit=${limit}`);
+
+  if (!response.ok) {
+    throw new Error(`Failed to fetch similar studies: ${response.statusText}`);
+  }
+
+  return response.json();
+}
+
 export async function generateEligibilityQuiz(studyId, eligibilityCriteria) {
   const response = await fetch(`${API_BASE}/ai/eligibility-quiz`, {
     method: "POST",
@@ -99,3 +113,100 @@ export async function generatePlainTitle(study) {
 
   return response.json();
 }
+
+// Plain title, summary and eligibility quiz in one request (one Claude call when not cached)
+export async function generateStudyBundle(study) {
+  const response = await fetch(`${API_BASE}/ai/study-bundle`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      study_id: study.id,
+      title: study.title,
+      brief_summary: study.brief_summary,
+      detailed_description: study.detailed_description,
+      eligibility_criteria: study.eligibility_criteria,
+      interventions: study.interventions?.map(i => i.intervention_name) || [],
+      conditions: study.conditions || []
+    }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.detail || `AI generation failed: ${response.statusText}`);
+  }
+
+  return response.json();
+}
+
+// Reads a server-sent event stream from an /ai/*/stream endpoint.
+// Calls onText(text) for each generated delta and resolves with the final
+// "done" payload (same shape as the JSON endpoint).
+async function readAiStream(response, onText) {
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.detail || `AI generation failed: ${response.statusText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || "{}");
+      if (event === "delta") onText?.(data.text);
+      else if (event === "done") return data;
+      else if (event === "error") throw new Error(data.detail || "AI generation failed");
+    }
+  }
+
+  throw new Error("AI stream ended unexpectedly");
+}
+
+export async function streamStudySummary(study, onText) {
+  const response = await fetch(`${API_BASE}/ai/study-summary/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      study_id: study.id,
+      title: study.title,
+      brief_summary: study.brief_summary,
+      detailed_description: study.detailed_description,
+      interventions: study.interventions?.map(i => i.intervention_name) || [],
+      conditions: study.conditions || []
+    }),
+  });
+
+  return readAiStream(response, onText);
+}
+
+export async function streamPlainTitle(study, onText) {
+  const response = await fetch(`${API_BASE}/ai/plain-title/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      study_id: study.id,
+      title: study.title,
+      brief_summary: study.brief_summary,
+      interventions: study.interventions?.map(i => i.intervention_name) || [],
+      conditions: study.conditions || []
+    }),
+  });
+
+  return readAiStream(response, onText);
+}
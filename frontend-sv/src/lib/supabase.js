@@ -178,6 +178,122 @@ export async function getUserParticipationRequests() {
   return data;
 }
 
+/**
+ * Recommendation helpers
+ */
+
+// Precomputed by scripts/refresh_recommendations.py; one indexed read of the user's own rows (RLS)
+export async function getRecommendations(limit = 10) {
+  const user = await getCurrentUser();
+  if (!user) return [];
+
+  const { data, error } = await supabase
+    .from('user_recommendations')
+    .select(`
+      score,
+      matched_conditions,
+      studies (
+        id,
+        title,
+        ai_plain_title,
+        recruiting_status,
+        conditions
+      )
+    `)
+    .eq('user_id', user.id)
+    .order('score', { ascending: false })
+    .limit(limit);
+
+  if (error) throw error;
+  // Studies the user can no longer read (unpublished) come back without a study
+  return data.filter(rec => rec.studies);
+}
+
+/**
+ * Saved search helpers
+ */
+
+// request is a POST /search body; ingestion alerts on new studies matching it (search_notifications)
+export async function saveSearch(name, request) {
+  const user = await getCurrentUser();
+  if (!user) throw new Error('Not authenticated');
+
+  const { data, error } = await supabase
+    .from('saved_searches')
+    .insert({ user_id: user.id, name, request })
+    .select()
+    .single();
+
+  if (error) throw error;
+  return data;
+}
+
+export async function getSavedSearches() {
+  const user = await getCurrentUser();
+  if (!user) return [];
+
+  const { data, error } = await supabase
+    .from('saved_searches')
+    .select('*')
+    .eq('user_id', user.id)
+    .order('created_at', { ascending: false });
+
+  if (error) throw error;
+  return data;
+}
+
+export async function deleteSavedSearch(savedSearchId) {
+  const { error } = await supabase
+    .from('saved_searches')
+    .delete()
+    .eq('id', savedSearchId);
+
+  if (error) throw error;
+}
+
+export async function getSearchNotifications({ unreadOnly = true, limit = 20 } = {}) {
+  const user = await getCurrentUser();
+  if (!user) return [];
+
+  let query = supabase
+    .from('search_notifications')
+    .select(`
+      id,
+      created_at,
+      read_at,
+      saved_searches (
+        id,
+        name
+      ),
+      studies (
+        id,
+        title,
+        ai_plain_title,
+        recruiting_status
+      )
+    `)
+    .eq('user_id', user.id)
+    .order('created_at', { ascending: false })
+    .limit(limit);
+
+  if (unreadOnly) query = query.is('read_at', null);
+
+  const { data, error } = await query;
+  if (error) throw error;
+  return data.filter(notification => notification.studies);
+}
+
+export async function markSearchNotificationsRead(notificationIds) {
+  if (notificationIds.length === 0) return;
+
+  const { error } = await supabase
+    .from('search_notifications')
+    .update({ read_at: new Date().toISOString() })
+    .in('id', notificationIds);
+
+  if (error) throw error;
+}
+
 export async function withdrawParticipationRequest(requestId) {
   const { data, error } = await supabase
     .from('participation_requests')
@@ -0,0 +1,97 @@
+"""
+Backfill structured eligibility columns from stored CT.gov raw documents
+Fills min_age_months, max_age_months, eligible_sex and healthy_volunteers for
+studies ingested before those columns existed, using the same extraction as
+ingest (extract_ctgov_fields). Where the raw document is the study's current
+version, content_hash is updated too, so the next ingest does not treat every
+study as changed.
+
+Usage:
+    python scripts/backfill_eligibility.py [--batch-size=500] [--dry-run]
+"""
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from time import monotonic
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from search_module import (
+    decode_raw_document,
+    extract_ctgov_fields,
+    fetch_ctgov_raw_documents,
+    write_study_eligibility,
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def eligibility_update(row: dict) -> dict:
+    """Structured eligibility (and the matching content_hash) for one stored study"""
+    raw_study = json.loads(decode_raw_document(row["encoding"], row["payload"]))
+    fields = extract_ctgov_fields(raw_study)
+    current = row["raw_content_hash"] == row["content_hash"]
+    return {
+        "id": row["id"],
+        "min_age_months": fields["min_age_months"],
+        "max_age_months": fields["max_age_months"],
+        "eligible_sex": fields["eligible_sex"],
+        "healthy_volunteers": fields["healthy_volunteers"],
+        "content_hash": fields["content_hash"] if current else None,
+        "previous_hash": row["content_hash"] if current else None,
+    }
+
+
+def main():
+    """Main backfill runner"""
+    batch_size = parse_flag_value("batch-size", DEFAULT_BATCH_SIZE, int)
+    dry_run = "--dry-run" in sys.argv
+
+    print("=" * 60)
+    print("STRUCTURED ELIGIBILITY BACKFILL")
+    print("=" * 60)
+
+    started = monotonic()
+    last_id = 0
+    written = 0
+    failed = 0
+    sexes = Counter()
+    with_age = 0
+
+    while True:
+        rows = fetch_ctgov_raw_documents(last_id, batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        updates = []
+        for row in rows:
+            try:
+                updates.append(eligibility_update(row))
+            except Exception as e:
+                failed += 1
+                print(f"  ERROR study {row['id']}: {e}")
+        for update in updates:
+            sexes[update["eligible_sex"]] += 1
+            with_age += update["min_age_months"] is not None or update["max_age_months"] is not None
+
+        if not dry_run:
+            written += write_study_eligibility(updates)
+        print(f"Progress: through study {last_id}, {sum(sexes.values())} parsed, {written} written, "
+              f"{failed} failed ({sum(sexes.values()) / max(monotonic() - started, 1e-9):.0f} studies/s)")
+
+    total = sum(sexes.values())
+    print(f"\n✓ Backfill complete{' (dry run)' if dry_run else ''}: {total} studies parsed, "
+          f"{written} written, {failed} failed in {monotonic() - started:.1f}s")
+    if total:
+        print(f"  With an age limit: {with_age} ({with_age / total:.0%}); sex: "
+              + ", ".join(f"{sex or 'not stated'}={n}" for sex, n in sexes.most_common()))
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
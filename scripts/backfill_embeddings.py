@@ -1,122 +1,526 @@
 """
 Backfill embeddings for existing studies
-Resumable: skips studies that already have embeddings
+Drains embedding_queue: studies with no embedding, or whose search_text changed
+since it was embedded (kept up to date by a trigger). Studies embedded by a
+different model are queued at startup. Identical texts are embedded once, and
+texts already embedded elsewhere reuse the existing vector.
+
+Pipelined: a reader prefetches queued studies by id and cuts them into
+request batches by estimated tokens, N embedding requests run concurrently
+under an adaptive request and tokens-per-minute budget, and a writer applies
+each batch with a single UPDATE ... FROM statement while the next batches are
+in flight. Rate limits shrink the budgets; failing batches are bisected so a
+bad input only costs itself.
+
+Usage:
+    python scripts/backfill_embeddings.py [--concurrency=4] [--rps=5] [--tpm=1000000]
+        [--max-batch-tokens=100000] [--fetch-size=1000] [--chunks] [--dry-run] [--skip-index] [--verify]
+
+Vectors come from the configured EMBEDDING_PROVIDER and are tagged with its
+model name; the vector index is per model (see create_index).
+
+Measure offline against the fixture server's fake embeddings:
+    python scripts/fixture_server.py --embeddings-only
+    OPENAI_BASE_URL=http://localhost:8765/v1 OPENAI_API_KEY=fixture python scripts/backfill_embeddings.py --skip-index
+or with no network at all:
+    EMBEDDING_PROVIDER=local python scripts/backfill_embeddings.py
+
+--chunks embeds passages of detailed_description and eligibility_criteria
+into study_chunks instead (multi-vector mode, USE_CHUNKED_EMBEDDINGS=true):
+    python scripts/backfill_embeddings.py --chunks [--concurrency=4] ...
 """
+import asyncio
+import re
 import sys
-from time import sleep
 from pathlib import Path
+from time import monotonic
 
 # Add backend directory to path for imports
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-from search_module import generate_embeddings_batch, normalize_for_embedding
+from cli import parse_flag_value
+from search_module import (
+    EMBEDDING_MAX_INPUTS_PER_REQUEST,
+    EMBEDDING_QUEUE_MAX_ATTEMPTS,
+    EMBEDDING_REQUEST_TOKEN_BUDGET,
+    batch_by_token_budget,
+    build_study_chunks,
+    count_embedding_queue,
+    create_embedding_provider,
+    delete_stale_study_chunks,
+    enqueue_embedding_model_mismatches,
+    estimate_tokens,
+    fetch_embedding_queue_batch,
+    fetch_studies_needing_chunks,
+    generate_embeddings_async,
+    get_embedding_provider,
+    group_by_text,
+    record_embedding_failures,
+    replace_study_chunks,
+    reuse_duplicate_embeddings,
+    write_embeddings_bulk,
+)
 from platform_module import get_db
 
-BATCH_SIZE = 100  # OpenAI allows up to 2048, but 100 is safer for rate limits
-RATE_LIMIT_DELAY = 1.0  # Seconds between batches
+FETCH_SIZE = 1000  # Pending studies read per query (split into request batches by tokens)
+DEFAULT_CONCURRENCY = 4  # Embedding requests in flight
+DEFAULT_REQUESTS_PER_SECOND = 5.0  # Starting request rate; adapts to 429s
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000  # Starting token budget; adapts to 429s
+MAX_REQUESTS_PER_SECOND = 50.0
+MIN_REQUEST_TOKEN_BUDGET = 2_000
+MAX_EMBED_ATTEMPTS = 3  # Per batch for transient errors, before it is bisected
+MAX_QUEUE_ATTEMPTS = EMBEDDING_QUEUE_MAX_ATTEMPTS  # Failed runs before a queued study is left for inspection
 
 
-def backfill_embeddings(dry_run: bool = False):
+class AdaptiveRateLimiter:
     """
-    Backfill embeddings for studies missing them
+    Request and token budgets for embedding calls that adapt to the provider (AIMD)
+    Each success grows the budgets a little; a 429 halves them and pauses all callers
+    """
+    def __init__(
+        self,
+        requests_per_second: float,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        request_token_budget: int = EMBEDDING_REQUEST_TOKEN_BUDGET,
+        max_requests_per_second: float = MAX_REQUESTS_PER_SECOND,
+        min_requests_per_second: float = 0.2
+    ):
+        self.requests_per_second = requests_per_second
+        self.max_requests_per_second = max_requests_per_second
+        self.min_requests_per_second = min_requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.max_tokens_per_minute = tokens_per_minute
+        self.request_token_budget = request_token_budget
+        self.max_request_token_budget = request_token_budget
+        self.next_slot = 0.0
+        self.backoff_until = 0.0
+        # Token bucket in "debt" form: spending may go negative and callers wait it off
+        self.token_balance = float(tokens_per_minute)
+        self.refilled_at = monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        """Wait for a request slot and for the token bucket to cover this request"""
+        async with self.lock:
+            now = monotonic()
+            refill_rate = self.tokens_per_minute / 60.0
+            self.token_balance = min(
+                float(self.tokens_per_minute),
+                self.token_balance + (now - self.refilled_at) * refill_rate
+            )
+            self.refilled_at = now
+            self.token_balance -= tokens
+            token_wait = -self.token_balance / refill_rate if self.token_balance < 0 else 0.0
+
+            slot = max(now + token_wait, self.next_slot)
+            self.next_slot = slot + 1.0 / self.requests_per_second
+            wait = slot - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        self.requests_per_second = min(self.max_requests_per_second, self.requests_per_second + 0.1)
+        self.tokens_per_minute = min(self.max_tokens_per_minute, int(self.tokens_per_minute * 1.02) + 1)
+        self.request_token_budget = min(self.max_request_token_budget, int(self.request_token_budget * 1.05) + 1)
+
+    def on_rate_limited(self, retry_after: float = None):
+        now = monotonic()
+        pause = retry_after if retry_after else 1.0
+        # In-flight requests from the same burst all come back 429: cut the budgets once per event
+        if now >= self.backoff_until:
+            self.requests_per_second = max(self.min_requests_per_second, self.requests_per_second / 2)
+            self.tokens_per_minute = max(self.max_tokens_per_minute // 20, self.tokens_per_minute // 2)
+            self.request_token_budget = max(MIN_REQUEST_TOKEN_BUDGET, self.request_token_budget // 2)
+            self.backoff_until = now + pause
+        # Push the next slot out so in-flight callers back off together
+        self.next_slot = max(self.next_slot, now + pause)
+
+
+class BackfillStats:
+    """Counters for a single backfill run"""
+    def __init__(self, total: int):
+        self.total = total
+        self.written = 0
+        self.failed = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.bisected = 0
+        self.deduplicated = 0
+        self.tokens = 0
+        self.started = monotonic()
+
+    def rows_per_second(self) -> float:
+        elapsed = monotonic() - self.started
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def tokens_per_second(self) -> float:
+        elapsed = monotonic() - self.started
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+
+async def embed_rows(provider, limiter: AdaptiveRateLimiter, rows: list, stats: BackfillStats) -> list:
+    """
+    Embed a request batch of text entries (see group_by_text), returning (entry, embedding) pairs
+
+    Rate limits shrink the budgets and retry (bisecting first if the batch no
+    longer fits the request budget). Other errors are retried a few times, then
+    the batch is bisected so a single bad input is isolated and skipped.
+    """
+    from openai import APIStatusError, RateLimitError
+
+    texts = [row["search_text"] for row in rows]
+    tokens = sum(estimate_tokens(t) for t in texts)
+    attempts = 0
+
+    while True:
+        if len(rows) > 1 and tokens > limiter.request_token_budget:
+            return await bisect_rows(provider, limiter, rows, stats)
+
+        await limiter.acquire(tokens)
+        stats.requests += 1
+        try:
+            embeddings = await generate_embeddings_async(provider, texts)
+            limiter.on_success()
+            stats.tokens += tokens
+            return list(zip(rows, embeddings))
+        except RateLimitError as e:
+            stats.rate_limited += 1
+            retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+            limiter.on_rate_limited(float(retry_after) if retry_after else None)
+            continue
+        except APIStatusError as e:
+            # Other 4xx (e.g. input too long) will not succeed on retry
+            if e.status_code < 500:
+                attempts = MAX_EMBED_ATTEMPTS
+            error = e
+        except Exception as e:
+            error = e
+
+        attempts += 1
+        if attempts < MAX_EMBED_ATTEMPTS:
+            print(f"  ERROR generating embeddings: {error} (retry {attempts}/{MAX_EMBED_ATTEMPTS - 1})")
+            await asyncio.sleep(2 ** attempts)
+            continue
+        if len(rows) > 1:
+            return await bisect_rows(provider, limiter, rows, stats)
+        stats.failed += len(rows[0]["ids"])
+        print(f"  ERROR skipping studies {rows[0]['ids']}: {error}")
+        if "chunk" not in rows[0]:
+            # Passages are not queued; the next --chunks run retries their study
+            await asyncio.to_thread(record_embedding_failures, rows[0]["ids"], str(error))
+        return []
+
+
+async def bisect_rows(provider, limiter: AdaptiveRateLimiter, rows: list, stats: BackfillStats) -> list:
+    """Split a batch in half and embed each half"""
+    stats.bisected += 1
+    middle = len(rows) // 2
+    left = await embed_rows(provider, limiter, rows[:middle], stats)
+    right = await embed_rows(provider, limiter, rows[middle:], stats)
+    return left + right
+
+
+def make_limiter(provider, requests_per_second: float, tokens_per_minute: int,
+                 max_batch_tokens: int) -> AdaptiveRateLimiter:
+    """Rate limiter for a provider; local providers are CPU bound, so only batch size matters"""
+    if not provider.remote:
+        requests_per_second, tokens_per_minute = MAX_REQUESTS_PER_SECOND * 1000, 10 ** 12
+    return AdaptiveRateLimiter(requests_per_second, tokens_per_minute, max_batch_tokens,
+                               max_requests_per_second=max(MAX_REQUESTS_PER_SECOND, requests_per_second))
+
+
+async def run_backfill_pipeline(
+    total: int,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    fetch_size: int = FETCH_SIZE,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+    max_batch_tokens: int = EMBEDDING_REQUEST_TOKEN_BUDGET
+) -> BackfillStats:
+    """Reader -> concurrent embedders -> bulk writer, connected by bounded queues"""
+    provider = create_embedding_provider(max_retries=0)
+    limiter = make_limiter(provider, requests_per_second, tokens_per_minute, max_batch_tokens)
+    stats = BackfillStats(total)
+
+    # Bounded queues give backpressure: the reader stays a couple of batches ahead
+    pending = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def reader():
+        last_id = 0
+        while True:
+            rows = await asyncio.to_thread(fetch_embedding_queue_batch, last_id, fetch_size, MAX_QUEUE_ATTEMPTS)
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            entries = group_by_text(rows)
+            stats.deduplicated += len(rows) - len(entries)
+            # Cut with the current (possibly shrunk) request budget
+            texts = [entry["search_text"] for entry in entries]
+            for indices in batch_by_token_budget(texts, limiter.request_token_budget, EMBEDDING_MAX_INPUTS_PER_REQUEST):
+                await pending.put([entries[i] for i in indices])
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def embedder():
+        while True:
+            rows = await pending.get()
+            if rows is None:
+                return
+            embedded = await embed_rows(provider, limiter, rows, stats)
+            if embedded:
+                await results.put([
+                    (study_id, embedding, entry["text_hash"])
+                    for entry, embedding in embedded
+                    for study_id in entry["ids"]
+                ])
+
+    async def writer():
+        while True:
+            updates = await results.get()
+            if updates is None:
+                return
+            try:
+                stats.written += await asyncio.to_thread(write_embeddings_bulk, updates, provider.model_name)
+            except Exception as e:
+                stats.failed += len(updates)
+                print(f"  ERROR writing batch of {len(updates)}: {e}")
+            progress_pct = int(100 * stats.written / total) if total > 0 else 100
+            print(f"Progress: {stats.written}/{total} ({progress_pct}%) "
+                  f"{stats.rows_per_second():.0f} rows/sec, {stats.tokens_per_second():.0f} tokens/sec, "
+                  f"budget {limiter.request_token_budget} tokens/request")
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        await asyncio.gather(reader(), *[embedder() for _ in range(max(1, concurrency))])
+    finally:
+        await results.put(None)
+        await writer_task
+        await provider.aclose()
+
+    return stats
+
+
+def backfill_embeddings(
+    dry_run: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    fetch_size: int = FETCH_SIZE,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+    max_batch_tokens: int = EMBEDDING_REQUEST_TOKEN_BUDGET
+):
+    """
+    Embed every study in embedding_queue (missing, stale or from another model)
 
     Args:
         dry_run: If True, only print what would be done without making changes
+        concurrency: Embedding requests in flight
+        fetch_size: Pending studies read per query
+        requests_per_second: Starting request rate (adapts to rate limiting)
+        tokens_per_minute: Starting token budget per minute (adapts to rate limiting)
+        max_batch_tokens: Estimated tokens per embeddings request
     """
-    with get_db() as conn:
-        cursor = conn.cursor()
+    model = get_embedding_provider().model_name
+    if not dry_run:
+        requeued = enqueue_embedding_model_mismatches(model)
+        if requeued:
+            print(f"Queued {requeued} studies embedded by a model other than {model}")
+        reused = reuse_duplicate_embeddings(model)
+        if reused:
+            print(f"Reused existing vectors for {reused} studies with identical text")
+
+    total = count_embedding_queue(MAX_QUEUE_ATTEMPTS)
+
+    print(f"Found {total} studies needing embeddings")
+    if total == 0:
+        print("✓ Nothing to backfill! All studies have embeddings.")
+        return
 
-        # Count studies needing embeddings
-        cursor.execute("""
-            SELECT COUNT(*) as count
-            FROM studies
-            WHERE embedding IS NULL AND search_text IS NOT NULL
-        """)
-        total = cursor.fetchone()["count"]
+    if dry_run:
+        print(f"[DRY RUN] Would process these studies in batches of up to {max_batch_tokens} tokens "
+              f"with {concurrency} requests in flight")
+        return
 
-        print(f"Found {total} studies needing embeddings")
-        if total == 0:
-            print("✓ Nothing to backfill! All studies have embeddings.")
-            return
+    stats = asyncio.run(run_backfill_pipeline(
+        total, concurrency, fetch_size, requests_per_second, tokens_per_minute, max_batch_tokens
+    ))
 
-        if dry_run:
-            print(f"[DRY RUN] Would process these studies in batches of {BATCH_SIZE}")
-            return
+    elapsed = monotonic() - stats.started
+    print(f"\n✓ Backfill complete! Processed {stats.written} studies in {elapsed:.1f}s "
+          f"({stats.rows_per_second():.0f} rows/sec, {stats.tokens_per_second():.0f} tokens/sec)")
+    print(f"  Requests: {stats.requests} ({stats.rate_limited} rate limited, {stats.bisected} bisections), "
+          f"{stats.deduplicated} duplicate texts skipped, failed rows: {stats.failed}")
 
-        # Fetch and process studies in batches
-        processed = 0
-        while True:
-            cursor.execute("""
-                SELECT id, search_text
-                FROM studies
-                WHERE embedding IS NULL AND search_text IS NOT NULL
-                ORDER BY id
-                LIMIT %s
-            """, (BATCH_SIZE,))
-
-            batch = cursor.fetchall()
-            if not batch:
-                break
 
-            print(f"\nProcessing batch: {processed + 1} to {processed + len(batch)}")
+async def run_chunk_pipeline(
+    concurrency: int = DEFAULT_CONCURRENCY,
+    fetch_size: int = FETCH_SIZE,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+    max_batch_tokens: int = EMBEDDING_REQUEST_TOKEN_BUDGET
+) -> BackfillStats:
+    """
+    Same reader -> embedders -> writer shape as run_backfill_pipeline, over passages
+
+    A study's passages may land in different request batches; the writer holds
+    them until all of a study's passages are embedded and then replaces its
+    study_chunks rows in one statement. A study with a failed passage is left
+    as it was and picked up again by the next run.
+    """
+    provider = create_embedding_provider(max_retries=0)
+    limiter = make_limiter(provider, requests_per_second, tokens_per_minute, max_batch_tokens)
+    stats = BackfillStats(0)
+    passages_written = 0
 
-            # Generate embeddings for batch
-            texts = [row["search_text"] for row in batch]
+    pending = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def reader():
+        last_id = 0
+        while True:
+            rows = await asyncio.to_thread(fetch_studies_needing_chunks, last_id, fetch_size, provider.model_name)
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            entries = []
+            for row in rows:
+                chunks = build_study_chunks(row)
+                study = {"study_id": row["id"], "source_hash": row["source_hash"], "chunks": [],
+                         "expected": len(chunks)}
+                entries.extend({"search_text": chunk["content"], "ids": [row["id"]], "chunk": chunk, "study": study}
+                               for chunk in chunks)
+            stats.total += len(rows)
+            texts = [entry["search_text"] for entry in entries]
+            for indices in batch_by_token_budget(texts, limiter.request_token_budget, EMBEDDING_MAX_INPUTS_PER_REQUEST):
+                await pending.put([entries[i] for i in indices])
+        for _ in range(concurrency):
+            await pending.put(None)
+
+    async def embedder():
+        while True:
+            entries = await pending.get()
+            if entries is None:
+                return
+            embedded = await embed_rows(provider, limiter, entries, stats)
+            if embedded:
+                await results.put(embedded)
+
+    async def writer():
+        nonlocal passages_written
+        while True:
+            embedded = await results.get()
+            if embedded is None:
+                return
+            complete = []
+            for entry, embedding in embedded:
+                study = entry["study"]
+                study["chunks"].append(dict(entry["chunk"], embedding=embedding))
+                if len(study["chunks"]) == study["expected"]:
+                    complete.append(study)
+            if not complete:
+                continue
             try:
-                embeddings = generate_embeddings_batch(texts)
+                passages_written += await asyncio.to_thread(replace_study_chunks, complete, provider.model_name)
+                stats.written += len(complete)
             except Exception as e:
-                print(f"ERROR generating embeddings: {e}")
-                print("Sleeping 10 seconds before retry...")
-                sleep(10)
-                continue
+                stats.failed += len(complete)
+                print(f"  ERROR writing passages for {len(complete)} studies: {e}")
+            print(f"Progress: {stats.written} studies ({passages_written} passages), "
+                  f"{stats.tokens_per_second():.0f} tokens/sec, "
+                  f"budget {limiter.request_token_budget} tokens/request")
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        await asyncio.gather(reader(), *[embedder() for _ in range(max(1, concurrency))])
+    finally:
+        await results.put(None)
+        await writer_task
+        await provider.aclose()
+
+    return stats
+
+
+def backfill_study_chunks(
+    dry_run: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    fetch_size: int = FETCH_SIZE,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+    max_batch_tokens: int = EMBEDDING_REQUEST_TOKEN_BUDGET
+):
+    """Chunk and embed long fields of every study whose passages are missing or stale"""
+    if dry_run:
+        sample = fetch_studies_needing_chunks(0, fetch_size, get_embedding_provider().model_name)
+        passages = sum(len(build_study_chunks(row)) for row in sample)
+        print(f"[DRY RUN] First {len(sample)} studies needing passages would produce {passages} passages")
+        return
+
+    removed = delete_stale_study_chunks()
+    if removed:
+        print(f"Removed {removed} passages of studies whose text changed")
+
+    stats = asyncio.run(run_chunk_pipeline(
+        concurrency, fetch_size, requests_per_second, tokens_per_minute, max_batch_tokens
+    ))
+
+    elapsed = monotonic() - stats.started
+    print(f"\n✓ Chunk backfill complete! {stats.written}/{stats.total} studies in {elapsed:.1f}s "
+          f"({stats.tokens_per_second():.0f} tokens/sec)")
+    print(f"  Requests: {stats.requests} ({stats.rate_limited} rate limited, {stats.bisected} bisections), "
+          f"failed studies: {stats.total - stats.written}")
+
+
+def embedding_index_name(model_name: str, table: str = "studies") -> str:
+    """Index name for one embedding model, e.g. idx_studies_embedding_text_embedding_3_small"""
+    return f"idx_{table}_embedding_" + re.sub(r"[^a-z0-9]+", "_", model_name.lower()).strip("_")
 
-            # Update database
-            update_count = 0
-            for row, embedding in zip(batch, embeddings):
-                try:
-                    cursor.execute("""
-                        UPDATE studies
-                        SET embedding = %s
-                        WHERE id = %s
-                    """, (embedding, row["id"]))
-                    update_count += 1
-                except Exception as e:
-                    print(f"  ERROR updating study {row['id']}: {e}")
-
-            conn.commit()
-            processed += update_count
-            progress_pct = int(100 * processed / total) if total > 0 else 100
-            print(f"Progress: {processed}/{total} ({progress_pct}%)")
-
-            # Rate limiting between batches
-            if processed < total:
-                sleep(RATE_LIMIT_DELAY)
-
-        print(f"\n✓ Backfill complete! Processed {processed} studies.")
-
-
-def create_index():
-    """Create IVFFLAT index after backfill completes"""
-    print("\nCreating IVFFLAT index for vector similarity search...")
+
+def create_index(table: str = "studies"):
+    """
+    Create the IVFFLAT index for the configured provider after backfill completes
+
+    The embedding column has no fixed dimension, so each model gets a partial
+    expression index: its rows cast to its dimension. Semantic search uses the
+    same expression and embedding_model predicate. table is studies or
+    study_chunks.
+    """
+    from psycopg import sql
+
+    provider = get_embedding_provider()
+    index_name = embedding_index_name(provider.model_name, table)
+    print(f"\nCreating IVFFLAT index {index_name} for vector similarity search...")
     with get_db() as conn:
         cursor = conn.cursor()
 
         # Check if index already exists
         cursor.execute("""
             SELECT indexname FROM pg_indexes
-            WHERE tablename = 'studies' AND indexname = 'idx_studies_embedding_ivfflat'
-        """)
+            WHERE tablename = %s AND indexname = %s
+        """, (table, index_name))
         if cursor.fetchone():
             print("✓ Index already exists, skipping.")
             return
 
-        print("Building index (this may take a few minutes)...")
-        cursor.execute("""
-            CREATE INDEX idx_studies_embedding_ivfflat ON public.studies
-            USING ivfflat (embedding vector_cosine_ops)
-            WITH (lists = 100)
-        """)
+        # pgvector guidance: about rows / 1000 lists (study_chunks is several times larger than studies)
+        cursor.execute(sql.SQL("SELECT COUNT(*) AS n FROM {table} WHERE embedding_model = %s").format(
+            table=sql.Identifier("public", table)
+        ), (provider.model_name,))
+        lists = max(100, cursor.fetchone()["n"] // 1000)
+
+        print(f"Building index with {lists} lists (this may take a few minutes)...")
+        cursor.execute(sql.SQL("""
+            CREATE INDEX {index} ON {table}
+            USING ivfflat ((embedding::vector({dim})) vector_cosine_ops)
+            WITH (lists = {lists})
+            WHERE embedding_model = {model}
+        """).format(
+            index=sql.Identifier(index_name),
+            table=sql.Identifier("public", table),
+            lists=sql.Literal(lists),
+            dim=sql.Literal(int(provider.dimension)),
+            model=sql.Literal(provider.model_name)
+        ))
         conn.commit()
         print("✓ Index created successfully!")
 
@@ -135,26 +539,48 @@ def verify_embeddings():
             SELECT
                 COUNT(*) as total,
                 COUNT(embedding) as with_embedding,
-                COUNT(*) FILTER (WHERE embedding IS NULL) as missing
+                COUNT(*) FILTER (WHERE embedding IS NULL) as missing,
+                COUNT(*) FILTER (WHERE embedding IS NOT NULL
+                                 AND embedding_text_hash IS DISTINCT FROM md5(search_text)) as stale,
+                COUNT(*) FILTER (WHERE embedding IS NOT NULL
+                                 AND embedding_model IS DISTINCT FROM %s) as other_model
             FROM studies
-        """)
+        """, (get_embedding_provider().model_name,))
         stats = cursor.fetchone()
 
+        cursor.execute("""
+            SELECT COUNT(*) as queued, COUNT(*) FILTER (WHERE attempts >= %s) as given_up
+            FROM embedding_queue
+        """, (MAX_QUEUE_ATTEMPTS,))
+        queue = cursor.fetchone()
+
         print(f"\nEmbedding Coverage:")
         print(f"  Total studies: {stats['total']}")
         print(f"  With embeddings: {stats['with_embedding']}")
         print(f"  Missing embeddings: {stats['missing']}")
+        print(f"  Stale (text changed since embedding): {stats['stale']}")
+        print(f"  From another model: {stats['other_model']}")
+        print(f"  Queued: {queue['queued']} ({queue['given_up']} past {MAX_QUEUE_ATTEMPTS} failed attempts)")
 
         if stats['missing'] > 0:
             print(f"\n⚠ Warning: {stats['missing']} studies still missing embeddings")
         else:
             print(f"\n✓ All studies have embeddings!")
 
+        cursor.execute("SELECT to_regclass('public.study_chunks') IS NOT NULL AS present")
+        if cursor.fetchone()["present"]:
+            cursor.execute("""
+                SELECT COUNT(*) AS passages, COUNT(DISTINCT study_id) AS studies
+                FROM study_chunks WHERE embedding_model = %s
+            """, (get_embedding_provider().model_name,))
+            chunks = cursor.fetchone()
+            print(f"\nPassages (--chunks): {chunks['passages']} across {chunks['studies']} studies")
+
         # Check index
         cursor.execute("""
             SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) as size
             FROM pg_indexes
-            WHERE tablename = 'studies' AND indexname LIKE '%embedding%'
+            WHERE tablename IN ('studies', 'study_chunks') AND indexname LIKE '%embedding%'
         """)
         indexes = cursor.fetchall()
 
@@ -177,17 +603,26 @@ def main():
     dry_run = "--dry-run" in sys.argv
     skip_index = "--skip-index" in sys.argv
     verify_only = "--verify" in sys.argv
+    chunks = "--chunks" in sys.argv
 
     if verify_only:
         verify_embeddings()
         return
 
     # Run backfill
-    backfill_embeddings(dry_run=dry_run)
+    run = backfill_study_chunks if chunks else backfill_embeddings
+    run(
+        dry_run=dry_run,
+        concurrency=parse_flag_value("concurrency", DEFAULT_CONCURRENCY, int),
+        fetch_size=parse_flag_value("fetch-size", FETCH_SIZE, int),
+        requests_per_second=parse_flag_value("rps", DEFAULT_REQUESTS_PER_SECOND, float),
+        tokens_per_minute=parse_flag_value("tpm", DEFAULT_TOKENS_PER_MINUTE, int),
+        max_batch_tokens=parse_flag_value("max-batch-tokens", EMBEDDING_REQUEST_TOKEN_BUDGET, int)
+    )
 
     # Create index if requested
     if not dry_run and not skip_index:
-        create_index()
+        create_index("study_chunks" if chunks else "studies")
 
     # Verify results
     if not dry_run:
@@ -0,0 +1,162 @@
+"""
+Compare three-call and bundled AI generation per study
+For each sampled study, generates plain title, summary and quiz the way the
+single-artifact endpoints do (three concurrent calls) and with the
+/ai/study-bundle prompt (one call), then reports input/output tokens and
+wall-clock latency of both. Nothing is written to the cache.
+
+Usage:
+    python scripts/bench_ai_bundle.py [--limit=10] [--ids=12,34]
+
+Measure offline against the fixture server's fake Claude:
+    python scripts/fixture_server.py --llm-only
+    ANTHROPIC_BASE_URL=http://localhost:8765 ANTHROPIC_API_KEY=fixture python scripts/bench_ai_bundle.py
+"""
+import asyncio
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from ai_module import (
+    PlainTitleRequest,
+    StudyBundleRequest,
+    StudySummaryRequest,
+    build_eligibility_quiz_prompt,
+    build_plain_title_prompt,
+    build_study_bundle_prompt,
+    build_study_summary_prompt,
+    close_anthropic_client,
+    create_message,
+    fetch_studies_for_ai,
+    parse_eligibility_quiz,
+    parse_study_bundle,
+)
+from platform_module import get_db
+
+
+def sample_study_ids(limit: int) -> list:
+    """Published studies with eligibility criteria (so all three artifacts are generated)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id FROM studies
+            WHERE is_published = TRUE AND COALESCE(eligibility_criteria, '') <> ''
+            ORDER BY id
+            LIMIT %s
+        """, (limit,))
+        return [row["id"] for row in cursor.fetchall()]
+
+
+def usage_of(messages: list) -> tuple:
+    """(input tokens, output tokens) summed over messages"""
+    return (sum(m.usage.input_tokens for m in messages), sum(m.usage.output_tokens for m in messages))
+
+
+async def three_calls(study: dict) -> dict:
+    """Title, summary and quiz as separate concurrent calls (the single-artifact endpoints)"""
+    title_request = PlainTitleRequest(
+        study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+        interventions=study["interventions"], conditions=study["conditions"]
+    )
+    summary_request = StudySummaryRequest(
+        study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+        detailed_description=study["detailed_description"],
+        interventions=study["interventions"], conditions=study["conditions"]
+    )
+    started = perf_counter()
+    messages = await asyncio.gather(
+        create_message(build_plain_title_prompt(title_request), 500, "plain_title"),
+        create_message(build_study_summary_prompt(summary_request), 1500, "study_summary"),
+        create_message(build_eligibility_quiz_prompt(study["eligibility_criteria"]), 2000, "eligibility_quiz")
+    )
+    elapsed = perf_counter() - started
+    parse_eligibility_quiz(messages[2].content[0].text.strip())
+    input_tokens, output_tokens = usage_of(messages)
+    return {"seconds": elapsed, "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+async def bundled_call(study: dict) -> dict:
+    """All three artifacts from one /ai/study-bundle prompt"""
+    request = StudyBundleRequest(
+        study_id=study["id"], title=study["title"], brief_summary=study["brief_summary"],
+        detailed_description=study["detailed_description"],
+        eligibility_criteria=study["eligibility_criteria"],
+        interventions=study["interventions"], conditions=study["conditions"]
+    )
+    started = perf_counter()
+    message = await create_message(build_study_bundle_prompt(request), 3500, "bundle")
+    elapsed = perf_counter() - started
+    parse_study_bundle(message.content[0].text.strip())
+    input_tokens, output_tokens = usage_of([message])
+    return {"seconds": elapsed, "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+async def run_benchmark(studies: list) -> tuple:
+    """Per-study results of both modes; failures are reported and skipped"""
+    separate, bundled = [], []
+    try:
+        for study in studies:
+            try:
+                s = await three_calls(study)
+                b = await bundled_call(study)
+            except Exception as e:
+                print(f"  study {study['id']}: ERROR {e}")
+                continue
+            separate.append(s)
+            bundled.append(b)
+            print(f"  study {study['id']:>8}: 3 calls {s['input_tokens']:>6} in / {s['output_tokens']:>5} out "
+                  f"{s['seconds']:>6.2f}s   bundle {b['input_tokens']:>6} in / {b['output_tokens']:>5} out "
+                  f"{b['seconds']:>6.2f}s")
+    finally:
+        await close_anthropic_client()
+    return separate, bundled
+
+
+def change(before: float, after: float) -> str:
+    """Relative change from the three-call path"""
+    return f"{(after - before) / before:+.0%}" if before else "n/a"
+
+
+def main():
+    """Main benchmark runner"""
+    ids = parse_flag_value("ids", "")
+    study_ids = [int(i) for i in ids.split(",") if i.strip()] or sample_study_ids(parse_flag_value("limit", 10, int))
+
+    print("=" * 60)
+    print("AI BUNDLE BENCHMARK (3 calls vs 1 combined call per study)")
+    print("=" * 60)
+
+    studies = fetch_studies_for_ai(study_ids)
+    if not studies:
+        print("No studies to benchmark")
+        return
+
+    separate, bundled = asyncio.run(run_benchmark(studies))
+    if not separate:
+        return
+
+    totals = {}
+    for mode, results in (("3 calls", separate), ("bundle", bundled)):
+        totals[mode] = {
+            "input_tokens": sum(r["input_tokens"] for r in results),
+            "output_tokens": sum(r["output_tokens"] for r in results),
+            "median_seconds": statistics.median(r["seconds"] for r in results),
+        }
+
+    print(f"\nTotals over {len(separate)} studies:")
+    for key, label in (("input_tokens", "input tokens"), ("output_tokens", "output tokens"),
+                       ("median_seconds", "median latency (s)")):
+        before, after = totals["3 calls"][key], totals["bundle"][key]
+        print(f"  {label:<20} 3 calls {before:>10.2f}   bundle {after:>10.2f}   change {change(before, after)}")
+    print("  Calls per study: 3 -> 1")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
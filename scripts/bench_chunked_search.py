@@ -0,0 +1,113 @@
+"""
+Compare single-vector and chunked (multi-vector) semantic search
+Reports vector storage for both layouts (column, table and index sizes) and
+the latency of the candidate query in each, plus how much their top results
+overlap. Run after scripts/backfill_embeddings.py and its --chunks mode.
+
+Usage:
+    python scripts/bench_chunked_search.py [--queries="heart failure;insomnia in older adults"]
+        [--runs=5] [--top=20]
+"""
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from search_module import fetch_vector_candidates, generate_embedding, get_embedding_provider
+from platform_module import get_db
+
+DEFAULT_QUERIES = (
+    "heart failure;type 2 diabetes in adolescents;insomnia in older adults;"
+    "no prior chemotherapy;healthy volunteers for vaccine study;pregnant women excluded"
+)
+
+
+def report_storage(cursor, model: str):
+    """Print vector counts and on-disk sizes of both layouts"""
+    print("\nStorage:")
+    cursor.execute("""
+        SELECT COUNT(*) AS n, COALESCE(SUM(pg_column_size(embedding)), 0) AS bytes
+        FROM studies WHERE embedding IS NOT NULL AND embedding_model = %s
+    """, (model,))
+    row = cursor.fetchone()
+    print(f"  studies.embedding: {row['n']} vectors, {row['bytes'] / 1024 / 1024:.1f} MiB")
+
+    cursor.execute("SELECT to_regclass('public.study_chunks') IS NOT NULL AS present")
+    if cursor.fetchone()["present"]:
+        cursor.execute("""
+            SELECT COUNT(*) AS n, COUNT(DISTINCT study_id) AS studies,
+                   COALESCE(SUM(pg_column_size(embedding)), 0) AS bytes,
+                   pg_size_pretty(pg_total_relation_size('public.study_chunks')) AS total
+            FROM study_chunks WHERE embedding_model = %s
+        """, (model,))
+        row = cursor.fetchone()
+        per_study = row["n"] / row["studies"] if row["studies"] else 0
+        print(f"  study_chunks: {row['n']} vectors over {row['studies']} studies ({per_study:.1f}/study), "
+              f"{row['bytes'] / 1024 / 1024:.1f} MiB vectors, {row['total']} total")
+
+    cursor.execute("""
+        SELECT tablename, indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) AS size
+        FROM pg_indexes
+        WHERE tablename IN ('studies', 'study_chunks') AND indexname LIKE '%embedding%'
+        ORDER BY tablename, indexname
+    """)
+    for idx in cursor.fetchall():
+        print(f"  {idx['tablename']}.{idx['indexname']}: {idx['size']}")
+
+
+def time_candidates(cursor, query_embedding, provider, chunked: bool, runs: int):
+    """Best-of-runs latency (ms) and the ranked study ids"""
+    best_ms = None
+    rows = []
+    for _ in range(runs):
+        started = perf_counter()
+        rows = fetch_vector_candidates(cursor, query_embedding, provider, chunked=chunked)
+        elapsed_ms = (perf_counter() - started) * 1000
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+    return best_ms, [row["id"] for row in rows]
+
+
+def main():
+    """Main benchmark runner"""
+    queries = [q.strip() for q in parse_flag_value("queries", DEFAULT_QUERIES).split(";") if q.strip()]
+    runs = parse_flag_value("runs", 5, int)
+    top = parse_flag_value("top", 20, int)
+    provider = get_embedding_provider()
+
+    print("=" * 60)
+    print(f"CHUNKED SEARCH BENCHMARK ({provider.model_name})")
+    print("=" * 60)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        report_storage(cursor, provider.model_name)
+
+        print(f"\nCandidate query latency (best of {runs}, ms) and top-{top} overlap:")
+        single_ms, chunked_ms, overlaps = [], [], []
+        for query in queries:
+            query_embedding = generate_embedding(query.lower())
+            s_ms, s_ids = time_candidates(cursor, query_embedding, provider, False, runs)
+            c_ms, c_ids = time_candidates(cursor, query_embedding, provider, True, runs)
+            shared = len(set(s_ids[:top]) & set(c_ids[:top]))
+            overlap = shared / top if top else 0.0
+            single_ms.append(s_ms)
+            chunked_ms.append(c_ms)
+            overlaps.append(overlap)
+            print(f"  {query[:32]:<32} single {s_ms:>8.2f}  chunked {c_ms:>8.2f}  "
+                  f"overlap {overlap:>4.0%} ({top - shared} new via passages)")
+
+        if queries:
+            print(f"\n  median: single {statistics.median(single_ms):.2f} ms, "
+                  f"chunked {statistics.median(chunked_ms):.2f} ms, "
+                  f"overlap {statistics.mean(overlaps):.0%}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
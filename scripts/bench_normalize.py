@@ -0,0 +1,93 @@
+"""
+Benchmark CT.gov normalization: validated pydantic path vs trusted fast path
+Reports studies/sec for producing DB-ready rows from raw CT.gov records
+
+Validated: normalize_ctgov_study() -> study_to_row() (model_dump + raw_json re-encode)
+Fast:      normalize_ctgov_study_row() (plain dicts, raw dict passed through)
+
+Usage:
+    python scripts/bench_normalize.py --fixtures=fixtures/ctgov [--rounds=5]
+    python scripts/bench_normalize.py --synthetic=2000 [--rounds=5]
+"""
+import json
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from search_module import (
+    STUDY_COPY_COLUMNS,
+    normalize_ctgov_study,
+    normalize_ctgov_study_row,
+    study_to_row,
+)
+from cli import parse_flag_value
+from fixture_server import SYNTHETIC_CONDITIONS, make_synthetic_study
+
+
+def load_fixture_studies(fixtures_dir: Path) -> list:
+    """Load raw studies from pages recorded by scripts/fixture_server.py --record"""
+    studies = []
+    for page in sorted(fixtures_dir.glob("**/page_*.json")):
+        studies.extend(json.loads(page.read_text()).get("studies", []))
+    return studies
+
+
+def time_path(name: str, convert, studies: list, rounds: int) -> float:
+    """Run a conversion over all studies several times and return the best studies/sec"""
+    best = 0.0
+    for _ in range(rounds):
+        started = perf_counter()
+        for raw_study in studies:
+            convert(raw_study)
+        elapsed = perf_counter() - started
+        best = max(best, len(studies) / elapsed if elapsed > 0 else 0.0)
+    print(f"  {name:<10} {best:>10.0f} studies/sec")
+    return best
+
+
+def main():
+    """Main benchmark runner"""
+    fixtures_dir = parse_flag_value("fixtures", None, Path)
+    synthetic = parse_flag_value("synthetic", 2000, int)
+    rounds = parse_flag_value("rounds", 5, int)
+
+    if fixtures_dir is not None:
+        studies = load_fixture_studies(fixtures_dir)
+        source = str(fixtures_dir)
+    else:
+        studies = [
+            make_synthetic_study(n, [random.Random(n).choice(SYNTHETIC_CONDITIONS)], random.Random(n))
+            for n in range(1, synthetic + 1)
+        ]
+        source = "synthetic"
+
+    if not studies:
+        print("No studies found to benchmark")
+        sys.exit(1)
+
+    locations = sum(len(s.get("protocolSection", {}).get("contactsLocationsModule", {}).get("locations", []))
+                    for s in studies)
+    print(f"Normalizing {len(studies)} studies from {source} "
+          f"({locations / len(studies):.1f} locations/study), best of {rounds} rounds\n")
+
+    # Both paths must agree on the fingerprint or unchanged-study skipping breaks
+    hash_pos = STUDY_COPY_COLUMNS.index("content_hash")
+    mismatched = sum(
+        1 for s in studies
+        if study_to_row(normalize_ctgov_study(s))[hash_pos] != normalize_ctgov_study_row(s)[hash_pos]
+    )
+    if mismatched:
+        print(f"WARNING: {mismatched} studies hash differently between paths")
+
+    validated = time_path("validated", lambda s: study_to_row(normalize_ctgov_study(s)), studies, rounds)
+    fast = time_path("fast", normalize_ctgov_study_row, studies, rounds)
+    print(f"\nSpeedup: {fast / validated:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark saved search matching for the ingest alert hook
+Builds a SavedSearchIndex over synthetic saved searches (100k by default)
+and reports the cost of matching one new study against it: index build
+time, candidates checked and per-study latency, next to checking every
+saved search for a sample of the same studies (and how often both agree).
+
+Studies are synthetic unless --from-db=N samples the N most recent
+published studies. Saved searches are always synthetic, drawn from the
+same condition and word distributions as the studies (Zipf-like).
+
+Usage:
+    python scripts/bench_saved_searches.py [--searches=100000] [--studies=500] [--brute-force=50]
+        [--from-db=N] [--seed=7]
+"""
+import random
+import statistics
+import string
+import sys
+from itertools import accumulate
+from pathlib import Path
+from time import perf_counter
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from search_module import (
+    SavedSearchIndex,
+    SavedSearchQuery,
+    SearchRequest,
+    StudyCreate,
+    saved_search_document,
+)
+
+CONDITION_COUNT = 2000  # Distinct condition tags
+VOCABULARY_SIZE = 30000  # Distinct words in study text
+STUDY_WORDS = 900  # Words per synthetic study (title + summary + description + criteria)
+ZIP_COUNT = 3000
+
+
+class Corpus:
+    """Synthetic conditions, words and ZIPs with Zipf-like popularity"""
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.conditions = [self.word(2) + " " + self.word(1) for _ in range(CONDITION_COUNT)]
+        self.words = list(dict.fromkeys(self.word(1) for _ in range(VOCABULARY_SIZE)))
+        self.zips = [f"{rng.randrange(100000):05d}" for _ in range(ZIP_COUNT)]
+        # Saved keywords are specific terms, not the most common words
+        self.keyword_pool = self.words[500:]
+        # Cumulative 1/rank weights (precomputed: choices() would rebuild them on every call)
+        self.condition_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.conditions))))
+        self.word_weights = list(accumulate(1 / (rank + 1) for rank in range(len(self.words))))
+
+    def word(self, syllables: int) -> str:
+        return "".join(self.rng.choice(string.ascii_lowercase) for _ in range(self.rng.randint(3, 6) * syllables))
+
+    def pick_conditions(self, k: int) -> list:
+        return self.rng.choices(self.conditions, cum_weights=self.condition_weights, k=k)
+
+    def pick_words(self, k: int) -> list:
+        return self.rng.choices(self.words, cum_weights=self.word_weights, k=k)
+
+    def study(self, index: int) -> StudyCreate:
+        conditions = list(dict.fromkeys(self.pick_conditions(self.rng.randint(1, 3))))
+        text = self.pick_words(STUDY_WORDS)
+        quarter = STUDY_WORDS // 4
+        min_age = self.rng.choice([None, 0, 216, 216, 780])
+        return StudyCreate(
+            title=" ".join(conditions + text[:12]),
+            brief_summary=" ".join(text[12:quarter]),
+            detailed_description=" ".join(text[quarter:3 * quarter]),
+            eligibility_criteria=" ".join(text[3 * quarter:]),
+            conditions=conditions,
+            site_zips=self.rng.sample(self.zips, self.rng.randint(0, 5)),
+            min_age_months=min_age,
+            max_age_months=self.rng.choice([None, 780, 1020]) if min_age != 780 else None,
+            eligible_sex=self.rng.choice(["all", "all", "all", "female", "male", None]),
+            source="ctgov",
+            source_id=f"NCT{index:08d}"
+        )
+
+    def search_request(self) -> SearchRequest:
+        """Mix: conditions only, keywords only, both, ZIP with eligibility"""
+        kind = self.rng.random()
+        keywords = " ".join(self.rng.choice(self.keyword_pool) for _ in range(self.rng.randint(1, 3)))
+        age = self.rng.choice([None, None, self.rng.randint(18, 80)])
+        sex = self.rng.choice([None, None, "female", "male"])
+        if kind < 0.5:
+            return SearchRequest(conditions_include=self.pick_conditions(self.rng.randint(1, 2)), age=age, sex=sex)
+        if kind < 0.8:
+            return SearchRequest(query_text=keywords, age=age, sex=sex)
+        if kind < 0.9:
+            return SearchRequest(conditions_include=self.pick_conditions(1), query_text=keywords)
+        return SearchRequest(zip=self.rng.choice(self.zips), age=age, sex=sex)
+
+
+def studies_from_db(limit: int) -> list:
+    """Most recent published studies"""
+    from search_module import get_study_by_id
+    from platform_module import get_db
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM studies WHERE is_published = TRUE ORDER BY id DESC LIMIT %s", (limit,))
+        return [get_study_by_id(row["id"]) for row in cursor.fetchall()]
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    """Main benchmark runner"""
+    search_count = parse_flag_value("searches", 100000, int)
+    study_count = parse_flag_value("studies", 500, int)
+    brute_force_count = parse_flag_value("brute-force", 50, int)
+    from_db = parse_flag_value("from-db", 0, int)
+    rng = random.Random(parse_flag_value("seed", 7, int))
+    corpus = Corpus(rng)
+
+    print("=" * 60)
+    print(f"SAVED SEARCH MATCHING BENCHMARK ({search_count} saved searches)")
+    print("=" * 60)
+
+    queries = [SavedSearchQuery(i + 1, "bench", corpus.search_request()) for i in range(search_count)]
+    started = perf_counter()
+    index = SavedSearchIndex()
+    for query in queries:
+        index.add(query)
+    print(f"Index build: {perf_counter() - started:.2f}s "
+          f"({len(index.by_condition)} condition tags, {len(index.by_keyword)} keyword anchors, "
+          f"{len(index.by_zip)} ZIPs, {len(index.unanchored)} unanchored)")
+
+    studies = studies_from_db(from_db) if from_db else [corpus.study(i) for i in range(study_count)]
+    print(f"Studies: {len(studies)} ({'database' if from_db else 'synthetic'})")
+
+    document_ms, match_ms, candidates, matches = [], [], [], []
+    documents = []
+    for study in studies:
+        started = perf_counter()
+        document = saved_search_document(study)
+        document_ms.append((perf_counter() - started) * 1000)
+        documents.append(document)
+
+        started = perf_counter()
+        candidate_queries = index.candidates(document)
+        matched = [query for query in candidate_queries if query.matches(document)]
+        match_ms.append((perf_counter() - started) * 1000)
+        candidates.append(len(candidate_queries))
+        matches.append(len(matched))
+
+    print("\nPer new study (reverse index):")
+    print(f"  document build  median {statistics.median(document_ms):7.3f} ms")
+    print(f"  match           median {statistics.median(match_ms):7.3f} ms   p95 {percentile(match_ms, 0.95):7.3f} ms"
+          f"   p99 {percentile(match_ms, 0.99):7.3f} ms")
+    print(f"  candidates      median {statistics.median(candidates):7.0f}      "
+          f"({statistics.mean(candidates) / search_count:.2%} of saved searches)")
+    print(f"  matches         mean   {statistics.mean(matches):7.1f}")
+
+    sample = documents[:brute_force_count]
+    if sample:
+        brute_ms, agree, brute_total, index_total = [], 0, 0, 0
+        for document in sample:
+            started = perf_counter()
+            expected = {query.search_id for query in queries if query.matches(document)}
+            brute_ms.append((perf_counter() - started) * 1000)
+            found = {query.search_id for query in index.match(document)}
+            agree += expected == found
+            brute_total += len(expected)
+            index_total += len(found)
+        speedup = statistics.median(brute_ms) / statistics.median(match_ms[:len(sample)])
+        print(f"\nChecking every saved search ({len(sample)} studies):")
+        print(f"  match           median {statistics.median(brute_ms):7.3f} ms   ({speedup:.0f}x slower)")
+        print(f"  same matches    {agree}/{len(sample)} studies "
+              f"({index_total}/{brute_total} matches found via the index)")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
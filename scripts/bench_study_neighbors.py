@@ -0,0 +1,110 @@
+"""
+Benchmark precomputed study neighbors (compute_neighbor_lists)
+Builds top-k lists over synthetic clustered embeddings and reports:
+- full build time with the blocked matrix product, next to one
+  vector-against-all product per study (what an on-demand query does)
+- an incremental pass after re-embedding a share of the studies, and how
+  closely the merged lists match a full rebuild (top-10 and top-k recall)
+
+Usage:
+    python scripts/bench_study_neighbors.py [--studies=20000] [--dim=384] [--k=50]
+        [--changed=0.01] [--block-elements=16000000] [--per-study=200] [--seed=7]
+"""
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+import numpy as np
+
+from cli import parse_flag_value
+from search_module import STUDY_NEIGHBORS_BLOCK_ELEMENTS, STUDY_NEIGHBORS_K, compute_neighbor_lists
+
+CLUSTERS_PER_1000 = 8  # Topic clusters per 1000 studies (studies of one condition sit close together)
+NOISE = 0.6  # Spread of studies around their cluster centre
+
+
+def unit_rows(matrix):
+    return (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall(lists: dict, expected: dict, top: int) -> float:
+    """Share of the expected top neighbors found in the same-size prefix of lists"""
+    found = total = 0
+    for study_id, (neighbor_ids, _) in expected.items():
+        want = set(neighbor_ids[:top])
+        found += len(want & set(lists[study_id][0][:top]))
+        total += len(want)
+    return found / total if total else 1.0
+
+
+def main():
+    """Main benchmark runner"""
+    count = parse_flag_value("studies", 20000, int)
+    dim = parse_flag_value("dim", 384, int)
+    k = parse_flag_value("k", STUDY_NEIGHBORS_K, int)
+    changed_share = parse_flag_value("changed", 0.01, float)
+    block_elements = parse_flag_value("block-elements", STUDY_NEIGHBORS_BLOCK_ELEMENTS, int)
+    per_study_sample = parse_flag_value("per-study", 200, int)
+    rng = np.random.default_rng(parse_flag_value("seed", 7, int))
+
+    print("=" * 60)
+    print(f"STUDY NEIGHBORS BENCHMARK ({count} studies, dim {dim}, k={k})")
+    print("=" * 60)
+
+    centres = rng.standard_normal((max(1, count * CLUSTERS_PER_1000 // 1000), dim))
+    cluster_of = rng.integers(0, len(centres), count)
+    matrix = unit_rows(centres[cluster_of] + NOISE * rng.standard_normal((count, dim)))
+    ids = np.arange(1, count + 1, dtype=np.int64)
+    all_rows = np.arange(count)
+
+    started = perf_counter()
+    full = compute_neighbor_lists(ids, matrix, all_rows, k=k, block_elements=block_elements)
+    full_seconds = perf_counter() - started
+    rows_per_block = max(1, block_elements // count)
+    print(f"Full build (blocked, {rows_per_block} rows x {count} per product): "
+          f"{full_seconds:.2f}s ({count / full_seconds:,.0f} studies/s)")
+
+    sample = rng.choice(count, min(per_study_sample, count), replace=False)
+    started = perf_counter()
+    for row in sample:
+        similarities = matrix @ matrix[row]
+        similarities[row] = -np.inf
+        top = np.argpartition(similarities, count - k)[count - k:]
+        top[np.argsort(-similarities[top])]
+    per_study = (perf_counter() - started) / len(sample)
+    print(f"One study at a time:  {per_study * 1000:.2f} ms/study -> {per_study * count:.2f}s estimated for all "
+          f"({per_study * count / full_seconds:.1f}x the blocked build)")
+
+    # Re-embed a share of the studies (some move to another cluster) and refresh incrementally
+    changed = rng.choice(count, max(1, int(count * changed_share)), replace=False)
+    moved = cluster_of.copy()
+    moved[changed[::2]] = rng.integers(0, len(centres), len(changed[::2]))
+    updated = matrix.copy()
+    updated[changed] = unit_rows(centres[moved[changed]] + NOISE * rng.standard_normal((len(changed), dim)))
+
+    started = perf_counter()
+    merged = compute_neighbor_lists(ids, updated, changed, full, k=k, block_elements=block_elements)
+    incremental_seconds = perf_counter() - started
+    current = dict(full)
+    current.update(merged)
+
+    started = perf_counter()
+    rebuilt = compute_neighbor_lists(ids, updated, all_rows, k=k, block_elements=block_elements)
+    rebuild_seconds = perf_counter() - started
+    print(f"\nIncremental pass ({len(changed)} re-embedded, half moved cluster): {incremental_seconds:.2f}s, "
+          f"{len(merged) - len(changed)} other lists merged ({rebuild_seconds / incremental_seconds:.0f}x faster "
+          f"than a {rebuild_seconds:.2f}s rebuild)")
+    print(f"  recall vs rebuild   top-10 {recall(current, rebuilt, 10):.4f}   top-{k} {recall(current, rebuilt, k):.4f}")
+
+    stored = sum(len(neighbor_ids) for neighbor_ids, _ in full.values())
+    print(f"\nStored: {stored:,} neighbors, ~{stored * 12 / count:.0f} bytes of arrays per study "
+          f"(bigint id + real score)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
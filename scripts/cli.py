@@ -0,0 +1,14 @@
+"""
+Command-line helpers shared by the scripts in this directory
+Scripts run as `python scripts/<name>.py`, so this module is importable as `cli`.
+"""
+import sys
+
+
+def parse_flag_value(name: str, default, cast=str):
+    """Read a --name=value flag from sys.argv"""
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return cast(arg[len(prefix):])
+    return default
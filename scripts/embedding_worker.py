@@ -0,0 +1,37 @@
+"""
+Standalone embedding worker
+Runs the same queue worker the API starts with EMBEDDING_WORKER_ENABLED=true,
+for deployments that keep background work out of the web process. New and
+edited studies are embedded within seconds of landing in embedding_queue.
+
+Usage:
+    python scripts/embedding_worker.py [--concurrency=2] [--batch-size=100]
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from search_module import EMBEDDING_WORKER_BATCH_SIZE, EMBEDDING_WORKER_CONCURRENCY, EmbeddingWorker
+
+
+def main():
+    """Run the embedding worker until interrupted"""
+    worker = EmbeddingWorker(
+        batch_size=parse_flag_value("batch-size", EMBEDDING_WORKER_BATCH_SIZE, int),
+        concurrency=parse_flag_value("concurrency", EMBEDDING_WORKER_CONCURRENCY, int)
+    )
+    print("Embedding worker listening on embedding_queue (Ctrl+C to stop)")
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+    print(f"Embedded {worker.embedded} studies")
+
+
+if __name__ == "__main__":
+    main()
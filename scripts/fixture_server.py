@@ -0,0 +1,509 @@
+"""
+Local fixture server standing in for external APIs during offline benchmarks
+Replays recorded ClinicalTrials.gov API v2 pages (or synthetic ones) over HTTP,
+serves deterministic fake OpenAI embeddings at POST /v1/embeddings and a fake
+Claude at POST /v1/messages (canned titles, summaries and quizzes)
+
+Usage:
+    # Record real CT.gov pages once (needs network)
+    python scripts/fixture_server.py --record=fixtures/ctgov --max-pages=3 Diabetes Hypertension
+
+    # Replay recorded pages
+    python scripts/fixture_server.py --fixtures=fixtures/ctgov [--port=8765] [--latency-ms=150]
+
+    # Serve generated studies (no recording needed)
+    python scripts/fixture_server.py --synthetic=300 [--overlap=0.3]
+
+    # Embeddings only, with simulated per-minute request/token limits (429s past them)
+    python scripts/fixture_server.py --embeddings-only [--embedding-rpm=3000] [--embedding-tpm=1000000]
+
+    # Fake Claude only, generating at a fixed speed after a first-token delay
+    python scripts/fixture_server.py --llm-only [--llm-tokens-per-second=80] [--llm-first-token-ms=400] [--llm-rpm=500]
+
+Point ingestion at it with:
+    CTGOV_API_BASE=http://localhost:8765/api/v2 python scripts/ingest_ctgov.py --async
+
+Point embedding backfills at it with:
+    OPENAI_BASE_URL=http://localhost:8765/v1 OPENAI_API_KEY=fixture python scripts/backfill_embeddings.py
+
+Point AI generation (API or scripts/precompute_ai.py) at it with:
+    ANTHROPIC_BASE_URL=http://localhost:8765 ANTHROPIC_API_KEY=fixture
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import struct
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import monotonic, sleep
+from urllib.parse import parse_qs, urlparse
+
+from cli import parse_flag_value
+
+DEFAULT_PORT = 8765
+CTGOV_PUBLIC_API = "https://clinicaltrials.gov/api/v2"
+FAKE_EMBEDDING_DIMENSION = 1536
+# OpenAI embedding limits mirrored by the fake endpoint (400 past these)
+FAKE_EMBEDDING_MAX_INPUT_TOKENS = 8191
+FAKE_EMBEDDING_MAX_REQUEST_TOKENS = 300_000
+
+SYNTHETIC_CONDITIONS = [
+    "Diabetes",
+    "Asthma",
+    "Depression",
+    "Heart Disease",
+    "Arthritis",
+    "Cancer",
+    "Hypertension",
+    "Anxiety"
+]
+
+
+def condition_slug(condition: str) -> str:
+    """Directory-safe key for a condition search term"""
+    return re.sub(r"[^a-z0-9]+", "-", (condition or "all").lower()).strip("-") or "all"
+
+
+# ======================================================================
+# SYNTHETIC STUDIES
+# ======================================================================
+
+def make_synthetic_study(nct_number: int, conditions: list, rng: random.Random) -> dict:
+    """Build a CT.gov-shaped study record with realistic field sizes"""
+    nct_id = f"NCT{nct_number:08d}"
+    words = ["randomized", "placebo", "controlled", "adults", "therapy", "outcomes",
+             "glucose", "pressure", "symptoms", "quality", "of", "life", "dose", "weekly"]
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    locations = []
+    for site in range(rng.randint(1, 40)):
+        locations.append({
+            "facility": f"Research Site {site + 1}",
+            "city": rng.choice(["Boston", "Chicago", "Houston", "Seattle", "Denver", "Miami"]),
+            "state": rng.choice(["MA", "IL", "TX", "WA", "CO", "FL"]),
+            "country": "United States",
+            "geoPoint": {"lat": rng.uniform(25, 48), "lon": rng.uniform(-122, -70)}
+        })
+
+    return {
+        "protocolSection": {
+            "identificationModule": {
+                "nctId": nct_id,
+                "briefTitle": f"Study of {conditions[0]} {nct_number}",
+                "officialTitle": f"A {sentence(6)[:-1]} Study in {', '.join(conditions)}"
+            },
+            "statusModule": {
+                "overallStatus": "RECRUITING",
+                "lastUpdatePostDateStruct": {"date": f"2026-0{rng.randint(1, 9)}-{rng.randint(10, 28)}"}
+            },
+            "descriptionModule": {
+                "briefSummary": " ".join(sentence(12) for _ in range(4)),
+                "detailedDescription": " ".join(sentence(15) for _ in range(12))
+            },
+            "eligibilityModule": {
+                "eligibilityCriteria": "Inclusion Criteria:\n\n* " + "\n* ".join(sentence(8) for _ in range(6)),
+                "sex": rng.choice(["ALL", "FEMALE", "MALE"]),
+                "minimumAge": f"{rng.choice([18, 21, 40])} Years",
+                "maximumAge": f"{rng.choice([65, 75, 85])} Years",
+                "healthyVolunteers": rng.random() < 0.2
+            },
+            "designModule": {"studyType": rng.choice(["INTERVENTIONAL", "OBSERVATIONAL"])},
+            "conditionsModule": {"conditions": conditions},
+            "armsInterventionsModule": {
+                "interventions": [
+                    {"type": "DRUG", "name": f"Drug {chr(65 + i)}", "description": sentence(10)}
+                    for i in range(rng.randint(1, 3))
+                ]
+            },
+            "contactsLocationsModule": {
+                "centralContacts": [
+                    {"name": "Study Coordinator", "role": "CONTACT",
+                     "phone": "555-0100", "email": f"{nct_id.lower()}@example.org"}
+                ],
+                "locations": locations
+            }
+        }
+    }
+
+
+def build_synthetic_catalogue(per_condition: int, overlap: float = 0.3, seed: int = 7) -> dict:
+    """
+    Generate studies per condition where a share of NCT IDs is listed under two conditions
+
+    Returns:
+        Mapping of condition slug to a list of raw study records
+    """
+    rng = random.Random(seed)
+    catalogue = {condition_slug(c): [] for c in SYNTHETIC_CONDITIONS}
+
+    # Each shared study appears under two conditions, like a diabetes + hypertension trial
+    shared_total = int(per_condition * overlap * len(SYNTHETIC_CONDITIONS) / 2)
+    for number in range(1, shared_total + 1):
+        pair = rng.sample(SYNTHETIC_CONDITIONS, 2)
+        study = make_synthetic_study(number, pair, random.Random(number))
+        for condition in pair:
+            if len(catalogue[condition_slug(condition)]) < per_condition:
+                catalogue[condition_slug(condition)].append(study)
+
+    next_number = shared_total + 1
+    for condition in SYNTHETIC_CONDITIONS:
+        studies = catalogue[condition_slug(condition)]
+        while len(studies) < per_condition:
+            studies.append(make_synthetic_study(next_number, [condition], random.Random(next_number)))
+            next_number += 1
+
+    return catalogue
+
+
+# ======================================================================
+# RECORDING
+# ======================================================================
+
+def record_ctgov_fixtures(target_dir: Path, conditions: list, max_pages: int):
+    """Download real CT.gov pages and store them with replayable page tokens"""
+    import requests
+
+    for condition in conditions:
+        condition_dir = target_dir / condition_slug(condition)
+        condition_dir.mkdir(parents=True, exist_ok=True)
+        page_token = None
+
+        for page in range(1, max_pages + 1):
+            params = {"format": "json", "pageSize": 100, "query.cond": condition,
+                      "filter.overallStatus": "RECRUITING"}
+            if page_token:
+                params["pageToken"] = page_token
+            else:
+                params["countTotal"] = "true"
+            response = requests.get(f"{CTGOV_PUBLIC_API}/studies", params=params, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+
+            page_token = data.get("nextPageToken")
+            # Replace the opaque CT.gov token with the next fixture page number
+            data["nextPageToken"] = str(page + 1) if page_token and page < max_pages else None
+            (condition_dir / f"page_{page:03d}.json").write_text(json.dumps(data))
+            print(f"Recorded {condition} page {page} ({len(data.get('studies', []))} studies)")
+
+            if not page_token:
+                break
+
+
+# ======================================================================
+# FAKE EMBEDDINGS
+# ======================================================================
+
+def fake_embedding(text: str, dimensions: int = FAKE_EMBEDDING_DIMENSION) -> list:
+    """Deterministic unit vector for a text (same text, same vector)"""
+    # shake_256 stretches the text into 2 bytes per dimension; far cheaper than a seeded RNG
+    values = struct.unpack(f"<{dimensions}h", hashlib.shake_256(text.encode("utf-8")).digest(dimensions * 2))
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class UsageBucket:
+    """Per-minute usage limit that refills continuously, like provider rate limits"""
+    def __init__(self, limit_per_minute: int):
+        self.limit_per_minute = limit_per_minute
+        self.available = float(limit_per_minute)
+        self.refilled_at = monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self, amount: int = 1) -> bool:
+        if not self.limit_per_minute:
+            return True
+        with self.lock:
+            now = monotonic()
+            self.available = min(float(self.limit_per_minute),
+                                 self.available + (now - self.refilled_at) * self.limit_per_minute / 60.0)
+            self.refilled_at = now
+            if amount > self.available:
+                return False
+            self.available -= amount
+            return True
+
+
+# ======================================================================
+# FAKE CLAUDE
+# ======================================================================
+
+def fake_completion(prompt: str) -> str:
+    """Canned answer shaped like what each AI prompt asks for"""
+    title = re.search(r"(?:Original Title|Title): (.*)", prompt)
+    subject = (title.group(1) if title else "this study").strip()[:80]
+    quiz = [
+        {"question": f"Have you been diagnosed with the condition studied in {subject}?",
+         "explanation": "The study enrolls people with this condition"},
+        {"question": "Are you 18 years or older?", "explanation": "Only adults can take part"},
+        {"question": "Are you currently pregnant?", "explanation": "Pregnant people are excluded"},
+        {"question": "Are you taking part in another study?", "explanation": "Concurrent studies are excluded"},
+        {"question": "Can you attend regular clinic visits?", "explanation": "Visits are required"}
+    ]
+    sentence = f"This study looks at {subject.lower()}. "
+    summary = (sentence + "Researchers want to learn whether the treatment helps and is safe. " * 3).strip()
+    if "JSON object" in prompt:
+        has_quiz = "Eligibility Criteria: Not provided" not in prompt
+        return json.dumps({"plain_title": f"Plain-language study: {subject.lower()}", "summary": summary,
+                           "quiz": quiz if has_quiz else []}, indent=2)
+    if "JSON array" in prompt:
+        return json.dumps(quiz, indent=2)
+    if "rewrite the title" in prompt:
+        return f"Plain-language study: {subject.lower()}"
+    return summary
+
+
+def fake_usage(prompt: str, text: str) -> dict:
+    return {"input_tokens": max(1, len(prompt) // 4), "output_tokens": max(1, len(text) // 4)}
+
+
+# ======================================================================
+# SERVER
+# ======================================================================
+
+class FixtureStore:
+    """Serves pages from recorded files or an in-memory synthetic catalogue"""
+    def __init__(self, fixtures_dir: Path = None, catalogue: dict = None,
+                 embedding_rpm: int = 0, embedding_tpm: int = 0,
+                 llm_rpm: int = 0, llm_tokens_per_second: float = 80.0, llm_first_token_seconds: float = 0.4):
+        self.fixtures_dir = fixtures_dir
+        self.catalogue = catalogue or {}
+        self.embedding_requests = UsageBucket(embedding_rpm)
+        self.embedding_tokens = UsageBucket(embedding_tpm)
+        self.llm_requests = UsageBucket(llm_rpm)
+        self.llm_tokens_per_second = llm_tokens_per_second
+        self.llm_first_token_seconds = llm_first_token_seconds
+
+    def message(self, payload: dict) -> tuple:
+        """
+        Anthropic-shaped /v1/messages response; returns (status, body)
+
+        body is a dict, or for stream=true a generator of (event, data) SSE
+        pairs. Either way the answer takes the first-token delay plus output
+        tokens / tokens-per-second, so measurements see realistic generation
+        time (and time to first token when streaming).
+        """
+        if not self.llm_requests.allow():
+            return 429, {"type": "error", "error": {"type": "rate_limit_error",
+                                                    "message": "Rate limit reached (fixture)"}}
+        prompt = "".join(
+            m["content"] if isinstance(m["content"], str) else "".join(b.get("text", "") for b in m["content"])
+            for m in payload.get("messages", [])
+        )
+        text = fake_completion(prompt)
+        usage = fake_usage(prompt, text)
+        message = {
+            "id": "msg_fixture_" + hashlib.md5(prompt.encode("utf-8")).hexdigest()[:16],
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", "fixture"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage
+        }
+        if payload.get("stream"):
+            return 200, self.message_events(message)
+        sleep(self.llm_first_token_seconds + usage["output_tokens"] / self.llm_tokens_per_second)
+        return 200, message
+
+    def message_events(self, message: dict):
+        """Anthropic streaming events for a finished message, paced like generation"""
+        text = message["content"][0]["text"]
+        yield "message_start", {"type": "message_start", "message": dict(
+            message, content=[], stop_reason=None, usage=dict(message["usage"], output_tokens=1)
+        )}
+        yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}}
+        sleep(self.llm_first_token_seconds)
+        # ~4 characters per token, sent a few tokens at a time
+        for start in range(0, len(text), 16):
+            piece = text[start:start + 16]
+            sleep(len(piece) / 4 / self.llm_tokens_per_second)
+            yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": piece}}
+        yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+        yield "message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": message["usage"]["output_tokens"]}}
+        yield "message_stop", {"type": "message_stop"}
+
+    def embeddings(self, payload: dict) -> tuple:
+        """OpenAI-shaped /v1/embeddings response; returns (status, body)"""
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = int(payload.get("dimensions") or FAKE_EMBEDDING_DIMENSION)
+        input_tokens = [max(1, len(text) // 4) for text in inputs]
+        tokens = sum(input_tokens)
+
+        if any(t > FAKE_EMBEDDING_MAX_INPUT_TOKENS for t in input_tokens) or tokens > FAKE_EMBEDDING_MAX_REQUEST_TOKENS:
+            return 400, {"error": {"message": "Input exceeds the maximum token limit (fixture)",
+                                   "type": "invalid_request_error", "code": None}}
+        if not self.embedding_requests.allow() or not self.embedding_tokens.allow(tokens):
+            return 429, {"error": {"message": "Rate limit reached (fixture)", "type": "requests",
+                                   "code": "rate_limit_exceeded"}}
+
+        def encode(vector):
+            # The OpenAI SDK asks for base64 (packed float32) unless a caller forces "float"
+            if payload.get("encoding_format") == "base64":
+                return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            return vector
+
+        return 200, {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": encode(fake_embedding(text, dimensions))}
+                for i, text in enumerate(inputs)
+            ],
+            "model": payload.get("model", "fixture"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    def ctgov_page(self, query: dict) -> dict:
+        condition = query.get("query.cond", [""])[0]
+        status = query.get("filter.overallStatus", [None])[0]
+        page = int(query.get("pageToken", ["1"])[0])
+        page_size = int(query.get("pageSize", ["100"])[0])
+
+        if self.fixtures_dir is not None:
+            path = self.fixtures_dir / condition_slug(condition) / f"page_{page:03d}.json"
+            if not path.exists():
+                return {"studies": [], "nextPageToken": None}
+            data = json.loads(path.read_text())
+        else:
+            studies = self.catalogue.get(condition_slug(condition), [])
+            start = (page - 1) * page_size
+            data = {
+                "studies": studies[start:start + page_size],
+                "nextPageToken": str(page + 1) if start + page_size < len(studies) else None
+            }
+
+        if status:
+            allowed = {s.strip().upper() for s in status.split(",")}
+            data["studies"] = [
+                s for s in data.get("studies", [])
+                if s.get("protocolSection", {}).get("statusModule", {}).get("overallStatus", "").upper() in allowed
+            ]
+
+        # Delta sync filter: AREA[LastUpdatePostDate]RANGE[YYYY-MM-DD,MAX]
+        advanced = query.get("filter.advanced", [""])[0]
+        since = re.search(r"AREA\[LastUpdatePostDate\]RANGE\[(\d{4}-\d{2}-\d{2}),MAX\]", advanced)
+        if since:
+            data["studies"] = [
+                s for s in data.get("studies", [])
+                if s.get("protocolSection", {}).get("statusModule", {})
+                    .get("lastUpdatePostDateStruct", {}).get("date", "") >= since.group(1)
+            ]
+
+        # Synthetic pages know the catalogue size; recorded pages keep whatever CT.gov returned
+        if query.get("countTotal", [""])[0] == "true" and self.fixtures_dir is None:
+            data["totalCount"] = len(self.catalogue.get(condition_slug(condition), []))
+        return data
+
+
+def make_handler(store: FixtureStore, latency_seconds: float):
+    """Create a request handler bound to a fixture store"""
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+        def send_json(self, status: int, payload):
+            if not isinstance(payload, dict):
+                self.send_events(status, payload)
+                return
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_events(self, status: int, events):
+            """Write (event, data) pairs as server-sent events, flushing each one"""
+            self.send_response(status)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            for event, data in events:
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if latency_seconds:
+                sleep(latency_seconds)
+            if parsed.path.rstrip("/") == "/api/v2/studies":
+                self.send_json(200, store.ctgov_page(parse_qs(parsed.query)))
+            else:
+                self.send_json(404, {"error": f"No fixture route for {parsed.path}"})
+
+        def do_POST(self):
+            parsed = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if latency_seconds:
+                sleep(latency_seconds)
+            if parsed.path.rstrip("/") == "/v1/embeddings":
+                self.send_json(*store.embeddings(payload))
+            elif parsed.path.rstrip("/") == "/v1/messages":
+                self.send_json(*store.message(payload))
+            else:
+                self.send_json(404, {"error": f"No fixture route for {parsed.path}"})
+
+    return FixtureHandler
+
+
+def main():
+    """Record fixtures or start the fixture server"""
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    record_dir = parse_flag_value("record", None, Path)
+
+    if record_dir is not None:
+        record_ctgov_fixtures(record_dir, positional or SYNTHETIC_CONDITIONS,
+                              parse_flag_value("max-pages", 3, int))
+        return
+
+    fixtures_dir = parse_flag_value("fixtures", None, Path)
+    synthetic = parse_flag_value("synthetic", 0, int)
+    port = parse_flag_value("port", DEFAULT_PORT, int)
+    latency_ms = parse_flag_value("latency-ms", 0, int)
+    embedding_rpm = parse_flag_value("embedding-rpm", 0, int)
+    embedding_tpm = parse_flag_value("embedding-tpm", 0, int)
+    llm_rpm = parse_flag_value("llm-rpm", 0, int)
+    llm_tokens_per_second = parse_flag_value("llm-tokens-per-second", 80.0, float)
+    llm_first_token_ms = parse_flag_value("llm-first-token-ms", 400, int)
+    apis_only = "--embeddings-only" in sys.argv or "--llm-only" in sys.argv
+
+    if fixtures_dir is None and not synthetic and not apis_only:
+        print("Pass --fixtures=DIR to replay recorded pages, --synthetic=N to generate studies, "
+              "--embeddings-only or --llm-only")
+        sys.exit(1)
+
+    catalogue = None
+    if fixtures_dir is None and synthetic:
+        catalogue = build_synthetic_catalogue(synthetic, parse_flag_value("overlap", 0.3, float))
+        print(f"Generated {synthetic} synthetic studies for each of {len(catalogue)} conditions")
+
+    store = FixtureStore(fixtures_dir, catalogue, embedding_rpm, embedding_tpm,
+                         llm_rpm, llm_tokens_per_second, llm_first_token_ms / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(store, latency_ms / 1000))
+    print(f"Fixture server listening on http://127.0.0.1:{port} (CT.gov base: /api/v2, OpenAI base: /v1, "
+          f"Anthropic base: /)")
+    if embedding_rpm or embedding_tpm:
+        print(f"Embeddings limited to {embedding_rpm or 'unlimited'} requests/minute, "
+              f"{embedding_tpm or 'unlimited'} tokens/minute")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Offline import of the ClinicalTrials.gov full-dataset archive
+Streams per-study JSON files straight out of the downloaded zip (nothing is
+extracted to disk), normalizes them across a process pool with the trusted
+normalize_ctgov_study_row() fast path and writes them in COPY batches through
+bulk_upsert_study_rows()
+
+Download the archive from https://clinicaltrials.gov/data-api/about-api/csv-json
+(AllAPIJSON.zip: one <NCT ID>.json file per study)
+
+Usage:
+    python scripts/import_ctgov_archive.py path/to/AllAPIJSON.zip
+        [--status=RECRUITING,NOT_YET_RECRUITING] [--conditions=Diabetes,Asthma]
+        [--workers=8] [--batch-size=2000] [--limit=N] [--dry-run]
+"""
+import json
+import os
+import sys
+import zipfile
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from time import monotonic
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from search_module import bulk_upsert_study_rows, normalize_ctgov_study_row
+
+MEMBERS_PER_TASK = 250  # Zip members handed to a worker at a time
+DEFAULT_BATCH_SIZE = 2000  # Rows per COPY transaction
+
+# Per-process state set by init_worker (each worker opens its own zip handle)
+_worker_archive = None
+_worker_filters = None
+
+
+def matches_filters(raw_study: dict, statuses: set, conditions: list) -> bool:
+    """Cheap pre-normalization filter on overall status and condition terms"""
+    protocol = raw_study.get("protocolSection", {})
+
+    if statuses:
+        status = protocol.get("statusModule", {}).get("overallStatus", "")
+        if status.upper() not in statuses:
+            return False
+
+    if conditions:
+        study_conditions = [c.lower() for c in protocol.get("conditionsModule", {}).get("conditions", [])]
+        if not any(term in c for term in conditions for c in study_conditions):
+            return False
+
+    return True
+
+
+def init_worker(archive_path: str, statuses: set, conditions: list):
+    """Open the archive once per worker process"""
+    global _worker_archive, _worker_filters
+    _worker_archive = zipfile.ZipFile(archive_path)
+    _worker_filters = (statuses, conditions)
+
+
+def normalize_members(member_names: list) -> tuple:
+    """
+    Read, filter and normalize a chunk of archive members in a worker
+
+    Returns:
+        (rows, filtered_out, failed) where rows are STUDY_COPY_COLUMNS tuples
+    """
+    statuses, conditions = _worker_filters
+    rows = []
+    filtered_out = 0
+    failed = 0
+
+    for name in member_names:
+        try:
+            raw_study = json.loads(_worker_archive.read(name))
+            if not matches_filters(raw_study, statuses, conditions):
+                filtered_out += 1
+                continue
+            rows.append(normalize_ctgov_study_row(raw_study))
+        except Exception as e:
+            failed += 1
+            print(f"  Error normalizing {name}: {e}")
+
+    return rows, filtered_out, failed
+
+
+def iter_member_chunks(archive_path: str, limit: int = None):
+    """Yield lists of study JSON member names from the archive"""
+    with zipfile.ZipFile(archive_path) as archive:
+        chunk = []
+        count = 0
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.endswith(".json"):
+                continue
+            chunk.append(info.filename)
+            count += 1
+            if len(chunk) >= MEMBERS_PER_TASK:
+                yield chunk
+                chunk = []
+            if limit and count >= limit:
+                break
+        if chunk:
+            yield chunk
+
+
+def import_archive(
+    archive_path: str,
+    statuses: set = None,
+    conditions: list = None,
+    workers: int = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    limit: int = None,
+    dry_run: bool = False
+):
+    """
+    Import a CT.gov JSON archive
+
+    Args:
+        archive_path: Path to the downloaded zip
+        statuses: Overall statuses to keep (uppercase), or None for all
+        conditions: Lowercase condition terms; a study is kept if any of its conditions contains one
+        workers: Normalization processes (defaults to CPU count)
+        batch_size: Rows per bulk write
+        limit: Stop after this many archive members (for sampling)
+        dry_run: If True, normalize only and skip database writes
+    """
+    workers = workers or os.cpu_count() or 1
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "filtered": 0, "failed": 0, "normalized": 0}
+    pending_rows = []
+    started = monotonic()
+
+    def flush():
+        if not pending_rows:
+            return
+        if not dry_run:
+            result = bulk_upsert_study_rows(pending_rows)
+            for key, value in result.items():
+                totals[key] += value
+        pending_rows.clear()
+        elapsed = monotonic() - started
+        rate = totals["normalized"] / elapsed if elapsed > 0 else 0.0
+        print(f"Progress: {totals['normalized']} normalized, {totals['inserted']} inserted, "
+              f"{totals['updated']} updated, {totals['filtered']} filtered ({rate:.0f} studies/sec)")
+
+    with Pool(workers, initializer=init_worker, initargs=(archive_path, statuses or set(), conditions or [])) as pool:
+        # Bound in-flight chunks so a slow database applies backpressure to the readers
+        in_flight = deque()
+        max_in_flight = workers * 2
+
+        for chunk in iter_member_chunks(archive_path, limit):
+            in_flight.append(pool.apply_async(normalize_members, (chunk,)))
+            while len(in_flight) >= max_in_flight or (in_flight and in_flight[0].ready()):
+                rows, filtered_out, failed = in_flight.popleft().get()
+                pending_rows.extend(rows)
+                totals["normalized"] += len(rows)
+                totals["filtered"] += filtered_out
+                totals["failed"] += failed
+                if len(pending_rows) >= batch_size:
+                    flush()
+
+        while in_flight:
+            rows, filtered_out, failed = in_flight.popleft().get()
+            pending_rows.extend(rows)
+            totals["normalized"] += len(rows)
+            totals["filtered"] += filtered_out
+            totals["failed"] += failed
+            if len(pending_rows) >= batch_size:
+                flush()
+
+    flush()
+    return totals, monotonic() - started
+
+
+def main():
+    """Main archive import runner"""
+    print("=" * 60)
+    print("ClinicalTrials.gov Archive Import")
+    print("=" * 60)
+
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not positional:
+        print("Usage: python scripts/import_ctgov_archive.py path/to/AllAPIJSON.zip [options]")
+        sys.exit(1)
+
+    archive_path = positional[0]
+    statuses = {s.strip().upper() for s in parse_flag_value("status", "").split(",") if s.strip()}
+    conditions = [c.strip().lower() for c in parse_flag_value("conditions", "").split(",") if c.strip()]
+    workers = parse_flag_value("workers", None, int)
+    batch_size = parse_flag_value("batch-size", DEFAULT_BATCH_SIZE, int)
+    limit = parse_flag_value("limit", None, int)
+    dry_run = "--dry-run" in sys.argv
+
+    print(f"\nArchive: {archive_path}")
+    print(f"Status filter: {', '.join(sorted(statuses)) or 'all'}")
+    print(f"Condition filter: {', '.join(conditions) or 'all'}")
+    if dry_run:
+        print("[DRY RUN] Normalizing only, no database writes")
+    print()
+
+    totals, elapsed = import_archive(
+        archive_path,
+        statuses=statuses,
+        conditions=conditions,
+        workers=workers,
+        batch_size=batch_size,
+        limit=limit,
+        dry_run=dry_run
+    )
+
+    rate = totals["normalized"] / elapsed if elapsed > 0 else 0.0
+    print("\n" + "=" * 60)
+    print(f"Normalized: {totals['normalized']} ({totals['filtered']} filtered, {totals['failed']} failed)")
+    print(f"Inserted: {totals['inserted']}, Updated: {totals['updated']}, Unchanged: {totals['unchanged']}, "
+          f"Duplicates: {totals['duplicates']}")
+    print(f"Elapsed: {elapsed:.1f}s ({rate:.0f} studies/sec)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,60 @@
 """
 Ingestion script for ClinicalTrials.gov studies
 Fetches studies by condition and stores them in the database
+
+Usage:
+    python scripts/ingest_ctgov.py [--max-pages=3] [conditions...]
+    python scripts/ingest_ctgov.py --async [--workers=4] [--rps=5] [--dry-run] [conditions...]
+    python scripts/ingest_ctgov.py --incremental [--async] [--no-alerts] [conditions...]
+    python scripts/ingest_ctgov.py --status [--limit=20]
+
+--async ingests all conditions concurrently with a bounded worker pool, a
+shared CT.gov rate limiter and a per-run seen-set keyed on NCT ID, so studies
+that match several conditions are normalized and upserted once.
+
+--incremental requests only studies whose lastUpdatePostDate is on or after
+the condition's stored watermark (ctgov_sync_state). The status filter is
+dropped so studies that left RECRUITING come back and update their existing
+rows; non-recruiting studies we never stored are skipped. The first
+incremental run for a condition does a normal fetch to seed the watermark.
+
+Every condition runs as a job in ingest_jobs. Each fully processed page is
+checkpointed (nextPageToken plus counters), so a run that dies on page 7
+resumes at page 7 the next time the same condition is ingested. Failed CT.gov
+requests are retried with backoff before the job is marked failed. --status
+prints recent jobs with throughput and ETA (also served at GET /admin/ingest-jobs).
+
+Inserted and updated studies are matched against users' saved searches
+(SavedSearchAlerts) and hits are written to search_notifications once per
+page. --no-alerts skips this.
 """
+import asyncio
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
+from time import monotonic
 
 # Add backend directory to path for imports
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-from search_module import fetch_all_pages_from_ctgov, normalize_ctgov_study, insert_study
+from psycopg.types.json import Jsonb
+
+from cli import parse_flag_value
+from search_module import (
+    SavedSearchAlerts,
+    checkpoint_ingest_job,
+    fetch_studies_from_ctgov,
+    fetch_studies_from_ctgov_async,
+    finish_ingest_job,
+    get_ctgov_last_update_date,
+    list_ingest_jobs,
+    normalize_ctgov_study,
+    insert_study,
+    save_raw_document,
+    start_ingest_job,
+)
 from platform_module import get_db
 
 
@@ -25,122 +69,585 @@ DEFAULT_CONDITIONS = [
     "Anxiety"
 ]
 
+# Async mode defaults. CT.gov asks clients to stay around ~50 requests/minute.
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 0.8
+
+# Incremental runs fetch every changed study, not just the first few pages
+INCREMENTAL_MAX_PAGES = 100
 
-def upsert_ctgov_study(study_create):
+PAGE_SIZE = 100
+
+# CT.gov page requests are retried with exponential backoff (1s, 2s, 4s) before a job fails
+FETCH_RETRIES = 3
+
+
+def get_sync_watermark(condition: str):
+    """Return the stored lastUpdatePostDate watermark for a condition (or None)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT last_update_post_date FROM ctgov_sync_state WHERE condition = %s",
+            (condition.lower(),)
+        )
+        row = cursor.fetchone()
+        return row["last_update_post_date"].isoformat() if row else None
+
+
+def save_sync_watermark(condition: str, last_update_post_date: str):
+    """Store the watermark for a condition (never moves backwards)"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO ctgov_sync_state (condition, last_update_post_date, last_synced_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (condition) DO UPDATE
+            SET last_update_post_date = GREATEST(ctgov_sync_state.last_update_post_date, EXCLUDED.last_update_post_date),
+                last_synced_at = NOW()
+        """, (condition.lower(), last_update_post_date))
+
+
+def later_date(current, raw_study: dict):
+    """Return the later of a YYYY-MM-DD watermark and a study's lastUpdatePostDate"""
+    candidate = get_ctgov_last_update_date(raw_study)
+    if not candidate:
+        return current
+    return max(current, candidate) if current else candidate
+
+
+def upsert_ctgov_study(study_create, update_only: bool = False):
     """
     Insert or update a CT.gov study in the database
-    Uses source_id (NCT ID) to check for existing study
+    Uses source_id (NCT ID) to check for existing study and content_hash to
+    skip studies whose normalized fields did not change
+
+    Args:
+        study_create: Normalized study
+        update_only: If True, never insert; studies not already stored are skipped
     """
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT id FROM studies WHERE source = 'ctgov' AND source_id = %s",
+            "SELECT id, content_hash FROM studies WHERE source = 'ctgov' AND source_id = %s",
             (study_create.source_id,)
         )
         existing = cursor.fetchone()
 
+        if existing and existing["content_hash"] == study_create.content_hash:
+            # Nothing we use changed: leave the row, updated_at and derived caches alone
+            return "unchanged"
+
         if existing:
             # Update existing study
             study_id = existing["id"]
             now = datetime.utcnow().isoformat()
 
-            import json
-            from psycopg2.extras import Json
-
-            # Prepare data for JSONB columns (use Json adapter)
-            interventions_json = Json([i.model_dump() for i in study_create.interventions])
-            locations_json = Json([loc.model_dump() for loc in study_create.locations])
-            contacts_json = Json([c.model_dump() for c in study_create.contacts])
-
-            # Prepare raw_json - convert to Json adapter if it's a string
-            raw_json_data = study_create.raw_json
-            if isinstance(raw_json_data, str):
-                raw_json_data = Json(json.loads(raw_json_data))
-            elif raw_json_data is not None:
-                raw_json_data = Json(raw_json_data)
+            # Prepare data for JSONB columns (use Jsonb adapter)
+            interventions_json = Jsonb([i.model_dump() for i in study_create.interventions])
+            locations_json = Jsonb([loc.model_dump() for loc in study_create.locations])
+            contacts_json = Jsonb([c.model_dump() for c in study_create.contacts])
 
             # Prepare arrays
             normalized_conditions = [c.strip().lower() for c in study_create.conditions]
             normalized_zips = [z.strip() for z in study_create.site_zips]
 
+            # SET expressions see the old row, so staleness is decided against previous values:
+            # title/summary feed the plain title/summary, eligibility feeds only the quiz.
+            # Embeddings are re-queued by a trigger when search_text changes (embedding_queue)
             cursor.execute("""
                 UPDATE studies
-                SET title = %s,
-                    brief_summary = %s,
-                    detailed_description = %s,
-                    eligibility_criteria = %s,
-                    recruiting_status = %s,
-                    study_type = %s,
-                    interventions = %s,
-                    conditions = %s,
-                    locations = %s,
-                    contacts = %s,
-                    site_zips = %s,
-                    raw_json = %s,
-                    last_synced_at = %s,
-                    updated_at = %s
-                WHERE id = %s
-            """, (
-                study_create.title,
-                study_create.brief_summary,
-                study_create.detailed_description,
-                study_create.eligibility_criteria,
-                study_create.recruiting_status,
-                study_create.study_type,
-                interventions_json,
-                normalized_conditions,
-                locations_json,
-                contacts_json,
-                normalized_zips,
-                raw_json_data,
-                now,
-                now,
-                study_id
-            ))
+                SET ai_plain_title = CASE
+                        WHEN title IS DISTINCT FROM %(title)s OR brief_summary IS DISTINCT FROM %(brief_summary)s
+                        THEN NULL ELSE ai_plain_title END,
+                    ai_plain_summary = CASE
+                        WHEN title IS DISTINCT FROM %(title)s OR brief_summary IS DISTINCT FROM %(brief_summary)s
+                        THEN NULL ELSE ai_plain_summary END,
+                    ai_eligibility_quiz = CASE
+                        WHEN eligibility_criteria IS DISTINCT FROM %(eligibility_criteria)s
+                        THEN NULL ELSE ai_eligibility_quiz END,
+                    title = %(title)s,
+                    brief_summary = %(brief_summary)s,
+                    detailed_description = %(detailed_description)s,
+                    eligibility_criteria = %(eligibility_criteria)s,
+                    recruiting_status = %(recruiting_status)s,
+                    study_type = %(study_type)s,
+                    interventions = %(interventions)s,
+                    conditions = %(conditions)s,
+                    locations = %(locations)s,
+                    contacts = %(contacts)s,
+                    site_zips = %(site_zips)s,
+                    min_age_months = %(min_age_months)s,
+                    max_age_months = %(max_age_months)s,
+                    eligible_sex = %(eligible_sex)s::eligible_sex,
+                    healthy_volunteers = %(healthy_volunteers)s,
+                    content_hash = %(content_hash)s,
+                    last_synced_at = %(now)s,
+                    updated_at = %(now)s
+                WHERE id = %(id)s
+            """, {
+                "title": study_create.title,
+                "brief_summary": study_create.brief_summary,
+                "detailed_description": study_create.detailed_description,
+                "eligibility_criteria": study_create.eligibility_criteria,
+                "recruiting_status": study_create.recruiting_status,
+                "study_type": study_create.study_type,
+                "interventions": interventions_json,
+                "conditions": normalized_conditions,
+                "locations": locations_json,
+                "contacts": contacts_json,
+                "site_zips": normalized_zips,
+                "min_age_months": study_create.min_age_months,
+                "max_age_months": study_create.max_age_months,
+                "eligible_sex": study_create.eligible_sex,
+                "healthy_volunteers": study_create.healthy_volunteers,
+                "content_hash": study_create.content_hash,
+                "now": now,
+                "id": study_id
+            })
+            if study_create.raw_json is not None:
+                save_raw_document(cursor, study_id, study_create.raw_json, study_create.content_hash)
             print(f"  Updated: {study_create.source_id} - {study_create.title[:60]}")
-        else:
-            # Insert new study
-            insert_study(study_create)
-            print(f"  Inserted: {study_create.source_id} - {study_create.title[:60]}")
+            return "updated"
 
+    if update_only:
+        return "skipped"
 
-def ingest_condition(condition: str, max_pages: int = 3, recruiting_only: bool = True):
+    # Insert new study (outside the lookup transaction; insert_study opens its own)
+    insert_study(study_create)
+    print(f"  Inserted: {study_create.source_id} - {study_create.title[:60]}")
+    return "inserted"
+
+
+def iso_date(value) -> str:
+    """Format a DATE column value as YYYY-MM-DD (None stays None)"""
+    return value.isoformat() if value else None
+
+
+def fetch_page_with_retry(**params) -> dict:
+    """Fetch one CT.gov page, retrying timeouts and 5xx responses with backoff"""
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            return fetch_studies_from_ctgov(page_size=PAGE_SIZE, **params)
+        except Exception as e:
+            if attempt == FETCH_RETRIES:
+                raise
+            delay = 2 ** attempt
+            print(f"  CT.gov request failed ({e}); retrying in {delay}s")
+            time.sleep(delay)
+
+
+async def fetch_page_with_retry_async(client, **params) -> dict:
+    """Async variant of fetch_page_with_retry()"""
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            return await fetch_studies_from_ctgov_async(client, page_size=PAGE_SIZE, **params)
+        except Exception as e:
+            if attempt == FETCH_RETRIES:
+                raise
+            delay = 2 ** attempt
+            print(f"  CT.gov request failed ({e}); retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+
+def open_ingest_job(condition: str, max_pages: int, recruiting_only: bool, incremental: bool):
+    """
+    Start or resume the ingest job for a condition
+
+    Returns:
+        The job row, or None if another process is actively running it.
+        A resumed job keeps the max_pages, status filter and updated_since it
+        was created with, so its page tokens stay valid.
     """
-    Ingest studies for a specific condition
+    updated_since = get_sync_watermark(condition) if incremental else None
+    if updated_since:
+        max_pages = INCREMENTAL_MAX_PAGES
+        recruiting_only = False
+
+    job = start_ingest_job(
+        condition,
+        mode="incremental" if incremental else "full",
+        max_pages=max_pages,
+        recruiting_only=recruiting_only,
+        updated_since=updated_since
+    )
+    if job is None:
+        print(f"Skipping {condition}: its ingest job is running in another process")
+    elif job["pages_fetched"]:
+        print(f"Resuming job {job['id']} for {condition} at page {job['pages_fetched'] + 1} "
+              f"({job['processed']} studies already processed)")
+    return job
+
+
+def page_total_expected(result: dict, max_pages: int):
+    """Expected studies for the job from the first page's totalCount, capped by max_pages"""
+    total = result.get("totalCount")
+    return min(total, max_pages * PAGE_SIZE) if total is not None else None
+
+
+def complete_ingest_job(job: dict, condition: str, incremental: bool):
+    """
+    Mark a job completed and advance the watermark if every study landed
+
+    Runs with updated_since are sorted oldest update first, so even one cut
+    off by max_pages fetched everything up to its watermark. A seeding run
+    (no watermark yet) is relevance-ordered: its watermark is only safe when
+    it reached the last page, otherwise studies past max_pages updated before
+    it would never be fetched, and the next run seeds again.
+    """
+    finish_ingest_job(job["id"], "completed")
+    print(f"Results: {job['inserted']} inserted, {job['updated']} updated, {job['unchanged']} unchanged, "
+          f"{job['skipped']} skipped, {job['failed']} failed")
+
+    # Only advance the watermark when every study landed, so failures are retried next run
+    if not (incremental and job["watermark"] and job["failed"] == 0):
+        return
+    if not job["updated_since"] and job["next_page_token"]:
+        print(f"No watermark for {condition}: the seeding run stopped at --max-pages={job['max_pages']} "
+              f"before the last page; the next incremental run fetches in full again")
+        return
+    save_sync_watermark(condition, iso_date(job["watermark"]))
+    print(f"Watermark for {condition}: {iso_date(job['watermark'])}")
+
+
+def ingest_condition(
+    condition: str,
+    max_pages: int = 3,
+    recruiting_only: bool = True,
+    incremental: bool = False,
+    alerts: SavedSearchAlerts = None
+):
+    """
+    Ingest studies for a specific condition as a resumable job
 
     Args:
         condition: Condition search term
         max_pages: Maximum number of pages to fetch (100 studies per page)
         recruiting_only: If True, only fetch RECRUITING studies
+        incremental: If True, only fetch studies updated since the stored watermark
+        alerts: Saved search hook notified of inserted/updated studies
     """
     print(f"\nFetching studies for condition: {condition}")
-    print(f"Max pages: {max_pages} (up to {max_pages * 100} studies)")
+    job = open_ingest_job(condition, max_pages, recruiting_only, incremental)
+    if job is None:
+        return
+
+    max_pages = job["max_pages"]
+    recruiting_only = job["recruiting_only"]
+    updated_since = iso_date(job["updated_since"])
+
+    print(f"Max pages: {max_pages} (up to {max_pages * PAGE_SIZE} studies)")
+    if updated_since:
+        print(f"Incremental: studies updated since {updated_since} (any status)")
+    elif incremental:
+        print("Incremental: no watermark yet, running a full fetch to seed it (saved only if it reaches the last page)")
     if recruiting_only:
         print("Filter: RECRUITING studies only")
 
+    page_token = job["next_page_token"]
+    watermark = iso_date(job["watermark"]) or updated_since
+
     try:
-        studies = fetch_all_pages_from_ctgov(
-            query_cond=condition,
-            max_pages=max_pages,
-            recruiting_status="RECRUITING" if recruiting_only else None
-        )
-        print(f"Fetched {len(studies)} studies from CT.gov")
+        # A missing token after the first page means the last page was already checkpointed
+        while job["pages_fetched"] < max_pages and (job["pages_fetched"] == 0 or page_token):
+            page_started = monotonic()
+            result = fetch_page_with_retry(
+                query_cond=condition,
+                page_token=page_token,
+                recruiting_status="RECRUITING" if recruiting_only else None,
+                updated_since=updated_since,
+                count_total=job["pages_fetched"] == 0
+            )
+            studies = result.get("studies", [])
 
-        for idx, raw_study in enumerate(studies, 1):
-            try:
-                study_create = normalize_ctgov_study(raw_study)
-                upsert_ctgov_study(study_create)
-            except Exception as e:
-                import traceback
-                print(f"  Error processing study {idx}: {e}")
-                print(f"  Study ID: {raw_study.get('protocolSection', {}).get('identificationModule', {}).get('nctId', 'Unknown')}")
-                traceback.print_exc()
-                continue
+            counts = {"processed": len(studies)}
+            for idx, raw_study in enumerate(studies, 1):
+                watermark = later_date(watermark, raw_study)
+                try:
+                    action = process_ctgov_study(raw_study, incremental=incremental, alerts=alerts)
+                    counts[action] = counts.get(action, 0) + 1
+                except Exception as e:
+                    import traceback
+                    counts["failed"] = counts.get("failed", 0) + 1
+                    print(f"  Error processing study {idx}: {e}")
+                    print(f"  Study ID: {raw_study.get('protocolSection', {}).get('identificationModule', {}).get('nctId', 'Unknown')}")
+                    traceback.print_exc()
+                    continue
 
+            flush_alerts(alerts)
+            page_token = result.get("nextPageToken")
+            job = checkpoint_ingest_job(
+                job["id"], page_token, counts, monotonic() - page_started,
+                watermark=watermark, total_expected=page_total_expected(result, max_pages)
+            )
+            print(f"  Page {job['pages_fetched']}: {len(studies)} studies "
+                  f"({job['processed']}/{job['total_expected'] or '?'} processed)")
+
+        complete_ingest_job(job, condition, incremental)
         print(f"Completed ingestion for: {condition}")
 
     except Exception as e:
+        finish_ingest_job(job["id"], "failed", str(e))
         print(f"Error fetching studies for {condition}: {e}")
+        print(f"Job {job['id']} will resume at page {job['pages_fetched'] + 1} on the next run")
+
+
+class AsyncRateLimiter:
+    """Spaces requests evenly so all async workers share one CT.gov budget"""
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until the next request slot is available"""
+        async with self.lock:
+            now = monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class IngestStats:
+    """Counters for a single async ingestion run"""
+    def __init__(self):
+        self.pages = 0
+        self.fetched = 0
+        self.duplicates = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.errors = 0
+        self.started = monotonic()
+
+    def report(self):
+        """Print a one-block run summary with throughput"""
+        elapsed = monotonic() - self.started
+        processed = self.fetched - self.duplicates
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"Pages fetched: {self.pages}")
+        print(f"Studies fetched: {self.fetched} ({self.duplicates} cross-condition duplicates skipped)")
+        print(f"Inserted: {self.inserted}, Updated: {self.updated}, Unchanged: {self.unchanged}, "
+              f"Skipped: {self.skipped}, Errors: {self.errors}")
+        print(f"Elapsed: {elapsed:.1f}s ({rate:.1f} studies/sec)")
+
+
+def process_ctgov_study(raw_study: dict, dry_run: bool = False, incremental: bool = False,
+                        alerts: SavedSearchAlerts = None) -> str:
+    """Normalize and upsert one raw CT.gov study; returns the action taken"""
+    study_create = normalize_ctgov_study(raw_study)
+    if dry_run:
+        return "skipped"
+    # Delta syncs see every status; only recruiting studies are new rows, the rest refresh existing ones
+    update_only = incremental and (study_create.recruiting_status or "").upper() != "RECRUITING"
+    action = upsert_ctgov_study(study_create, update_only=update_only)
+    if alerts is not None and action in ("inserted", "updated"):
+        alerts.observe(study_create)
+    return action
+
+
+def flush_alerts(alerts: SavedSearchAlerts = None):
+    """Write a page's saved search matches; a failure loses those alerts but not the page"""
+    if alerts is None:
+        return
+    try:
+        alerts.flush()
+    except Exception as e:
+        print(f"  Error writing saved search notifications: {e}")
+
+
+async def ingest_condition_async(
+    client,
+    condition: str,
+    max_pages: int,
+    recruiting_only: bool,
+    limiter: AsyncRateLimiter,
+    seen: set,
+    stats: IngestStats,
+    dry_run: bool = False,
+    incremental: bool = False,
+    alerts: SavedSearchAlerts = None
+):
+    """
+    Page through one condition as a resumable job, skipping NCT IDs already handled this run
+    Dry runs do not create or checkpoint jobs
+    """
+    job = None
+    updated_since = None
+    pages_fetched = 0
+    page_token = None
+
+    if dry_run:
+        if incremental:
+            updated_since = await asyncio.to_thread(get_sync_watermark, condition)
+        if updated_since:
+            max_pages = INCREMENTAL_MAX_PAGES
+            recruiting_only = False
+    else:
+        job = await asyncio.to_thread(open_ingest_job, condition, max_pages, recruiting_only, incremental)
+        if job is None:
+            return
+        max_pages = job["max_pages"]
+        recruiting_only = job["recruiting_only"]
+        updated_since = iso_date(job["updated_since"])
+        pages_fetched = job["pages_fetched"]
+        page_token = job["next_page_token"]
+
+    if updated_since:
+        print(f"Incremental: {condition} studies updated since {updated_since}")
+
+    watermark = (iso_date(job["watermark"]) if job else None) or updated_since
+
+    try:
+        while pages_fetched < max_pages and (pages_fetched == 0 or page_token):
+            await limiter.acquire()
+            page_started = monotonic()
+            result = await fetch_page_with_retry_async(
+                client,
+                query_cond=condition,
+                page_token=page_token,
+                recruiting_status="RECRUITING" if recruiting_only else None,
+                updated_since=updated_since,
+                count_total=pages_fetched == 0
+            )
+            studies = result.get("studies", [])
+            stats.pages += 1
+            stats.fetched += len(studies)
+
+            counts = {"processed": len(studies)}
+            for raw_study in studies:
+                watermark = later_date(watermark, raw_study)
+                nct_id = raw_study.get("protocolSection", {}).get("identificationModule", {}).get("nctId")
+                # Check-and-add happens without an await in between, so it is atomic on the event loop
+                if nct_id and nct_id in seen:
+                    stats.duplicates += 1
+                    counts["skipped"] = counts.get("skipped", 0) + 1
+                    continue
+                if nct_id:
+                    seen.add(nct_id)
+
+                try:
+                    action = await asyncio.to_thread(process_ctgov_study, raw_study, dry_run, incremental, alerts)
+                    counts[action] = counts.get(action, 0) + 1
+                    if action == "inserted":
+                        stats.inserted += 1
+                    elif action == "updated":
+                        stats.updated += 1
+                    elif action == "unchanged":
+                        stats.unchanged += 1
+                    else:
+                        stats.skipped += 1
+                except Exception as e:
+                    # Claimed before processing so concurrent conditions skip it; release it so
+                    # a later condition in this run retries the study instead of skipping it
+                    if nct_id:
+                        seen.discard(nct_id)
+                    counts["failed"] = counts.get("failed", 0) + 1
+                    stats.errors += 1
+                    print(f"  Error processing study {nct_id or 'Unknown'} ({condition}): {e}")
+
+            await asyncio.to_thread(flush_alerts, alerts)
+            page_token = result.get("nextPageToken")
+            pages_fetched += 1
+            if job is not None:
+                job = await asyncio.to_thread(
+                    checkpoint_ingest_job, job["id"], page_token, counts, monotonic() - page_started,
+                    watermark, page_total_expected(result, max_pages)
+                )
+    except Exception as e:
+        if job is not None:
+            await asyncio.to_thread(finish_ingest_job, job["id"], "failed", str(e))
+            print(f"Job {job['id']} for {condition} will resume at page {pages_fetched + 1} on the next run")
+        raise
+
+    if job is not None:
+        await asyncio.to_thread(complete_ingest_job, job, condition, incremental)
+
+    print(f"Completed ingestion for: {condition} ({pages_fetched} pages)")
+
+
+async def ingest_conditions_async(
+    conditions: list,
+    max_pages: int = 3,
+    recruiting_only: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    dry_run: bool = False,
+    incremental: bool = False,
+    alerts: SavedSearchAlerts = None
+) -> IngestStats:
+    """
+    Ingest several conditions concurrently
+
+    Args:
+        conditions: Condition search terms
+        max_pages: Maximum number of pages to fetch per condition
+        recruiting_only: If True, only fetch RECRUITING studies
+        workers: Number of conditions ingested at the same time
+        requests_per_second: CT.gov request budget shared by all workers
+        dry_run: If True, fetch and normalize but skip database writes
+        incremental: If True, only fetch studies updated since each condition's watermark
+        alerts: Saved search hook notified of inserted/updated studies
+    """
+    import httpx
+
+    queue = asyncio.Queue()
+    for condition in conditions:
+        queue.put_nowait(condition)
+
+    limiter = AsyncRateLimiter(requests_per_second)
+    seen = set()
+    stats = IngestStats()
+
+    async def worker(client):
+        while True:
+            try:
+                condition = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            print(f"\nFetching studies for condition: {condition}")
+            try:
+                await ingest_condition_async(
+                    client, condition, max_pages, recruiting_only, limiter, seen, stats,
+                    dry_run, incremental, alerts
+                )
+            except Exception as e:
+                print(f"Error fetching studies for {condition}: {e}")
+
+    async with httpx.AsyncClient() as client:
+        await asyncio.gather(*[worker(client) for _ in range(max(1, workers))])
+
+    return stats
+
+
+def format_duration(seconds) -> str:
+    """Render seconds as e.g. 1h05m or 3m20s"""
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def print_job_status(limit: int = 20):
+    """Print recent ingest jobs with progress, throughput and ETA"""
+    jobs = list_ingest_jobs(limit=limit)
+    if not jobs:
+        print("No ingest jobs recorded yet")
+        return
+
+    print(f"{'ID':>6}  {'Condition':<20} {'Mode':<11} {'Status':<9} {'Pages':>7} {'Processed':>13} "
+          f"{'Ins/Upd/Fail':>14} {'Rate':>9} {'ETA':>7}")
+    for job in jobs:
+        expected = job.total_expected if job.total_expected is not None else "?"
+        print(f"{job.id:>6}  {job.condition[:20]:<20} {job.mode:<11} {job.status:<9} "
+              f"{job.pages_fetched:>3}/{job.max_pages:<3} {job.processed:>6}/{expected:<6} "
+              f"{f'{job.inserted}/{job.updated}/{job.failed}':>14} {job.studies_per_second:>5.1f}/s "
+              f"{format_duration(job.eta_seconds):>7}")
+        if job.last_error:
+            print(f"        last error: {job.last_error}")
 
 
 def main():
@@ -149,17 +656,55 @@ def main():
     print("ClinicalTrials.gov Ingestion Script")
     print("=" * 60)
 
+    if "--status" in sys.argv:
+        print()
+        print_job_status(parse_flag_value("limit", 20, int))
+        return
+
     conditions_to_ingest = DEFAULT_CONDITIONS
-    max_pages = 3
+    max_pages = parse_flag_value("max-pages", 3, int)
+    async_mode = "--async" in sys.argv
+    dry_run = "--dry-run" in sys.argv
+    incremental = "--incremental" in sys.argv
 
-    if len(sys.argv) > 1:
-        conditions_to_ingest = sys.argv[1:]
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if positional:
+        conditions_to_ingest = positional
 
     print(f"\nConditions to ingest: {', '.join(conditions_to_ingest)}")
     print(f"Pages per condition: {max_pages}\n")
 
-    for condition in conditions_to_ingest:
-        ingest_condition(condition, max_pages=max_pages)
+    alerts = None
+    if not dry_run and "--no-alerts" not in sys.argv:
+        try:
+            alerts = SavedSearchAlerts()
+            print(f"Saved search alerts: matching against {alerts.index.size} saved searches\n")
+        except Exception as e:
+            print(f"Saved search alerts disabled: {e}\n")
+
+    if async_mode:
+        workers = parse_flag_value("workers", DEFAULT_WORKERS, int)
+        requests_per_second = parse_flag_value("rps", DEFAULT_REQUESTS_PER_SECOND, float)
+        print(f"Async mode: {workers} workers, {requests_per_second} CT.gov requests/sec")
+        if dry_run:
+            print("[DRY RUN] Fetching and normalizing only, no database writes")
+        stats = asyncio.run(ingest_conditions_async(
+            conditions_to_ingest,
+            max_pages=max_pages,
+            workers=workers,
+            requests_per_second=requests_per_second,
+            dry_run=dry_run,
+            incremental=incremental,
+            alerts=alerts
+        ))
+        print()
+        stats.report()
+    else:
+        for condition in conditions_to_ingest:
+            ingest_condition(condition, max_pages=max_pages, incremental=incremental, alerts=alerts)
+
+    if alerts is not None:
+        print(f"\nSaved search notifications written: {alerts.notified}")
 
     print("\n" + "=" * 60)
     print("Ingestion complete!")
@@ -0,0 +1,125 @@
+"""
+Measure studies table size and buffer usage of the search queries
+Run before and after a storage migration (e.g. moving raw_json to
+study_raw_documents) and compare the two reports
+
+Usage:
+    python scripts/measure_study_storage.py [--query="heart failure"] [--runs=5]
+"""
+import sys
+from pathlib import Path
+from time import perf_counter
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from platform_module import get_db
+
+
+def report_table_sizes(cursor):
+    """Print heap, TOAST and index sizes for studies and the raw document side table"""
+    print("\nTable sizes:")
+    for table in ("studies", "study_raw_documents"):
+        cursor.execute("SELECT to_regclass(%s) AS oid", (f"public.{table}",))
+        if cursor.fetchone()["oid"] is None:
+            print(f"  {table}: (not present)")
+            continue
+        cursor.execute("""
+            SELECT
+                pg_size_pretty(pg_relation_size(c.oid)) AS heap,
+                pg_size_pretty(COALESCE(pg_total_relation_size(c.reltoastrelid), 0)) AS toast,
+                pg_size_pretty(pg_indexes_size(c.oid)) AS indexes,
+                pg_size_pretty(pg_total_relation_size(c.oid)) AS total,
+                c.reltuples::bigint AS approx_rows
+            FROM pg_class c
+            WHERE c.oid = %s::regclass
+        """, (f"public.{table}",))
+        row = cursor.fetchone()
+        print(f"  {table}: heap {row['heap']}, toast {row['toast']}, indexes {row['indexes']}, "
+              f"total {row['total']} (~{row['approx_rows']} rows)")
+
+
+def explain_buffers(cursor, label: str, sql: str, params: tuple, runs: int):
+    """Run EXPLAIN (ANALYZE, BUFFERS) and print shared buffer hits/reads and time (best run)"""
+    best = None
+    for _ in range(runs):
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()
+        plan = plan[next(iter(plan))][0]
+        root = plan["Plan"]
+        result = {
+            "hit": root.get("Shared Hit Blocks", 0),
+            "read": root.get("Shared Read Blocks", 0),
+            "ms": plan.get("Execution Time", 0.0)
+        }
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+    print(f"  {label:<28} shared hit {best['hit']:>8}  read {best['read']:>8}  {best['ms']:>9.2f} ms")
+
+
+def measure_fetch(cursor, label: str, sql: str, runs: int):
+    """
+    Time a full fetch and report the detoasted bytes it ships
+
+    EXPLAIN ANALYZE never detoasts output columns, so it understates the cost
+    of wide rows; this measures what the API actually pulls over the wire.
+    """
+    cursor.execute(f"SELECT COALESCE(SUM(pg_column_size(t.*)), 0) AS bytes, COUNT(*) AS n FROM ({sql}) t")
+    size = cursor.fetchone()
+    best_ms = None
+    for _ in range(runs):
+        started = perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        elapsed_ms = (perf_counter() - started) * 1000
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+    print(f"  {label:<28} {size['n']:>8} rows  {size['bytes'] / 1024 / 1024:>8.2f} MiB  {best_ms:>9.2f} ms")
+
+
+def main():
+    """Main measurement runner"""
+    query_text = parse_flag_value("query", "heart failure").lower()
+    runs = parse_flag_value("runs", 5, int)
+
+    print("=" * 60)
+    print("STUDIES STORAGE REPORT")
+    print("=" * 60)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        report_table_sizes(cursor)
+
+        print(f"\nFull fetch (best of {runs}):")
+        measure_fetch(cursor, "list studies (SELECT *)",
+                      "SELECT * FROM studies WHERE is_published = TRUE ORDER BY id", runs)
+
+        print(f"\nSearch query buffers (best of {runs}, query '{query_text}'):")
+        # Keyword path: list_all_studies() used to be SELECT *
+        explain_buffers(cursor, "list studies (SELECT *)",
+                        "SELECT * FROM studies WHERE is_published = TRUE ORDER BY id", (), runs)
+        explain_buffers(cursor, "trigram candidates",
+                        "SELECT id, title, brief_summary FROM studies "
+                        "WHERE search_text %% %s AND is_published = TRUE "
+                        "ORDER BY similarity(search_text, %s) DESC LIMIT 50",
+                        (query_text, query_text), runs)
+
+        cursor.execute("SELECT embedding, embedding_model, vector_dims(embedding) AS dim FROM studies "
+                       "WHERE embedding IS NOT NULL AND embedding_model IS NOT NULL LIMIT 1")
+        sample = cursor.fetchone()
+        if sample:
+            dim = int(sample["dim"])
+            explain_buffers(cursor, "vector candidates",
+                            f"SELECT id, title, (embedding::vector({dim}) <=> %s::vector({dim})) AS d FROM studies "
+                            "WHERE embedding IS NOT NULL AND embedding_model = %s AND is_published = TRUE "
+                            "ORDER BY d LIMIT 150",
+                            (sample["embedding"], sample["embedding_model"]), runs)
+        else:
+            print("  vector candidates            (no embeddings stored)")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Precompute AI plain titles, summaries and eligibility quizzes in bulk
+Selects published studies missing any artifact kind at its current prompt
+version (AI_PROMPT_VERSIONS), most-shown in search first
+(study_search_exposure), and generates all three per study with a bounded
+number of Claude calls in flight. Results are written in bulk to
+ai_artifacts; re-running resumes with whatever is still missing.
+
+--bundle asks for all three in one Claude call per study (see
+scripts/bench_ai_bundle.py for the token and latency difference).
+
+--seed first copies artifacts cached on studies under the legacy
+AI_CACHE_VERSION into ai_artifacts, so they are not generated again.
+
+Usage:
+    python scripts/precompute_ai.py [--limit=500] [--concurrency=8] [--write-batch=25] [--bundle] [--seed]
+        [--dry-run]
+
+Measure offline against the fixture server's fake Claude:
+    python scripts/fixture_server.py --llm-only [--llm-tokens-per-second=80] [--llm-rpm=500]
+    ANTHROPIC_BASE_URL=http://localhost:8765 ANTHROPIC_API_KEY=fixture python scripts/precompute_ai.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+from time import monotonic
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from ai_module import (
+    AI_PROMPT_VERSIONS,
+    close_anthropic_client,
+    fetch_studies_for_ai,
+    fetch_studies_missing_ai_artifacts,
+    generate_study_artifacts,
+    save_ai_artifacts_bulk,
+    seed_ai_artifacts_from_studies,
+    set_generation_concurrency,
+)
+from platform_module import telemetry
+
+DEFAULT_LIMIT = 500  # Studies per run
+DEFAULT_CONCURRENCY = 8  # Claude calls in flight
+WRITE_BATCH = 25  # Studies per bulk UPDATE
+LOAD_BATCH = 100  # Studies whose prompt inputs are read per query
+
+
+class PrecomputeStats:
+    """Counters for a single precompute run"""
+    def __init__(self, total: int):
+        self.total = total
+        self.written = 0
+        self.failed = 0
+        self.started = monotonic()
+
+    def studies_per_minute(self) -> float:
+        elapsed = monotonic() - self.started
+        return 60 * self.written / elapsed if elapsed > 0 else 0.0
+
+
+async def run_precompute(study_ids: list, concurrency: int, write_batch: int,
+                         bundle: bool = False) -> PrecomputeStats:
+    """Loader -> concurrent generators -> bulk writer, connected by bounded queues"""
+    set_generation_concurrency(concurrency)
+    stats = PrecomputeStats(len(study_ids))
+    # Each study makes up to three calls, so this many studies keep the cap busy
+    workers = max(1, concurrency)
+
+    pending = asyncio.Queue(maxsize=workers * 2)
+    results = asyncio.Queue(maxsize=workers * 2)
+
+    async def loader():
+        for start in range(0, len(study_ids), LOAD_BATCH):
+            rows = await asyncio.to_thread(fetch_studies_for_ai, study_ids[start:start + LOAD_BATCH])
+            for row in rows:
+                await pending.put(row)
+        for _ in range(workers):
+            await pending.put(None)
+
+    async def generator():
+        while True:
+            study = await pending.get()
+            if study is None:
+                return
+            try:
+                await results.put(await generate_study_artifacts(study, bundle))
+            except Exception as e:
+                stats.failed += 1
+                print(f"  ERROR generating artifacts for study {study['id']}: {e}")
+
+    async def writer():
+        batch = []
+        done = False
+        while not done:
+            result = await results.get()
+            if result is None:
+                done = True
+            else:
+                batch.append(result)
+            if batch and (done or len(batch) >= write_batch):
+                try:
+                    stats.written += await asyncio.to_thread(save_ai_artifacts_bulk, batch)
+                except Exception as e:
+                    stats.failed += len(batch)
+                    print(f"  ERROR writing batch of {len(batch)}: {e}")
+                batch = []
+                print(f"Progress: {stats.written}/{stats.total} studies "
+                      f"({stats.studies_per_minute():.0f} studies/min, {stats.failed} failed)")
+
+    writer_task = asyncio.create_task(writer())
+    try:
+        await asyncio.gather(loader(), *[generator() for _ in range(workers)])
+    finally:
+        await results.put(None)
+        await writer_task
+        await close_anthropic_client()
+        # Token usage and cost of the run show up in /admin/telemetry
+        await asyncio.to_thread(telemetry.flush)
+
+    return stats
+
+
+def main():
+    """Main precompute runner"""
+    limit = parse_flag_value("limit", DEFAULT_LIMIT, int)
+    concurrency = parse_flag_value("concurrency", DEFAULT_CONCURRENCY, int)
+    write_batch = parse_flag_value("write-batch", WRITE_BATCH, int)
+    dry_run = "--dry-run" in sys.argv
+    bundle = "--bundle" in sys.argv
+
+    print("=" * 60)
+    print("AI PRECOMPUTE")
+    print(", ".join(f"{kind}={version}" for kind, version in AI_PROMPT_VERSIONS.items()))
+    print("=" * 60)
+
+    if "--seed" in sys.argv and not dry_run:
+        seeded = seed_ai_artifacts_from_studies()
+        print(f"Seeded artifacts of {seeded} studies from legacy cached columns")
+
+    study_ids = fetch_studies_missing_ai_artifacts(limit)
+    print(f"Found {len(study_ids)} studies missing AI artifacts (limit {limit})")
+    if not study_ids:
+        print("✓ Nothing to precompute!")
+        return
+    if dry_run:
+        print(f"[DRY RUN] Would generate 3 artifacts ({'1 call' if bundle else '3 calls'}) each for studies {study_ids[:10]}"
+              f"{' ...' if len(study_ids) > 10 else ''} with {concurrency} calls in flight")
+        return
+
+    stats = asyncio.run(run_precompute(study_ids, concurrency, write_batch, bundle))
+
+    elapsed = monotonic() - stats.started
+    print(f"\n✓ Precompute complete! {stats.written}/{stats.total} studies in {elapsed:.1f}s "
+          f"({stats.studies_per_minute():.0f} studies/min), failed: {stats.failed}")
+    if stats.failed:
+        print("  Failed studies are still missing artifacts; re-run to retry them")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Refresh precomputed per-user study recommendations
+Each pass folds studies whose scoring inputs (status, conditions, eligibility,
+embedding) changed since the last pass into existing recommendation lists,
+then recomputes users queued in recommendation_queue (profile or match
+answers changed; a trigger queues them). Users only see
+the result through the user_recommendations table.
+
+Usage:
+    python scripts/refresh_recommendations.py [--batch-size=100] [--all] [--watch] [--poll=60]
+
+    --all      queue every user first (after changing weights or the embedding provider)
+    --watch    keep running: wake on NOTIFY recommendation_queue, sync studies every --poll seconds
+"""
+import sys
+from pathlib import Path
+from time import monotonic
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+import psycopg
+
+from cli import parse_flag_value
+from platform_module import DATABASE_URL, telemetry
+from recommendation_module import (
+    RECOMMENDATION_BATCH_SIZE,
+    count_recommendation_queue,
+    enqueue_all_recommendations,
+    refresh_queued_recommendations,
+    sync_updated_studies,
+)
+from search_module import create_embedding_provider
+
+
+def run_pass(provider, batch_size: int):
+    """Merge updated studies, then drain the queue"""
+    started = monotonic()
+    synced = sync_updated_studies(provider)
+    refreshed = refresh_queued_recommendations(provider, batch_size)
+    telemetry.flush()
+    if synced["studies"] or refreshed["refreshed"] or refreshed["failed"]:
+        print(f"Studies merged: {synced['studies']} ({synced['users']} users changed, "
+              f"{synced['requeued']} re-queued); users refreshed: {refreshed['refreshed']}, "
+              f"failed: {refreshed['failed']} in {monotonic() - started:.1f}s")
+
+
+def main():
+    """Main refresh runner"""
+    batch_size = parse_flag_value("batch-size", RECOMMENDATION_BATCH_SIZE, int)
+    poll_seconds = parse_flag_value("poll", 60.0, float)
+    provider = create_embedding_provider()
+
+    print("=" * 60)
+    print(f"RECOMMENDATION REFRESH ({provider.model_name})")
+    print("=" * 60)
+
+    if "--all" in sys.argv:
+        print(f"Queued {enqueue_all_recommendations()} users")
+    print(f"{count_recommendation_queue()} users queued")
+
+    run_pass(provider, batch_size)
+    if "--watch" not in sys.argv:
+        print("=" * 60)
+        return
+
+    print(f"Watching recommendation_queue (studies synced every {poll_seconds:.0f}s, Ctrl+C to stop)")
+    try:
+        with psycopg.connect(DATABASE_URL, autocommit=True) as listener:
+            listener.execute("LISTEN recommendation_queue")
+            while True:
+                for _ in listener.notifies(timeout=poll_seconds, stop_after=1):
+                    pass
+                run_pass(provider, batch_size)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
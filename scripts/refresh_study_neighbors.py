@@ -0,0 +1,56 @@
+"""
+Refresh precomputed similar-study lists (study_neighbors)
+Loads every embedding of the configured EMBEDDING_PROVIDER's model, recomputes
+the top-k neighbors of studies whose embedding changed since their list was
+computed (blocked NumPy matrix product over all embeddings) and merges them
+into the other studies' lists. Run after scripts/backfill_embeddings.py or
+nightly; a pass with nothing stale returns after one COUNT query.
+
+Usage:
+    python scripts/refresh_study_neighbors.py [--all] [--k=50] [--model=NAME]
+
+    --all      rebuild every list (after changing STUDY_NEIGHBORS_K)
+"""
+import sys
+from pathlib import Path
+from time import monotonic
+
+# Add backend directory to path for imports
+backend_path = Path(__file__).parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+from cli import parse_flag_value
+from search_module import (
+    STUDY_NEIGHBORS_K,
+    count_stale_study_neighbors,
+    create_embedding_provider,
+    refresh_study_neighbors,
+)
+
+
+def main():
+    """Main refresh runner"""
+    k = parse_flag_value("k", STUDY_NEIGHBORS_K, int)
+    model = parse_flag_value("model", None) or create_embedding_provider().model_name
+    full = "--all" in sys.argv
+
+    print("=" * 60)
+    print(f"STUDY NEIGHBORS REFRESH ({model}, k={k})")
+    print("=" * 60)
+
+    if not full:
+        print(f"{count_stale_study_neighbors(model)} studies with a missing or stale list")
+
+    started = monotonic()
+    stats = refresh_study_neighbors(model, full=full, k=k)
+    elapsed = monotonic() - started
+    if stats["studies"]:
+        print(f"{'Full rebuild' if stats['full'] else 'Incremental'} over {stats['studies']} studies: "
+              f"{stats['recomputed']} recomputed, {stats['merged']} lists merged in {elapsed:.1f}s")
+    else:
+        print("Nothing to refresh")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+-- =====================================================
+-- CT.GOV SYNC STATE
+-- Per-condition watermarks for incremental (delta) ingestion
+-- =====================================================
+
+CREATE TABLE public.ctgov_sync_state (
+  condition TEXT PRIMARY KEY,
+  last_update_post_date DATE NOT NULL,
+  last_synced_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+-- Enable RLS with no policies (only service role / ingestion scripts can access)
+ALTER TABLE public.ctgov_sync_state ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.ctgov_sync_state IS 'Ingestion watermarks: latest CT.gov lastUpdatePostDate seen per condition search term';
+COMMENT ON COLUMN public.ctgov_sync_state.condition IS 'Condition search term as passed to scripts/ingest_ctgov.py (lowercased)';
+COMMENT ON COLUMN public.ctgov_sync_state.last_update_post_date IS 'Max lastUpdatePostDate seen; incremental runs request studies updated on or after this date';
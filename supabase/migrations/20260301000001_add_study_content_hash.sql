@@ -0,0 +1,30 @@
+-- =====================================================
+-- STUDY CONTENT HASH
+-- Skip redundant CT.gov rewrites and track derived-data staleness
+-- =====================================================
+
+ALTER TABLE public.studies
+  ADD COLUMN IF NOT EXISTS content_hash TEXT,
+  ADD COLUMN IF NOT EXISTS embedding_stale BOOLEAN NOT NULL DEFAULT FALSE;
+
+COMMENT ON COLUMN public.studies.content_hash IS 'SHA-256 over the normalized fields we use (see compute_content_hash in backend/search_module.py); unchanged re-ingests are skipped';
+COMMENT ON COLUMN public.studies.embedding_stale IS 'Set when title/brief_summary changed after the embedding was computed; cleared by scripts/backfill_embeddings.py';
+
+-- =====================================================
+-- ONLY REBUILD search_text WHEN ITS INPUTS CHANGE
+-- =====================================================
+
+-- UPDATE OF title, brief_summary fires whenever the columns appear in SET,
+-- even with identical values. Split the trigger so updates compare values.
+DROP TRIGGER IF EXISTS trigger_update_search_text ON public.studies;
+
+CREATE TRIGGER trigger_update_search_text
+  BEFORE INSERT ON public.studies
+  FOR EACH ROW
+  EXECUTE FUNCTION public.update_search_text();
+
+CREATE TRIGGER trigger_update_search_text_on_change
+  BEFORE UPDATE OF title, brief_summary ON public.studies
+  FOR EACH ROW
+  WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.brief_summary IS DISTINCT FROM NEW.brief_summary)
+  EXECUTE FUNCTION public.update_search_text();
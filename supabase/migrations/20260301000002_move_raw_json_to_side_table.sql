@@ -0,0 +1,34 @@
+-- =====================================================
+-- RAW SOURCE DOCUMENTS SIDE TABLE
+-- Move studies.raw_json out of the hot studies heap
+-- =====================================================
+
+-- raw_json was only read by GET /studies/{id}, but every SELECT * and every
+-- vector/trigram scan paid for it. Raw documents now live here, gzip-compressed
+-- by the backend (encoding = 'gzip'). Rows migrated from raw_json are stored
+-- as plain UTF-8 JSON (encoding = 'identity') and rely on TOAST compression
+-- until the study is next re-ingested.
+CREATE TABLE public.study_raw_documents (
+  study_id BIGINT PRIMARY KEY REFERENCES public.studies(id) ON DELETE CASCADE,
+  encoding TEXT NOT NULL DEFAULT 'gzip',
+  payload BYTEA NOT NULL,
+  content_hash TEXT,
+  stored_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+
+  CONSTRAINT study_raw_documents_encoding_check CHECK (encoding IN ('gzip', 'identity'))
+);
+
+-- Enable RLS with no policies (only the backend / service role reads raw documents)
+ALTER TABLE public.study_raw_documents ENABLE ROW LEVEL SECURITY;
+
+-- Copy existing raw documents
+INSERT INTO public.study_raw_documents (study_id, encoding, payload, content_hash)
+SELECT id, 'identity', convert_to(raw_json::text, 'UTF8'), content_hash
+FROM public.studies
+WHERE raw_json IS NOT NULL;
+
+ALTER TABLE public.studies DROP COLUMN raw_json;
+
+COMMENT ON TABLE public.study_raw_documents IS 'Raw source documents (e.g. CT.gov study JSON) kept out of the studies heap; loaded only on explicit request';
+COMMENT ON COLUMN public.study_raw_documents.encoding IS 'gzip: payload is gzip-compressed UTF-8 JSON; identity: payload is UTF-8 JSON';
+COMMENT ON COLUMN public.study_raw_documents.content_hash IS 'studies.content_hash at the time the document was stored';
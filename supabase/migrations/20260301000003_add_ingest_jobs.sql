@@ -0,0 +1,43 @@
+-- =====================================================
+-- INGEST JOBS
+-- Durable, resumable CT.gov ingestion runs (one row per condition run)
+-- =====================================================
+
+CREATE TABLE public.ingest_jobs (
+  id BIGSERIAL PRIMARY KEY,
+  condition TEXT NOT NULL,
+  mode TEXT NOT NULL DEFAULT 'full' CHECK (mode IN ('full', 'incremental')),
+  status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'completed', 'failed')),
+  recruiting_only BOOLEAN NOT NULL DEFAULT TRUE,
+  updated_since DATE,
+  max_pages INTEGER NOT NULL,
+  next_page_token TEXT,
+  pages_fetched INTEGER NOT NULL DEFAULT 0,
+  total_expected INTEGER,
+  processed INTEGER NOT NULL DEFAULT 0,
+  inserted INTEGER NOT NULL DEFAULT 0,
+  updated INTEGER NOT NULL DEFAULT 0,
+  unchanged INTEGER NOT NULL DEFAULT 0,
+  skipped INTEGER NOT NULL DEFAULT 0,
+  failed INTEGER NOT NULL DEFAULT 0,
+  active_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+  watermark DATE,
+  last_error TEXT,
+  started_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  finished_at TIMESTAMPTZ
+);
+
+-- Resume lookup: latest unfinished job for a condition
+CREATE INDEX idx_ingest_jobs_condition_status ON public.ingest_jobs(condition, status, id DESC);
+CREATE INDEX idx_ingest_jobs_started_at ON public.ingest_jobs(started_at DESC);
+
+-- Enable RLS with no policies (only service role / ingestion scripts can access)
+ALTER TABLE public.ingest_jobs ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.ingest_jobs IS 'CT.gov ingestion runs with a per-page checkpoint; unfinished jobs are resumed by scripts/ingest_ctgov.py';
+COMMENT ON COLUMN public.ingest_jobs.condition IS 'Condition search term (lowercased)';
+COMMENT ON COLUMN public.ingest_jobs.next_page_token IS 'CT.gov nextPageToken of the first page not yet fully processed (NULL = start from page 1)';
+COMMENT ON COLUMN public.ingest_jobs.total_expected IS 'CT.gov totalCount for the query, capped at max_pages pages; used for ETA';
+COMMENT ON COLUMN public.ingest_jobs.active_seconds IS 'Time spent fetching and processing checkpointed pages (excludes downtime between attempts); basis for throughput';
+COMMENT ON COLUMN public.ingest_jobs.watermark IS 'Max lastUpdatePostDate seen so far; written to ctgov_sync_state when an incremental job completes cleanly';
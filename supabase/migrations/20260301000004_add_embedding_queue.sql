@@ -0,0 +1,89 @@
+-- =====================================================
+-- EMBEDDING PROVENANCE + RE-EMBEDDING QUEUE
+-- Record what each embedding was computed from and queue studies whose
+-- search_text no longer matches it
+-- =====================================================
+
+ALTER TABLE public.studies
+  ADD COLUMN IF NOT EXISTS embedding_text_hash TEXT,
+  ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+
+COMMENT ON COLUMN public.studies.embedding_text_hash IS 'md5(search_text) of the text the embedding was computed from';
+COMMENT ON COLUMN public.studies.embedding_model IS 'Embedding model that produced the embedding (e.g. text-embedding-3-small)';
+
+-- Duplicate texts reuse an existing vector instead of being embedded again
+CREATE INDEX IF NOT EXISTS idx_studies_embedding_text_hash ON public.studies(embedding_text_hash)
+  WHERE embedding_text_hash IS NOT NULL;
+
+-- Existing embeddings were computed from the current search_text unless ingestion flagged them
+UPDATE public.studies
+SET embedding_text_hash = md5(search_text),
+    embedding_model = 'text-embedding-3-small'
+WHERE embedding IS NOT NULL AND search_text IS NOT NULL AND NOT embedding_stale;
+
+CREATE TABLE public.embedding_queue (
+  study_id BIGINT PRIMARY KEY REFERENCES public.studies(id) ON DELETE CASCADE,
+  text_hash TEXT NOT NULL,
+  enqueued_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT
+);
+
+-- Enable RLS with no policies (only service role / embedding worker can access)
+ALTER TABLE public.embedding_queue ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.embedding_queue IS 'Studies whose embedding is missing or was computed from different search_text; drained by scripts/backfill_embeddings.py';
+COMMENT ON COLUMN public.embedding_queue.text_hash IS 'md5(search_text) when the study was queued';
+COMMENT ON COLUMN public.embedding_queue.attempts IS 'Failed embedding attempts; the worker skips rows past its retry limit';
+
+-- =====================================================
+-- QUEUE MAINTENANCE TRIGGER
+-- =====================================================
+
+-- Runs AFTER the search_text trigger, so NEW.search_text is final.
+-- Queues the study when its embedding does not match the current text and
+-- dequeues it once a matching embedding is written.
+CREATE OR REPLACE FUNCTION public.sync_embedding_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.search_text IS NOT NULL
+     AND (NEW.embedding IS NULL OR NEW.embedding_text_hash IS DISTINCT FROM md5(NEW.search_text)) THEN
+    INSERT INTO public.embedding_queue (study_id, text_hash)
+    VALUES (NEW.id, md5(NEW.search_text))
+    ON CONFLICT (study_id) DO UPDATE
+    SET text_hash = EXCLUDED.text_hash,
+        enqueued_at = NOW(),
+        attempts = 0,
+        last_error = NULL
+    WHERE embedding_queue.text_hash IS DISTINCT FROM EXCLUDED.text_hash;
+  ELSE
+    DELETE FROM public.embedding_queue WHERE study_id = NEW.id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_sync_embedding_queue
+  AFTER INSERT ON public.studies
+  FOR EACH ROW
+  EXECUTE FUNCTION public.sync_embedding_queue();
+
+-- search_text is set by a BEFORE trigger, so compare values rather than using UPDATE OF
+CREATE TRIGGER trigger_sync_embedding_queue_on_change
+  AFTER UPDATE ON public.studies
+  FOR EACH ROW
+  WHEN (OLD.search_text IS DISTINCT FROM NEW.search_text
+        OR OLD.embedding_text_hash IS DISTINCT FROM NEW.embedding_text_hash
+        OR (OLD.embedding IS NULL) <> (NEW.embedding IS NULL))
+  EXECUTE FUNCTION public.sync_embedding_queue();
+
+-- Seed the queue with everything currently missing or stale
+INSERT INTO public.embedding_queue (study_id, text_hash)
+SELECT id, md5(search_text)
+FROM public.studies
+WHERE search_text IS NOT NULL
+  AND (embedding IS NULL OR embedding_text_hash IS DISTINCT FROM md5(search_text))
+ON CONFLICT (study_id) DO NOTHING;
+
+-- Staleness is now derived from embedding_text_hash
+ALTER TABLE public.studies DROP COLUMN IF EXISTS embedding_stale;
@@ -0,0 +1,50 @@
+-- =====================================================
+-- EMBEDDING QUEUE: WORKER LEASES + NOTIFY
+-- Lets the background embedding worker claim rows and wake up on new work
+-- =====================================================
+
+ALTER TABLE public.embedding_queue
+  ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;
+
+COMMENT ON COLUMN public.embedding_queue.claimed_until IS 'Worker lease; other workers skip the row until it expires (a crashed worker''s rows become claimable again)';
+
+CREATE INDEX IF NOT EXISTS idx_embedding_queue_enqueued_at ON public.embedding_queue(enqueued_at);
+
+-- Same as 20260301000004, but re-queuing also releases any worker lease: either the
+-- text changed under the claim or the worker wrote a vector for outdated text
+CREATE OR REPLACE FUNCTION public.sync_embedding_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.search_text IS NOT NULL
+     AND (NEW.embedding IS NULL OR NEW.embedding_text_hash IS DISTINCT FROM md5(NEW.search_text)) THEN
+    INSERT INTO public.embedding_queue (study_id, text_hash)
+    VALUES (NEW.id, md5(NEW.search_text))
+    ON CONFLICT (study_id) DO UPDATE
+    SET text_hash = EXCLUDED.text_hash,
+        enqueued_at = NOW(),
+        attempts = 0,
+        last_error = NULL,
+        claimed_until = NULL
+    WHERE embedding_queue.text_hash IS DISTINCT FROM EXCLUDED.text_hash
+       OR embedding_queue.claimed_until IS NOT NULL;
+  ELSE
+    DELETE FROM public.embedding_queue WHERE study_id = NEW.id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One notification per statement; Postgres also folds identical notifications
+-- within a transaction, so bulk ingests wake the worker once
+CREATE OR REPLACE FUNCTION public.notify_embedding_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('embedding_queue', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_notify_embedding_queue
+  AFTER INSERT OR UPDATE ON public.embedding_queue
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.notify_embedding_queue();
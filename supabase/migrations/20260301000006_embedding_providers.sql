@@ -0,0 +1,26 @@
+-- =====================================================
+-- PLUGGABLE EMBEDDING PROVIDERS
+-- Vectors from different providers have different dimensions; store them in
+-- one untyped column and index each model separately
+-- =====================================================
+
+-- The global index is replaced by per-model partial expression indexes
+DO $$
+DECLARE
+  had_index BOOLEAN := to_regclass('public.idx_studies_embedding_ivfflat') IS NOT NULL;
+BEGIN
+  DROP INDEX IF EXISTS public.idx_studies_embedding_ivfflat;
+
+  ALTER TABLE public.studies ALTER COLUMN embedding TYPE vector;
+
+  -- Keep an index for the existing OpenAI vectors if one was built; other
+  -- models get theirs from scripts/backfill_embeddings.py after their backfill
+  IF had_index THEN
+    CREATE INDEX idx_studies_embedding_text_embedding_3_small ON public.studies
+      USING ivfflat ((embedding::vector(1536)) vector_cosine_ops)
+      WITH (lists = 100)
+      WHERE embedding_model = 'text-embedding-3-small';
+  END IF;
+END $$;
+
+COMMENT ON COLUMN public.studies.embedding IS 'Embedding of search_text from embedding_model (dimension depends on the model); compare only within one model';
@@ -0,0 +1,30 @@
+-- =====================================================
+-- STUDY CHUNKS
+-- Passage-level embeddings of long study fields (detailed description,
+-- eligibility criteria) for multi-vector semantic search
+-- =====================================================
+
+CREATE TABLE public.study_chunks (
+  id BIGSERIAL PRIMARY KEY,
+  study_id BIGINT NOT NULL REFERENCES public.studies(id) ON DELETE CASCADE,
+  field TEXT NOT NULL,
+  chunk_index INTEGER NOT NULL,
+  content TEXT NOT NULL,
+  source_hash TEXT NOT NULL,
+  embedding vector NOT NULL,
+  embedding_model TEXT NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  UNIQUE (study_id, field, chunk_index)
+);
+
+-- Staleness checks and per-study replacement (the UNIQUE index leads with study_id)
+CREATE INDEX idx_study_chunks_source_hash ON public.study_chunks(study_id, source_hash);
+
+-- Enable RLS with no policies (only service role / backend can access)
+ALTER TABLE public.study_chunks ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.study_chunks IS 'Embedded passages of long study fields; filled by scripts/backfill_embeddings.py --chunks, searched when USE_CHUNKED_EMBEDDINGS=true';
+COMMENT ON COLUMN public.study_chunks.field IS 'Source field label (description, eligibility)';
+COMMENT ON COLUMN public.study_chunks.content IS 'Normalized passage text that was embedded (prefixed with the study title and field)';
+COMMENT ON COLUMN public.study_chunks.source_hash IS 'md5 of title, detailed_description and eligibility_criteria when chunked; rows with an outdated hash are stale';
+COMMENT ON COLUMN public.study_chunks.embedding IS 'Passage embedding from embedding_model; vector index is per model (idx_study_chunks_embedding_<model>)';
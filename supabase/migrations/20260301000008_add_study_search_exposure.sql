@@ -0,0 +1,17 @@
+-- =====================================================
+-- SEARCH EXPOSURE
+-- How often each study is shown in search results; orders AI precomputation
+-- =====================================================
+
+CREATE TABLE public.study_search_exposure (
+  study_id BIGINT PRIMARY KEY REFERENCES public.studies(id) ON DELETE CASCADE,
+  impressions BIGINT NOT NULL DEFAULT 0,
+  last_seen_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+CREATE INDEX idx_study_search_exposure_impressions ON public.study_search_exposure(impressions DESC);
+
+-- Enable RLS with no policies (only service role / backend can access)
+ALTER TABLE public.study_search_exposure ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.study_search_exposure IS 'Search result impressions per study (top results of each search), flushed in batches by the API; used by scripts/precompute_ai.py';
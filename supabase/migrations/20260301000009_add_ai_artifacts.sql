@@ -0,0 +1,25 @@
+-- =====================================================
+-- AI ARTIFACTS
+-- Per-artifact cache: each kind is versioned independently and keyed by a
+-- hash of the text its prompt was built from
+-- =====================================================
+
+CREATE TABLE public.ai_artifacts (
+  study_id BIGINT NOT NULL REFERENCES public.studies(id) ON DELETE CASCADE,
+  kind TEXT NOT NULL CHECK (kind IN ('plain_title', 'study_summary', 'eligibility_quiz')),
+  prompt_version TEXT NOT NULL,
+  input_hash TEXT NOT NULL,
+  content JSONB NOT NULL,
+  model TEXT NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  PRIMARY KEY (study_id, kind, prompt_version, input_hash)
+);
+
+-- Enable RLS with no policies (only service role / backend can access)
+ALTER TABLE public.ai_artifacts ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.ai_artifacts IS 'Generated AI artifacts; a cache hit needs the current prompt_version for the kind and the same input text. Read and written by backend/ai_module.py';
+COMMENT ON COLUMN public.ai_artifacts.input_hash IS 'sha256 of the request fields the prompt was built from (AI_INPUT_FIELDS in backend/ai_module.py)';
+COMMENT ON COLUMN public.ai_artifacts.content IS 'JSON string (plain_title, study_summary) or array of quiz questions (eligibility_quiz)';
+
+COMMENT ON COLUMN public.studies.ai_cache_version IS 'Deprecated: AI artifacts are versioned per kind in ai_artifacts; ai_* columns mirror the artifacts for the stored study text';
@@ -0,0 +1,19 @@
+-- =====================================================
+-- RATE LIMIT BUCKETS
+-- Token buckets shared by all API workers (per client and global budgets)
+-- =====================================================
+
+-- UNLOGGED: no WAL per request; losing the buckets in a crash only resets limits
+CREATE UNLOGGED TABLE public.rate_limit_buckets (
+  bucket_key TEXT PRIMARY KEY,
+  tokens DOUBLE PRECISION NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+CREATE INDEX idx_rate_limit_buckets_updated_at ON public.rate_limit_buckets(updated_at);
+
+-- Enable RLS with no policies (only service role / backend can access)
+ALTER TABLE public.rate_limit_buckets ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.rate_limit_buckets IS 'Token bucket per budget and client (e.g. ai:study_summary:client:203.0.113.7); refilled lazily on each take by backend/platform_module.py, idle rows pruned';
+COMMENT ON COLUMN public.rate_limit_buckets.tokens IS 'Tokens left as of updated_at';
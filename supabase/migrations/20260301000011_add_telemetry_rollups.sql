@@ -0,0 +1,25 @@
+-- =====================================================
+-- TELEMETRY ROLLUPS
+-- Aggregated counters and latency histograms flushed by each API process
+-- =====================================================
+
+CREATE TABLE public.telemetry_rollups (
+  id BIGSERIAL PRIMARY KEY,
+  window_start TIMESTAMPTZ NOT NULL,
+  flushed_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  metric TEXT NOT NULL,
+  labels JSONB NOT NULL DEFAULT '{}'::jsonb,
+  count BIGINT NOT NULL,
+  sum DOUBLE PRECISION NOT NULL,
+  buckets BIGINT[]
+);
+
+CREATE INDEX idx_telemetry_rollups_window_start ON public.telemetry_rollups(window_start);
+
+-- Enable RLS with no policies (only service role / backend can access)
+ALTER TABLE public.telemetry_rollups ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.telemetry_rollups IS 'One row per metric and label set per flush window (backend/platform_module.py Telemetry); summarized at GET /admin/telemetry';
+COMMENT ON COLUMN public.telemetry_rollups.count IS 'Samples recorded in the window (calls, lookups, views)';
+COMMENT ON COLUMN public.telemetry_rollups.sum IS 'Sum of recorded values (tokens, USD, ms)';
+COMMENT ON COLUMN public.telemetry_rollups.buckets IS 'Latency histogram counts per TELEMETRY_LATENCY_BUCKETS_MS bound plus overflow; NULL for counters';
@@ -0,0 +1,25 @@
+-- =====================================================
+-- STRUCTURED ELIGIBILITY
+-- Age range, sex and healthy-volunteer flag from CT.gov's eligibilityModule,
+-- so search can filter by the searcher's age and sex in SQL
+-- =====================================================
+
+CREATE TYPE public.eligible_sex AS ENUM ('all', 'female', 'male');
+
+ALTER TABLE public.studies
+  ADD COLUMN IF NOT EXISTS min_age_months INTEGER,
+  ADD COLUMN IF NOT EXISTS max_age_months INTEGER,
+  ADD COLUMN IF NOT EXISTS eligible_sex public.eligible_sex,
+  ADD COLUMN IF NOT EXISTS healthy_volunteers BOOLEAN;
+
+COMMENT ON COLUMN public.studies.min_age_months IS 'Minimum age in whole months (CT.gov minimumAge); NULL = no lower limit';
+COMMENT ON COLUMN public.studies.max_age_months IS 'Maximum age in whole months, inclusive (CT.gov maximumAge); NULL = no upper limit';
+COMMENT ON COLUMN public.studies.eligible_sex IS 'Sex eligible to enroll (CT.gov sex); NULL = not stated';
+COMMENT ON COLUMN public.studies.healthy_volunteers IS 'Accepts healthy volunteers (CT.gov healthyVolunteers)';
+
+-- Age/sex filters on search (see eligibility_filter_sql in backend/search_module.py)
+CREATE INDEX IF NOT EXISTS idx_studies_eligibility ON public.studies (eligible_sex, min_age_months, max_age_months)
+  WHERE is_published = TRUE;
+
+-- Existing CT.gov rows are filled from their stored raw documents by
+-- scripts/backfill_eligibility.py (the documents are gzip-compressed)
@@ -0,0 +1,140 @@
+-- =====================================================
+-- PER-USER STUDY RECOMMENDATIONS
+-- Top studies per user, precomputed from profile conditions, age/sex
+-- eligibility and a profile-text embedding, so "recommended for you" is one
+-- indexed read. Refreshed by scripts/refresh_recommendations.py when a
+-- profile or match answers change (recommendation_queue) and when studies
+-- are ingested or updated (recommendation_sync_state watermark).
+-- =====================================================
+
+CREATE TABLE public.user_recommendations (
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  study_id BIGINT NOT NULL REFERENCES public.studies(id) ON DELETE CASCADE,
+  score REAL NOT NULL,
+  similarity REAL NOT NULL DEFAULT 0,
+  matched_conditions TEXT[] NOT NULL DEFAULT '{}',
+  computed_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+
+  PRIMARY KEY (user_id, study_id)
+);
+
+-- The read path: a user's recommendations, best first
+CREATE INDEX idx_user_recommendations_user_score ON public.user_recommendations (user_id, score DESC);
+-- Updated studies are rescored for every user holding them
+CREATE INDEX idx_user_recommendations_study_id ON public.user_recommendations (study_id);
+
+ALTER TABLE public.user_recommendations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own recommendations"
+  ON public.user_recommendations FOR SELECT
+  USING (auth.uid() = user_id);
+
+COMMENT ON TABLE public.user_recommendations IS 'Precomputed top studies per user (written by scripts/refresh_recommendations.py; users read their own rows)';
+COMMENT ON COLUMN public.user_recommendations.score IS 'Weighted profile-text similarity and share of profile conditions the study lists';
+COMMENT ON COLUMN public.user_recommendations.similarity IS 'Cosine similarity of the study and profile-text embeddings (0 when either is missing)';
+COMMENT ON COLUMN public.user_recommendations.matched_conditions IS 'Profile conditions found in the study''s conditions (shown as "matches your ...")';
+
+-- Studies updated since the last sync are scored against stored profiles
+CREATE INDEX IF NOT EXISTS idx_studies_updated_at ON public.studies (updated_at);
+
+-- =====================================================
+-- PROFILE STATE (backend-only)
+-- =====================================================
+
+CREATE TABLE public.user_recommendation_state (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  age INTEGER,
+  sex public.eligible_sex,
+  conditions TEXT[] NOT NULL DEFAULT '{}',
+  profile_hash TEXT,
+  embedding vector,
+  embedding_model TEXT,
+  computed_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+-- Enable RLS with no policies (only service role / recommendation refresh can access)
+ALTER TABLE public.user_recommendation_state ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.user_recommendation_state IS 'Profile inputs of each user''s last recommendation refresh; new studies are scored against these without re-reading profiles';
+COMMENT ON COLUMN public.user_recommendation_state.profile_hash IS 'md5 of the profile text that was embedded; the embedding is reused while it matches';
+
+-- =====================================================
+-- REFRESH QUEUE (backend-only)
+-- =====================================================
+
+CREATE TABLE public.recommendation_queue (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  enqueued_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT,
+  claimed_until TIMESTAMPTZ
+);
+
+CREATE INDEX idx_recommendation_queue_enqueued_at ON public.recommendation_queue (enqueued_at);
+
+-- Enable RLS with no policies (only service role / recommendation refresh can access)
+ALTER TABLE public.recommendation_queue ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.recommendation_queue IS 'Users whose profile or match answers changed since their recommendations were computed';
+COMMENT ON COLUMN public.recommendation_queue.claimed_until IS 'Worker lease; a re-queue while claimed clears it so the newer profile is picked up again';
+
+CREATE TABLE public.recommendation_sync_state (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  studies_synced_until TIMESTAMPTZ NOT NULL,
+  last_synced_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+-- Enable RLS with no policies (only service role / recommendation refresh can access)
+ALTER TABLE public.recommendation_sync_state ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.recommendation_sync_state IS 'Single row: studies updated after studies_synced_until have not been scored against user profiles yet';
+
+INSERT INTO public.recommendation_sync_state (studies_synced_until) VALUES (NOW());
+
+-- =====================================================
+-- QUEUE MAINTENANCE TRIGGERS
+-- =====================================================
+
+-- TG_ARGV[0] names the user id column. SECURITY DEFINER because users edit
+-- their profile through RLS and cannot write the queue themselves.
+CREATE OR REPLACE FUNCTION public.enqueue_user_recommendations()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.recommendation_queue (user_id)
+  VALUES ((to_jsonb(NEW) ->> TG_ARGV[0])::uuid)
+  ON CONFLICT (user_id) DO UPDATE
+  SET enqueued_at = NOW(),
+      attempts = 0,
+      last_error = NULL,
+      claimed_until = NULL;
+  PERFORM pg_notify('recommendation_queue', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only fields that feed recommendations (a new signup's empty profile has none)
+CREATE TRIGGER trigger_enqueue_recommendations_on_profile
+  AFTER UPDATE ON public.user_profiles
+  FOR EACH ROW
+  WHEN ((OLD.age, OLD.gender, OLD.conditions, OLD.other_condition, OLD.medications,
+         OLD.previous_trials, OLD.trial_experience, OLD.additional_notes)
+        IS DISTINCT FROM
+        (NEW.age, NEW.gender, NEW.conditions, NEW.other_condition, NEW.medications,
+         NEW.previous_trials, NEW.trial_experience, NEW.additional_notes))
+  EXECUTE FUNCTION public.enqueue_user_recommendations('id');
+
+CREATE TRIGGER trigger_enqueue_recommendations_on_answers
+  AFTER INSERT ON public.user_match_answers
+  FOR EACH ROW
+  EXECUTE FUNCTION public.enqueue_user_recommendations('user_id');
+
+CREATE TRIGGER trigger_enqueue_recommendations_on_answers_change
+  AFTER UPDATE ON public.user_match_answers
+  FOR EACH ROW
+  WHEN (OLD.answers IS DISTINCT FROM NEW.answers)
+  EXECUTE FUNCTION public.enqueue_user_recommendations('user_id');
+
+-- Seed the queue with every existing profile
+INSERT INTO public.recommendation_queue (user_id)
+SELECT id FROM public.user_profiles
+ON CONFLICT (user_id) DO NOTHING;
@@ -0,0 +1,85 @@
+-- =====================================================
+-- SAVED SEARCHES + NEW-STUDY ALERTS
+-- Users save a search request; ingestion matches each new or updated study
+-- against a reverse index of saved searches (SavedSearchAlerts in
+-- backend/search_module.py) and records hits in search_notifications
+-- =====================================================
+
+CREATE TABLE public.saved_searches (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  name TEXT,
+  request JSONB NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+
+  -- Alerts need something to match on: a condition, a keyword or a ZIP
+  CONSTRAINT saved_searches_request_check CHECK (
+    jsonb_typeof(request) = 'object'
+    AND (jsonb_array_length(COALESCE(request -> 'conditions_include', '[]'::jsonb)) > 0
+         OR btrim(COALESCE(request ->> 'query_text', '')) <> ''
+         OR btrim(COALESCE(request ->> 'zip', '')) <> '')
+  )
+);
+
+CREATE INDEX idx_saved_searches_user_id ON public.saved_searches (user_id);
+
+CREATE TRIGGER set_updated_at_saved_searches
+  BEFORE UPDATE ON public.saved_searches
+  FOR EACH ROW
+  EXECUTE FUNCTION public.handle_updated_at();
+
+ALTER TABLE public.saved_searches ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own saved searches"
+  ON public.saved_searches FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can create own saved searches"
+  ON public.saved_searches FOR INSERT
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own saved searches"
+  ON public.saved_searches FOR UPDATE
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own saved searches"
+  ON public.saved_searches FOR DELETE
+  USING (auth.uid() = user_id);
+
+COMMENT ON TABLE public.saved_searches IS 'Search requests users asked to be alerted about';
+COMMENT ON COLUMN public.saved_searches.request IS 'POST /search body: conditions_include, conditions_exclude, query_text, zip, age, sex';
+
+-- =====================================================
+-- NOTIFICATIONS
+-- =====================================================
+
+CREATE TABLE public.search_notifications (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  saved_search_id BIGINT NOT NULL REFERENCES public.saved_searches(id) ON DELETE CASCADE,
+  study_id BIGINT NOT NULL REFERENCES public.studies(id) ON DELETE CASCADE,
+  created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+  read_at TIMESTAMPTZ,
+
+  -- A study is reported once per saved search, however often it is updated
+  UNIQUE (saved_search_id, study_id)
+);
+
+CREATE INDEX idx_search_notifications_user_created ON public.search_notifications (user_id, created_at DESC);
+CREATE INDEX idx_search_notifications_study_id ON public.search_notifications (study_id);
+
+ALTER TABLE public.search_notifications ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own search notifications"
+  ON public.search_notifications FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Marking as read
+CREATE POLICY "Users can update own search notifications"
+  ON public.search_notifications FOR UPDATE
+  USING (auth.uid() = user_id)
+  WITH CHECK (auth.uid() = user_id);
+
+COMMENT ON TABLE public.search_notifications IS 'New or updated studies matching a saved search (written by ingestion)';
+COMMENT ON COLUMN public.search_notifications.read_at IS 'Set by the user when the alert was seen; NULL = unread';
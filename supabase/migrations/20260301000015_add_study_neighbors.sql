@@ -0,0 +1,29 @@
+-- =====================================================
+-- PRECOMPUTED SIMILAR STUDIES
+-- Top-k nearest studies by embedding cosine similarity, one row per study
+-- (neighbor ids and scores as parallel arrays, best first), so the study
+-- page's "similar studies" is a primary-key read instead of a vector query.
+-- Computed in blocks with NumPy by scripts/refresh_study_neighbors.py; a
+-- list is recomputed when its study's embedding changes. Lists include
+-- unpublished and closed studies: GET /studies/{id}/similar filters them at
+-- read time, so status changes never invalidate a list.
+-- =====================================================
+
+CREATE TABLE public.study_neighbors (
+  study_id BIGINT PRIMARY KEY REFERENCES public.studies(id) ON DELETE CASCADE,
+  neighbor_ids BIGINT[] NOT NULL,
+  scores REAL[] NOT NULL,
+  embedding_model TEXT NOT NULL,
+  embedding_text_hash TEXT,
+  computed_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+
+  CONSTRAINT study_neighbors_scores_check CHECK (cardinality(neighbor_ids) = cardinality(scores))
+);
+
+-- Enable RLS with no policies (only service role / FastAPI can access)
+ALTER TABLE public.study_neighbors ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.study_neighbors IS 'Nearest studies per study by embedding similarity (written by scripts/refresh_study_neighbors.py, served by GET /studies/{id}/similar)';
+COMMENT ON COLUMN public.study_neighbors.neighbor_ids IS 'Neighbor study ids, most similar first; deleted studies are skipped at read time';
+COMMENT ON COLUMN public.study_neighbors.scores IS 'Cosine similarity of each neighbor (same order as neighbor_ids)';
+COMMENT ON COLUMN public.study_neighbors.embedding_text_hash IS 'studies.embedding_text_hash the list was computed from; a different value marks the list stale';
@@ -0,0 +1,50 @@
+-- =====================================================
+-- ATOMIC MULTI-BUCKET RATE LIMIT TAKE
+-- A request is charged against its client bucket and the budget's global
+-- bucket together: both are debited, or (if either is short) neither is.
+-- One call per check from backend/platform_module.py:PostgresTokenBuckets.
+-- =====================================================
+
+-- Returns 0 when every bucket had cost tokens (all debited), otherwise the
+-- seconds until the slowest bucket has refilled enough (nothing debited).
+-- Rows are locked in key order so concurrent takes cannot deadlock. Runs with
+-- the caller's rights: clients hit the table's RLS (no policies), so it stays backend-only.
+CREATE OR REPLACE FUNCTION public.take_rate_limit_tokens(
+  keys TEXT[],
+  capacities DOUBLE PRECISION[],
+  rates DOUBLE PRECISION[],
+  cost DOUBLE PRECISION
+)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+  bucket RECORD;
+  wait DOUBLE PRECISION := 0;
+BEGIN
+  INSERT INTO public.rate_limit_buckets (bucket_key, tokens, updated_at)
+  SELECT k, c, NOW() FROM unnest(keys, capacities) AS v(k, c)
+  ON CONFLICT (bucket_key) DO NOTHING;
+
+  FOR bucket IN
+    SELECT v.rate,
+           LEAST(v.capacity, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * v.rate) AS tokens
+    FROM unnest(keys, capacities, rates) AS v(bucket_key, capacity, rate)
+    JOIN public.rate_limit_buckets b ON b.bucket_key = v.bucket_key
+    ORDER BY v.bucket_key
+    FOR UPDATE OF b
+  LOOP
+    IF bucket.tokens < cost THEN
+      wait := GREATEST(wait, (cost - bucket.tokens) / bucket.rate);
+    END IF;
+  END LOOP;
+
+  IF wait = 0 THEN
+    UPDATE public.rate_limit_buckets b
+    SET tokens = LEAST(v.capacity, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * v.rate) - cost,
+        updated_at = NOW()
+    FROM unnest(keys, capacities, rates) AS v(bucket_key, capacity, rate)
+    WHERE b.bucket_key = v.bucket_key;
+  END IF;
+  RETURN wait;
+END;
+$$ LANGUAGE plpgsql;
+
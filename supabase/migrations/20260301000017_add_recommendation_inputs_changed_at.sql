@@ -0,0 +1,53 @@
+-- =====================================================
+-- RECOMMENDATION INPUTS WATERMARK
+-- studies.updated_at moves on every write, including AI mirror columns and
+-- eligibility backfills that leave scoring unchanged, so keying the
+-- recommendation merge on it rescored (or, past
+-- RECOMMENDATION_MERGE_MAX_STUDIES, re-queued every user for) studies whose
+-- recommendations could not have changed. recommendation_inputs_changed_at
+-- moves only when a column backend/recommendation_module.py scores or
+-- filters on changes, whichever path writes it (ingest, embeddings,
+-- researcher edits, publishing).
+-- =====================================================
+
+ALTER TABLE public.studies ADD COLUMN recommendation_inputs_changed_at TIMESTAMPTZ;
+
+-- Existing studies keep their last write as their last input change (without
+-- bumping updated_at), so already-synced studies are not merged again
+ALTER TABLE public.studies DISABLE TRIGGER set_updated_at_studies;
+UPDATE public.studies SET recommendation_inputs_changed_at = updated_at;
+ALTER TABLE public.studies ENABLE TRIGGER set_updated_at_studies;
+
+ALTER TABLE public.studies
+  ALTER COLUMN recommendation_inputs_changed_at SET DEFAULT NOW(),
+  ALTER COLUMN recommendation_inputs_changed_at SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION public.handle_recommendation_inputs_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT'
+     OR NEW.is_published IS DISTINCT FROM OLD.is_published
+     OR NEW.recruiting_status IS DISTINCT FROM OLD.recruiting_status
+     OR NEW.conditions IS DISTINCT FROM OLD.conditions
+     OR NEW.min_age_months IS DISTINCT FROM OLD.min_age_months
+     OR NEW.max_age_months IS DISTINCT FROM OLD.max_age_months
+     OR NEW.eligible_sex IS DISTINCT FROM OLD.eligible_sex
+     OR NEW.embedding_model IS DISTINCT FROM OLD.embedding_model
+     OR NEW.embedding IS DISTINCT FROM OLD.embedding THEN
+    NEW.recommendation_inputs_changed_at = NOW();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER set_recommendation_inputs_changed_at_studies
+  BEFORE INSERT OR UPDATE ON public.studies
+  FOR EACH ROW
+  EXECUTE FUNCTION public.handle_recommendation_inputs_changed();
+
+-- Replaces idx_studies_updated_at (only the recommendation merge read it)
+CREATE INDEX idx_studies_recommendation_inputs_changed_at ON public.studies (recommendation_inputs_changed_at);
+DROP INDEX IF EXISTS public.idx_studies_updated_at;
+
+COMMENT ON COLUMN public.studies.recommendation_inputs_changed_at IS 'Last change to a column recommendations score or filter on; studies past recommendation_sync_state.studies_synced_until are merged into user_recommendations';
+COMMENT ON TABLE public.recommendation_sync_state IS 'Single row: studies whose recommendation inputs changed after studies_synced_until have not been scored against user profiles yet';